@@ -1,23 +1,18 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
 import os
 import json
-import pandas as pd
+from functools import partial
 from sandbox import run_in_repl
 from guard import validate_code
 from utils.prompt import load_prompt
-load_dotenv()
-import json
-from langchain_google_genai import ChatGoogleGenerativeAI
-from agents.meta_agent import try_generate_and_execute, build_repair_prompt
-
+from utils.llm_cache import cached_invoke, acached_invoke, cache_key, LRUCache
+from agents.provider import get_llm, model_name
+from utils import tracing
+from agents.meta_agent import (try_generate_and_execute, atry_generate_and_execute,
+                               speculative_generate_and_execute,
+                               aspeculative_generate_and_execute,
+                               build_repair_prompt)
 
 
-llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",
-        temperature=0,
-        google_api_key=os.getenv("GOOGLE_API_KEY"),
-    )
 
 def build_cross_prompt(user_query: str,
                        dataset_info: str,
@@ -48,12 +43,13 @@ def build_cross_prompt(user_query: str,
         if result_snippet else ""
     )
 
+    # dataset context first: header + context is a stable, cacheable prefix
     return (
         "You are a code-review assistant.\n\n"
-        "## User question\n"
-        f"{user_query}\n\n"
         "## Dataset context\n"
         f"{dataset_info}\n\n"
+        "## User question\n"
+        f"{user_query}\n\n"
         "## Candidate solution code\n"
         "```python\n"
         f"{code}\n"
@@ -73,52 +69,114 @@ def build_cross_prompt(user_query: str,
 
 CC_MAX = 3   # cross-checker retry budget
 
-def generate_guard_sandbox(prompt_base: str, df):
-    """Your existing try_generate_and_execute but returning *always*."""
+def generate_guard_sandbox(prompt_base: str, df, speculative: int = 0):
+    """Your existing try_generate_and_execute but returning *always*.
+
+    *speculative* > 1 races that many candidates (first valid one wins).
+    """
+    if speculative > 1:
+        return speculative_generate_and_execute(prompt_base, df, speculative)
     out = try_generate_and_execute(prompt_base, df)
     return out  # may be ok or failed
 
-def repair_with_critic(prompt_base: str, df, ctx, user_q):
-    out = generate_guard_sandbox(prompt_base, df)
+
+async def agenerate_guard_sandbox(prompt_base: str, df, speculative: int = 0):
+    """Coroutine version of generate_guard_sandbox."""
+    if speculative > 1:
+        return await aspeculative_generate_and_execute(prompt_base, df, speculative)
+    return await atry_generate_and_execute(prompt_base, df)
+
+def repair_with_critic(prompt_base: str, df, ctx, user_q, speculative: int = 0):
+    out = generate_guard_sandbox(prompt_base, df, speculative)
+    attempts = out["attempts"]
     if not out["ok"]:
-        return out   # guard/sandbox already exhausted
+        return {**out, "critic_rounds": 0}   # guard/sandbox already exhausted
 
     # ---- cross-checker loop ----
     code   = out["code"]
     result = out["result"]
+    summary = out["summary"]
+    figures = out["figures"]
     for i in range(CC_MAX):
-        verdict = cross_check(user_q, ctx, code)
+        verdict = cross_check(user_q, ctx, code, summary)   # critic sees the result
         if verdict["valid"]:
-            return {"ok": True, "code": code, "result": result}
+            return {"ok": True, "code": code, "result": result,
+                    "result_summary": summary, "figures": figures, "verdict": verdict,
+                    "attempts": attempts, "critic_rounds": i + 1}
 
         # critic says it's wrong → repair
+        tracing.event("retry", cause="critic", round=i + 1)
         critic_prompt = build_repair_prompt(
             prompt_base, code, "critic", verdict["reason"]
         )
-        out = generate_guard_sandbox(critic_prompt, df)
+        out = generate_guard_sandbox(critic_prompt, df, speculative)
+        attempts += out["attempts"]
         if not out["ok"]:
-            return out   # failed during new guard/sandbox
-        code, result = out["code"], out["result"]
+            # failed during new guard/sandbox
+            return {**out, "verdict": verdict, "attempts": attempts,
+                    "critic_rounds": i + 1}
+        code, result, summary, figures = (out["code"], out["result"],
+                                          out["summary"], out["figures"])
 
     # critic still unhappy
     return {
         "ok": False,
         "code": code,
-        "error": f"Critic not satisfied after {CC_MAX} tries: {verdict['reason']}"
+        "error": f"Critic not satisfied after {CC_MAX} tries: {verdict['reason']}",
+        "verdict": verdict,
+        "attempts": attempts,
+        "critic_rounds": CC_MAX,
     }
 
-def cross_check(user_q: str, ctx: str, code: str, result_snippet: str | None = None):
-    prompt = build_cross_prompt(user_q, ctx, code, result_snippet or "")
-    response = llm.invoke(prompt)          # returns LangChain Message
-    text = response.content.strip()
+async def arepair_with_critic(prompt_base: str, df, ctx, user_q, speculative: int = 0):
+    """Coroutine version of repair_with_critic; same return shape."""
+    out = await agenerate_guard_sandbox(prompt_base, df, speculative)
+    attempts = out["attempts"]
+    if not out["ok"]:
+        return {**out, "critic_rounds": 0}
 
+    code   = out["code"]
+    result = out["result"]
+    summary = out["summary"]
+    figures = out["figures"]
+    for i in range(CC_MAX):
+        verdict = await across_check(user_q, ctx, code, summary)
+        if verdict["valid"]:
+            return {"ok": True, "code": code, "result": result,
+                    "result_summary": summary, "figures": figures, "verdict": verdict,
+                    "attempts": attempts, "critic_rounds": i + 1}
+
+        tracing.event("retry", cause="critic", round=i + 1)
+        critic_prompt = build_repair_prompt(
+            prompt_base, code, "critic", verdict["reason"]
+        )
+        out = await agenerate_guard_sandbox(critic_prompt, df, speculative)
+        attempts += out["attempts"]
+        if not out["ok"]:
+            return {**out, "verdict": verdict, "attempts": attempts,
+                    "critic_rounds": i + 1}
+        code, result, summary, figures = (out["code"], out["result"],
+                                          out["summary"], out["figures"])
+
+    return {
+        "ok": False,
+        "code": code,
+        "error": f"Critic not satisfied after {CC_MAX} tries: {verdict['reason']}",
+        "verdict": verdict,
+        "attempts": attempts,
+        "critic_rounds": CC_MAX,
+    }
+
+def _parse_verdict(text: str) -> dict:
+    """Turn the critic's raw reply into {'valid', 'reason', 'fix_hint'}."""
+    text = text.strip()
 
     # remove ```json``` or ``` fences if the model adds them
     if text.startswith("```"):
         text = text.split("```")[1].strip()
-    
+
     if text.lower().startswith("json"):
-        text = text[len("json"):].strip()  
+        text = text[len("json"):].strip()
 
     print(text)
     try:
@@ -133,4 +191,86 @@ def cross_check(user_q: str, ctx: str, code: str, result_snippet: str | None = N
         "valid": bool(verdict.get("valid")),
         "reason": verdict.get("reason", ""),
         "fix_hint": verdict.get("fix_hint", "")
-    }
\ No newline at end of file
+    }
+
+
+# ---- verdict memo: (query, context, code, result) → verdict ----
+_verdicts = LRUCache(maxsize=512)
+
+
+def _verdict_key(user_q: str, ctx: str, code: str, result_snippet: str) -> str:
+    return cache_key(model_name("critic"),
+                     "\0".join((user_q, ctx, code, result_snippet)))
+
+
+def cross_check(user_q: str, ctx: str, code: str, result_snippet: str | None = None):
+    key = _verdict_key(user_q, ctx, code, result_snippet or "")
+    memo = _verdicts.get(key)
+    if memo is not None:
+        tracing.event("critic.memo")
+        return json.loads(memo)
+
+    prompt = build_cross_prompt(user_q, ctx, code, result_snippet or "")
+    with tracing.span("llm.critic"):
+        text = cached_invoke(partial(get_llm, "critic"), model_name("critic"), prompt)
+    verdict = _parse_verdict(text)
+    _verdicts.set(key, json.dumps(verdict))
+    return verdict
+
+
+async def across_check(user_q: str, ctx: str, code: str, result_snippet: str | None = None):
+    """Async twin of cross_check (uses the model's ainvoke)."""
+    key = _verdict_key(user_q, ctx, code, result_snippet or "")
+    memo = _verdicts.get(key)
+    if memo is not None:
+        tracing.event("critic.memo")
+        return json.loads(memo)
+
+    prompt = build_cross_prompt(user_q, ctx, code, result_snippet or "")
+    with tracing.span("llm.critic"):
+        text = await acached_invoke(partial(get_llm, "critic"), model_name("critic"), prompt)
+    verdict = _parse_verdict(text)
+    _verdicts.set(key, json.dumps(verdict))
+    return verdict
+
+
+# ---- final validation policy ----
+VALIDATION_POLICIES = ("off", "single", "consensus")
+CONSENSUS_N = 3
+
+
+def validate_answer(user_q: str, ctx: str, code: str,
+                    policy: str = "single", n: int = CONSENSUS_N,
+                    result_snippet: str | None = None) -> dict:
+    """Final confirmation of code that repair_with_critic already accepted.
+
+    policy
+        'off'       – skip; trust the critic loop.
+        'single'    – one critic verdict.  Normally free: the loop already
+                      judged this exact (query, context, code), so the
+                      verdict comes from the memo.
+        'consensus' – majority of *n* verdicts: the memoised temperature-0
+                      verdict plus n-1 freshly sampled votes from the
+                      'critic_vote' model config.
+    """
+    if policy not in VALIDATION_POLICIES:
+        raise ValueError(f"Unknown validation policy '{policy}'")
+    if policy == "off":
+        return {"valid": True, "reason": "validation skipped (policy=off)", "fix_hint": ""}
+    first = cross_check(user_q, ctx, code, result_snippet)
+    if policy == "single" or n <= 1:
+        return first
+
+    prompt = build_cross_prompt(user_q, ctx, code, result_snippet or "")
+    votes = [first]
+    for _ in range(n - 1):
+        with tracing.span("llm.critic_vote"):
+            text = cached_invoke(partial(get_llm, "critic_vote"),
+                                 model_name("critic_vote"), prompt, use_cache=False)
+        votes.append(_parse_verdict(text))
+
+    n_valid = sum(v["valid"] for v in votes)
+    valid = n_valid * 2 > len(votes)
+    # report a verdict from the winning side
+    chosen = next(v for v in votes if v["valid"] == valid)
+    return {**chosen, "valid": valid, "votes": f"{n_valid}/{len(votes)} valid"}
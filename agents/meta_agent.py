@@ -1,74 +1,106 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from dotenv import load_dotenv
+from __future__ import annotations
+
+import asyncio
 import os
 import json
-import pandas as pd
+from functools import partial
 from sandbox import run_in_repl
 from guard import validate_code
-from utils.prompt import load_prompt
-load_dotenv()
-
-prompt_path = "prompts/meta_agent.txt"
-
-def build_repair_prompt(base_prompt: str,
-                        bad_code: str,
-                        error_type: str,
-                        error_msg: str) -> str:
-    # remove any fences from bad_code / error_msg first if you like
-    block = (
-        "\n\n---\n"
-        f"Previous attempt failed on **{error_type}**:\n"
-        f"{bad_code}\n\n"
-        "Error message / critic feedback:\n"
-        f"{error_msg.strip()}\n\n"
-        "Please rewrite the code so it works, "
-        "assign the final answer to _ , "
-        "and return only the Python code."
-    )
-    return base_prompt + block
-
-
-def generate_code_sequence(prompt):
-    # Initialize the Google Generative AI client
-    template = load_prompt(prompt_path)
-    prompt = f"{template}\nUser query: {prompt}\n\nOutput:"
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash",
-        temperature=0,
-        google_api_key=os.getenv("GOOGLE_API_KEY"),
-    )
-
-    raw = llm.invoke(prompt).content.strip()
+from utils.prompt import build_repair_prompt   # re-exported for the critic loop
+from utils.llm_cache import cached_invoke, acached_invoke
+from agents.provider import get_llm, model_name, run_async
+from utils import tracing
+
+def _clean_code(raw: str) -> str:
+    """Strip ``` fences and a leading 'python' tag from a model reply."""
+    raw = raw.strip()
     if raw.startswith("```"):
         raw = raw.split("```")[1].strip()
-    
+
     if raw.lower().startswith("python"):
-        raw = raw[len("python"):].strip()  
+        raw = raw[len("python"):].strip()
     return raw
 
 
+def generate_code_sequence(prompt):
+    llm = partial(get_llm, "generator")           # built only on a cache miss
+    with tracing.span("llm.generate"):
+        # *prompt* is already the fully rendered template (+ repair block)
+        return _clean_code(cached_invoke(llm, model_name("generator"), prompt))
+
+
+async def agenerate_code_sequence(prompt, **overrides):
+    """Async twin of generate_code_sequence (uses the model's ainvoke).
+
+    *overrides* (e.g. temperature=0.4) pick a variant of the generator config.
+    """
+    llm = partial(get_llm, "generator", **overrides)
+    with tracing.span("llm.generate", **overrides):
+        return _clean_code(await acached_invoke(llm, model_name("generator", **overrides),
+                                                prompt))
+
+
 
 MAX_TRIES = 3
+SAMPLE_FIRST = True     # probe each snippet on a small sample before the full frame
+
+# Errors that don't depend on which rows are present: if the probe run on
+# the sample hits one of these, the full run would too.  KeyErrors never
+# count: the guard already rejects unknown columns, so a KeyError at run
+# time is a label / date / position the sample may simply not contain.
+_SAMPLE_CONCLUSIVE = ("NameError", "AttributeError", "TypeError", "SyntaxError",
+                      "ImportError", "ModuleNotFoundError", "UnboundLocalError",
+                      "Timeout", "Sandbox worker died")
+
+
+def _sample_error_is_conclusive(error: str) -> bool:
+    """True when a sample-tier failure predicts the full-frame failure."""
+    return error.startswith(_SAMPLE_CONCLUSIVE)
+
+
+def guard_and_run(code: str, df):
+    """One guard → sandbox pass.
+
+    Returns (run_result, None, None) on success, else
+    (None, error_type, error_msg) with error_type in {'guard', 'sandbox'}.
+    """
+    # ---------- static guard ----------
+    with tracing.span("guard"):
+        verdict = validate_code(code, {"columns": df.columns})
+        tracing.annotate(ok=verdict["ok"])
+    if not verdict["ok"]:
+        return None, "guard", "; ".join(verdict["issues"])
+
+    # ---------- sandbox: sample tier ----------
+    if SAMPLE_FIRST:
+        with tracing.span("sandbox.sample"):
+            probe = run_in_repl(code, df, tier="sample")
+            tracing.annotate(ok=probe["ok"])
+        if not probe["ok"] and _sample_error_is_conclusive(probe["error"]):
+            return None, "sandbox", probe["error"]
+
+    # ---------- sandbox: full tier ----------
+    with tracing.span("sandbox.full"):
+        run = run_in_repl(code, df)               # full df
+        tracing.annotate(ok=run["ok"])
+    if run["ok"]:
+        return run, None, None
+    return None, "sandbox", run["error"]
+
 
 def try_generate_and_execute(prompt_base: str, df):
     code = generate_code_sequence(prompt_base)         # first attempt
     for attempt in range(1, MAX_TRIES + 1):
         print(f"\nAttempt {attempt}:\n{code}")
 
-        # ---------- static guard ----------
-        verdict = validate_code(code, {"columns": df.columns})
-        if not verdict["ok"]:
-            error_type = "guard"
-            error_msg  = "; ".join(verdict["issues"])
-        else:
-            # ---------- sandbox ----------
-            run = run_in_repl(code, df)               # full df
-            if run["ok"]:
-                return {"ok": True, "code": code, "result": run["result"]}
-            error_type = "sandbox"
-            error_msg  = run["error"]
+        run, error_type, error_msg = guard_and_run(code, df)
+        if run is not None:
+            return {"ok": True, "code": code, "result": run["result"],
+                    "summary": run["summary"], "figures": run.get("figures", []),
+                    "attempts": attempt}
 
         # ---------- build repair prompt ----------
+        tracing.event("retry", cause=error_type, attempt=attempt)
         repair_prompt = build_repair_prompt(
             prompt_base, code, error_type, error_msg
         )
@@ -78,12 +110,121 @@ def try_generate_and_execute(prompt_base: str, df):
     return {
         "ok": False,
         "code": code,
-        "error": f"Failed after {MAX_TRIES} tries ({error_type}): {error_msg}"
+        "error": f"Failed after {MAX_TRIES} tries ({error_type}): {error_msg}",
+        "attempts": MAX_TRIES,
     }
 
 
+async def atry_generate_and_execute(prompt_base: str, df, first_code: str | None = None,
+                                    first_attempt: int = 1):
+    """Coroutine version of try_generate_and_execute.
+
+    LLM calls are awaited; the guard + sandbox pass is CPU-bound and
+    blocking, so it runs in a worker thread to keep the event loop free.
+    *first_code* skips the initial generation and *first_attempt* numbers
+    it (the speculative path continues its repairs here), so 'attempts'
+    never exceeds MAX_TRIES.
+    """
+    code = first_code or await agenerate_code_sequence(prompt_base)  # first attempt
+    for attempt in range(first_attempt, MAX_TRIES + 1):
+        print(f"\nAttempt {attempt}:\n{code}")
 
+        run, error_type, error_msg = await asyncio.to_thread(guard_and_run, code, df)
+        if run is not None:
+            return {"ok": True, "code": code, "result": run["result"],
+                    "summary": run["summary"], "figures": run.get("figures", []),
+                    "attempts": attempt}
 
+        tracing.event("retry", cause=error_type, attempt=attempt)
+        repair_prompt = build_repair_prompt(
+            prompt_base, code, error_type, error_msg
+        )
+        code = await agenerate_code_sequence(repair_prompt)
 
+    return {
+        "ok": False,
+        "code": code,
+        "error": f"Failed after {MAX_TRIES} tries ({error_type}): {error_msg}",
+        "attempts": MAX_TRIES,
+    }
 
 
+# ---------------------------------------------------------------------------
+# Speculative mode: K candidates in parallel, first valid wins
+# ---------------------------------------------------------------------------
+
+# Candidate i differs by sampling temperature and a short steering hint;
+# candidate 0 is exactly the normal (temperature-0) generation.
+SPECULATIVE_VARIANTS = [
+    {"temperature": 0,   "hint": ""},
+    {"temperature": 0.4, "hint": "Prefer a single vectorised pandas expression."},
+    {"temperature": 0.8, "hint": "Double-check column names and DatetimeIndex slicing."},
+    {"temperature": 0.6, "hint": "Break the computation into short, explicit steps."},
+]
+
+
+async def _candidate(prompt_base: str, df, index: int):
+    variant = SPECULATIVE_VARIANTS[index % len(SPECULATIVE_VARIANTS)]
+    prompt = prompt_base
+    if variant["hint"]:
+        prompt += f"\n\nHint: {variant['hint']}"
+    code = await agenerate_code_sequence(prompt, temperature=variant["temperature"])
+    run, error_type, error_msg = await asyncio.to_thread(guard_and_run, code, df)
+    return index, code, run, error_type, error_msg
+
+
+async def aspeculative_generate_and_execute(prompt_base: str, df, k: int = 3):
+    """Ask for *k* candidates concurrently; keep the first that passes.
+
+    Each candidate is generated, guarded and sandboxed independently; as
+    soon as one passes the others are cancelled.  Cancelling only stops a
+    candidate still waiting on its LLM call: a guard + sandbox pass already
+    in flight runs to completion in its thread (holding a sandbox pool
+    worker until then, at most the sandbox timeout) and its result is
+    discarded.  Only this first attempt is raced: if none passes, the
+    normal (serial) repair loop continues from the first candidate's
+    failure, within the same MAX_TRIES budget.
+    Same return shape as try_generate_and_execute, plus 'candidate'.
+    """
+    tasks = [asyncio.create_task(_candidate(prompt_base, df, i)) for i in range(k)]
+    failures = {}
+    try:
+        for fut in asyncio.as_completed(tasks):
+            try:
+                index, code, run, error_type, error_msg = await fut
+            except Exception as exc:                 # a candidate's LLM call failed
+                tracing.event("speculative.error", error=type(exc).__name__)
+                continue
+            if run is not None:
+                tracing.event("speculative.win", candidate=index)
+                return {"ok": True, "code": code, "result": run["result"],
+                        "summary": run["summary"], "figures": run.get("figures", []),
+                        "attempts": 1, "candidate": index}
+            failures[index] = (code, error_type, error_msg)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if not failures:
+        # every candidate errored before producing code: plain serial path
+        return await atry_generate_and_execute(prompt_base, df)
+
+    code, error_type, error_msg = failures[min(failures)]
+    if MAX_TRIES < 2:
+        return {"ok": False, "code": code, "attempts": 1,
+                "error": f"Failed after 1 tries ({error_type}): {error_msg}"}
+    tracing.event("retry", cause=error_type, attempt=1)
+    code = await agenerate_code_sequence(
+        build_repair_prompt(prompt_base, code, error_type, error_msg))
+    # the race was attempt 1; repairs continue serially from attempt 2
+    return await atry_generate_and_execute(prompt_base, df, first_code=code,
+                                           first_attempt=2)
+
+
+def speculative_generate_and_execute(prompt_base: str, df, k: int = 3):
+    """Blocking wrapper around aspeculative_generate_and_execute.
+
+    Runs on the provider's shared event loop (agents.provider.run_async), so
+    the async LLM clients always see the same loop.
+    """
+    return run_async(aspeculative_generate_and_execute(prompt_base, df, k))
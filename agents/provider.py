@@ -0,0 +1,214 @@
+"""
+agents/provider.py
+
+One place that owns the chat-model clients used by the agents.
+
+* Clients are built lazily, once per (backend, model config), and shared by
+  every caller — the generator and the critic reuse the same client (and
+  its pooled HTTP/gRPC connections) when their configs match.
+* Per-role configuration lives in ``MODEL_CONFIG``; change it with
+  ``configure_model``.
+* The backend is swappable: ``gemini`` (default) or ``stub``, a local
+  deterministic stand-in for offline tests and latency/throughput
+  benchmarks.  Select it with ``SAFEFRAME_LLM_BACKEND=stub`` or
+  ``set_backend("stub")``; ``set_backend`` also accepts a factory callable
+  ``factory(**config) -> chat model``.
+* Async calls (``ainvoke``) all run on one long-lived event loop in a
+  daemon thread (``run_async``).  A client's async transport stays bound to
+  the loop that first used it, so a fresh ``asyncio.run`` per call would
+  hand later callers a client tied to a closed loop.
+* Nothing heavy happens at import: ``.env`` is read and the backend chosen
+  on the first ``get_llm`` / ``model_name`` call, and the langchain
+  integration is imported only when a Gemini client is actually built.
+
+Any chat model works as long as it has ``invoke`` / ``ainvoke`` returning an
+object with a ``.content`` string.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from utils.env import load_env
+
+MODEL_CONFIG: Dict[str, Dict[str, object]] = {
+    "generator": {"model": "gemini-2.0-flash", "temperature": 0},
+    "critic":    {"model": "gemini-2.0-flash", "temperature": 0},
+    # extra, independently sampled critic votes for consensus validation
+    "critic_vote": {"model": "gemini-2.0-flash", "temperature": 0.7},
+}
+
+
+# -----------------------------------------------------------------------------
+# Backends
+# -----------------------------------------------------------------------------
+
+def _gemini_factory(model: str, temperature: float = 0, **kwargs):
+    load_env()
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        google_api_key=os.getenv("GOOGLE_API_KEY"),
+        **kwargs,
+    )
+
+
+class StubMessage:
+    def __init__(self, content: str) -> None:
+        self.content = content
+
+
+STUB_CODE_REPLY = "_ = df.describe()"
+STUB_CRITIC_REPLY = '{"valid": true, "reason": "stub backend", "fix_hint": ""}'
+
+
+class StubChatModel:
+    """Offline stand-in for a chat model.
+
+    Parameters
+    ----------
+    responder : callable, optional
+        ``responder(prompt) -> str``; defaults to a canned reply that looks
+        like code for generator prompts and like a JSON verdict for critic
+        prompts.
+    latency : float
+        Seconds to sleep per call, to mimic network round-trips.
+    """
+
+    def __init__(self, model: str = "stub", temperature: float = 0,
+                 responder: Optional[Callable[[str], str]] = None,
+                 latency: float = 0.0, **_: object) -> None:
+        self.model = model
+        self.temperature = temperature
+        self.responder = responder or self._default_reply
+        self.latency = latency
+        self.calls = 0
+
+    @staticmethod
+    def _default_reply(prompt: str) -> str:
+        if "code-review assistant" in prompt:
+            return STUB_CRITIC_REPLY
+        return STUB_CODE_REPLY
+
+    def invoke(self, prompt: str) -> StubMessage:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return StubMessage(self.responder(prompt))
+
+    async def ainvoke(self, prompt: str) -> StubMessage:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return StubMessage(self.responder(prompt))
+
+
+_BACKENDS: Dict[str, Callable[..., object]] = {
+    "gemini": _gemini_factory,
+    "stub": StubChatModel,
+}
+
+
+# -----------------------------------------------------------------------------
+# Shared client registry
+# -----------------------------------------------------------------------------
+
+_backend_name: Optional[str] = None          # resolved on first use, after .env
+_factory: Optional[Callable[..., object]] = None
+_clients: Dict[tuple, object] = {}
+_lock = threading.Lock()
+
+
+def _resolve_backend() -> str:
+    """Pick the backend from SAFEFRAME_LLM_BACKEND the first time it's needed."""
+    global _backend_name, _factory
+    if _backend_name is None:
+        load_env()
+        name = os.getenv("SAFEFRAME_LLM_BACKEND", "gemini")
+        _backend_name, _factory = name, _BACKENDS.get(name, _gemini_factory)
+    return _backend_name
+
+
+def set_backend(backend) -> None:
+    """Switch backend by name ('gemini' / 'stub') or factory callable.
+
+    Drops every cached client so the next ``get_llm`` uses the new backend.
+    """
+    global _backend_name, _factory
+    with _lock:
+        if callable(backend):
+            _backend_name = getattr(backend, "__name__", "custom")
+            _factory = backend
+        else:
+            if backend not in _BACKENDS:
+                raise ValueError(f"Unknown LLM backend '{backend}'")
+            _backend_name, _factory = backend, _BACKENDS[backend]
+        _clients.clear()
+
+
+def configure_model(role: str, **config) -> None:
+    """Update the model config for *role* (e.g. model=..., temperature=...)."""
+    with _lock:
+        MODEL_CONFIG.setdefault(role, {}).update(config)
+
+
+def get_llm(role: str = "generator", **overrides):
+    """Return the shared client for *role*, building it on first use.
+
+    *overrides* (e.g. temperature=0.7) select a variant of the role's config;
+    each distinct variant gets its own shared client.
+    """
+    config = {**MODEL_CONFIG[role], **overrides}
+    with _lock:
+        key = (_resolve_backend(), tuple(sorted(config.items())))
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = _factory(**config)
+    return client
+
+
+def model_name(role: str = "generator", **overrides) -> str:
+    """Backend-qualified model name, e.g. for response-cache keys."""
+    config = {**MODEL_CONFIG[role], **overrides}
+    name = f"{config['model']}@t={config.get('temperature', 0)}"
+    backend = _resolve_backend()
+    return name if backend == "gemini" else f"{backend}:{name}"
+
+
+# -----------------------------------------------------------------------------
+# Event loop for async calls
+# -----------------------------------------------------------------------------
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _loop_thread
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever,
+                                            name="llm-event-loop", daemon=True)
+            _loop_thread.start()
+    return _loop
+
+
+def run_async(coro: Awaitable[T]) -> T:
+    """Run *coro* on the shared LLM event loop and block for its result.
+
+    Safe to call from any number of threads; the caller's context variables
+    (tracing spans) carry over.  Must not be called from the loop itself.
+    """
+    loop = _event_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("run_async() called from the LLM event loop; await instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
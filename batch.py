@@ -0,0 +1,196 @@
+"""
+batch.py
+
+Concurrent batch runner for evaluation query sets.
+
+Reads a JSONL file of ``{"data": <path>, "query": <question>, "id": ...}``
+records and runs ``main.answer_query`` (code cache, generate → guard/sandbox
+→ critic, final validation) for many of them at once on a bounded thread
+pool.  Most of a query's wall time is LLM network wait, so
+overlapping queries cuts a full benchmark pass from the *sum* of the
+round-trips to roughly the sum divided by the worker count.
+
+Each dataset is loaded (and its prompt context rendered) once and shared by
+every query against it.  Results are streamed to the output JSONL as they
+finish, one line per query:
+
+    {"id", "data", "query", "ok", "code", "error", "verdict",
+     "attempts", "critic_rounds", "result", "seconds", "stages"}
+
+(plus "cached_from" / "similarity" when the semantic code cache answered,
+and "reason" / "fix_hint" when the final validation rejected the answer).
+
+``stages`` holds the seconds spent per pipeline stage (see utils/tracing.py);
+the run summary on stderr reports p50/p99 per stage and retry causes.
+
+Usage
+-----
+    python3 batch.py --input queries.jsonl --output results.jsonl --workers 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Tuple
+
+from main import load_dataframe, dataframe_context, answer_query
+from utils.llm_cache import cache_stats
+from utils import tracing
+from agents.crosschecker import CONSENSUS_N, VALIDATION_POLICIES
+from sandbox import add_sandbox_args, attach_pool_from_args, figures_for_json
+
+
+def read_jsonl(path: str) -> Iterator[dict]:
+    """Yield one dict per non-empty line of *path*."""
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            rec = json.loads(line)
+            rec.setdefault("id", lineno)
+            yield rec
+
+
+class DatasetRegistry:
+    """Load each dataset (and its prompt context) once, on first use."""
+
+    def __init__(self, use_cache: bool = True, sandbox_args=None,
+                 chunk_rows: int = 0, compact: bool = False) -> None:
+        self.use_cache = use_cache
+        self.sandbox_args = sandbox_args
+        self.chunk_rows = chunk_rows
+        self.compact = compact
+        self._entries: Dict[str, Tuple[object, str]] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def get(self, path: str):
+        """Return (df, ctx) for *path*; concurrent callers share one load."""
+        with self._guard:
+            lock = self._locks.setdefault(path, threading.Lock())
+        with lock:
+            if path not in self._entries:
+                df = load_dataframe(path, use_cache=self.use_cache,
+                                    chunk_rows=self.chunk_rows, compact=self.compact)
+                if self.sandbox_args is not None:
+                    attach_pool_from_args(df, self.sandbox_args)
+                self._entries[path] = (df, dataframe_context(df, path))
+            return self._entries[path]
+
+
+def run_one(rec: dict, registry: DatasetRegistry, **answer_kwargs):
+    """Answer one batch record with main.answer_query; never raises.
+
+    *answer_kwargs* (validation, consensus_n, speculative, reuse) are passed
+    through; the record's dataset path is the code-cache source.
+
+    Returns (result row, list of tracing spans recorded for the query).
+    """
+    row = {"id": rec.get("id"), "data": rec.get("data"), "query": rec.get("query")}
+    t0 = time.perf_counter()
+    with tracing.trace(row["id"]) as tr:
+        try:
+            df, ctx = registry.get(rec["data"])
+            out = answer_query(df, ctx, rec["query"], source=rec["data"], **answer_kwargs)
+        except Exception as exc:
+            out = {"ok": False, "code": "", "error": f"{type(exc).__name__}: {exc}"}
+
+    row.update({k: v for k, v in out.items() if k not in ("result", "result_summary")})
+    if out["ok"]:
+        row["result"] = out["result_summary"]      # same shape as serve replies
+        row["figures"] = figures_for_json(out.get("figures", []))
+    row["seconds"] = round(time.perf_counter() - t0, 3)
+    row["stages"] = tr.stage_totals()
+    return row, tr.spans
+
+
+def run_batch(records: List[dict], output: str, workers: int = 4,
+              use_cache: bool = True, sandbox_args=None, speculative: int = 0,
+              chunk_rows: int = 0, reuse: bool = True, compact: bool = False,
+              validation: str = "single", consensus_n: int = CONSENSUS_N) -> dict:
+    """Run *records* concurrently and stream each result to *output*.
+
+    *sandbox_args* (parsed ``--sandbox-*`` flags) starts a process pool per
+    dataset; without it snippets run in-thread.  *validation* /
+    *consensus_n* pick the final-confirmation policy and *speculative* > 1
+    races that many generator candidates on the first attempt (see answer_query);
+    *chunk_rows* > 0 streams every dataset out-of-core (see load_dataframe);
+    *reuse* enables the semantic query→code cache; *compact* narrows
+    dtypes at load time (utils/compact.py).
+    Returns a small summary dict: counts plus total wall time.
+    """
+    registry = DatasetRegistry(use_cache=use_cache, sandbox_args=sandbox_args,
+                               chunk_rows=chunk_rows, compact=compact)
+    n_ok = 0
+    spans: List[dict] = []
+    t0 = time.perf_counter()
+
+    with open(output, "w", encoding="utf-8") as out_f, \
+            ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_one, rec, registry, validation=validation,
+                               consensus_n=consensus_n, speculative=speculative,
+                               reuse=reuse)
+                   for rec in records]
+        for fut in as_completed(futures):
+            row, row_spans = fut.result()
+            n_ok += bool(row["ok"])
+            spans.extend(row_spans)
+            out_f.write(json.dumps(row, default=str) + "\n")
+            out_f.flush()
+
+    return {"queries": len(records), "ok": n_ok,
+            "failed": len(records) - n_ok,
+            "wall_seconds": round(time.perf_counter() - t0, 3),
+            "llm_cache": cache_stats(),
+            "trace": tracing.summarize(spans)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SafeFrame-AI batch runner")
+    parser.add_argument("--input", required=True,
+                        help="JSONL of {data, query[, id]} records")
+    parser.add_argument("--output", required=True,
+                        help="Where to stream per-query JSONL results")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Queries in flight at once (default 4)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-parse text datasets instead of using the on-disk cache")
+    parser.add_argument("--trace",
+                        help="Also write every pipeline span to this JSONL file")
+    parser.add_argument("--validation", choices=VALIDATION_POLICIES, default="single",
+                        help="Final confirmation of accepted code (see main.py --help)")
+    parser.add_argument("--consensus-n", type=int, default=CONSENSUS_N,
+                        help="Critic votes for --validation consensus")
+    parser.add_argument("--speculative", type=int, default=0, metavar="K",
+                        help="Race K generator candidates on the first attempt (0 = off)")
+    parser.add_argument("--chunk-rows", type=int, default=0, metavar="N",
+                        help="Stream datasets in chunks of N rows (0 = load into memory)")
+    parser.add_argument("--no-reuse", action="store_true",
+                        help="Disable the semantic query→code cache")
+    parser.add_argument("--compact", action="store_true",
+                        help="Narrow dtypes losslessly at load time (float32, int32, category)")
+    add_sandbox_args(parser)
+    args = parser.parse_args()
+    if args.compact and args.chunk_rows:
+        parser.error("--compact applies to in-memory frames; drop --chunk-rows")
+    if args.trace:
+        tracing.set_span_sink(args.trace)
+
+    records = list(read_jsonl(args.input))
+    summary = run_batch(records, args.output, workers=args.workers,
+                        use_cache=not args.no_cache, sandbox_args=args,
+                        speculative=args.speculative, chunk_rows=args.chunk_rows,
+                        reuse=not args.no_reuse, compact=args.compact,
+                        validation=args.validation, consensus_n=args.consensus_n)
+    print(tracing.format_report(summary.pop("trace")), file=sys.stderr)
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+benchmarks/guard_bench.py
+
+Micro-benchmark for guard.validate_code throughput.
+
+Corpus: every code cell of the evaluation notebooks (real generated
+snippets for the UCI and Titanic query sets) plus a few snippets that
+exercise the failure paths (typos, unsafe calls, syntax errors).
+
+Reports snippets/second for
+    cold  – verdict cache cleared before every pass (parse + walk)
+    warm  – same corpus again (served from the LRU cache)
+
+Usage
+-----
+    python3 benchmarks/guard_bench.py [--repeat 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from guard import validate_code, guard_cache_info, _validate_cached  # noqa: E402
+
+NOTEBOOKS = ("notebook/llm_queries.ipynb", "notebook/llm_queries_titanic.ipynb")
+
+COLUMNS = [
+    # UCI household power
+    "Global_active_power", "Global_reactive_power", "Voltage", "Global_intensity",
+    "Sub_metering_1", "Sub_metering_2", "Sub_metering_3",
+    # Titanic
+    "PassengerId", "Survived", "Pclass", "Name", "Sex", "Age", "SibSp",
+    "Parch", "Ticket", "Fare", "Cabin", "Embarked",
+]
+
+EXTRA_SNIPPETS = [
+    "df['Voltgae'].mean()",
+    "import os\nos.system('ls')",
+    "eval('df.shape')",
+    "df.loc['2007-03', 'Global_active_power'].mean(",
+    "df['hour'] = df.index.hour\n_ = df.groupby('hour')['Global_active_power'].mean().idxmax()",
+]
+
+
+def load_corpus() -> List[str]:
+    snippets: List[str] = []
+    for rel in NOTEBOOKS:
+        with open(os.path.join(ROOT, rel), "r", encoding="utf-8") as f:
+            nb = json.load(f)
+        for cell in nb["cells"]:
+            if cell["cell_type"] == "code":
+                src = "".join(cell["source"]).strip()
+                if src:
+                    snippets.append(src)
+    return snippets + EXTRA_SNIPPETS
+
+
+def _pass(corpus: List[str], meta: dict) -> None:
+    for code in corpus:
+        validate_code(code, meta)
+
+
+def bench(repeat: int) -> dict:
+    corpus = load_corpus()
+    meta = {"columns": COLUMNS}
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        _validate_cached.cache_clear()
+        _pass(corpus, meta)
+    cold = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        _pass(corpus, meta)
+    warm = time.perf_counter() - t0
+
+    n = len(corpus) * repeat
+    return {
+        "snippets": len(corpus),
+        "repeat": repeat,
+        "cold_per_sec": round(n / cold),
+        "warm_per_sec": round(n / warm),
+        "cold_us_per_snippet": round(cold / n * 1e6, 1),
+        "warm_us_per_snippet": round(warm / n * 1e6, 1),
+        "cache": guard_cache_info()._asdict(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="guard.validate_code micro-benchmark")
+    parser.add_argument("--repeat", type=int, default=200,
+                        help="Passes over the corpus per mode (default 200)")
+    args = parser.parse_args()
+    print(json.dumps(bench(args.repeat), indent=2))
@@ -0,0 +1,353 @@
+"""
+benchmarks/pipeline_bench.py
+
+Offline, reproducible benchmark of the full agent pipeline.
+
+The 30 evaluation queries (UCI household power + Titanic) are replayed
+through ``repair_with_critic`` (and so ``try_generate_and_execute``) with a
+deterministic stub model: the generator returns the code recorded for the
+query in the evaluation notebooks, the critic always approves.  No API key
+or network access is needed.
+
+The data is synthetic:
+    uci      – UCI-shaped readings over 2006-12-16 → 2010-11-26, seeded, at
+               every ``--sizes`` entry (coarser than a minute below 2.07m rows)
+    titanic  – Titanic-shaped passenger table (891 rows)
+
+Per query it records end-to-end latency, sandbox seconds (sample + full
+tier), attempts / critic rounds and, from a second replay under tracemalloc
+(so tracing overhead never skews the timings), peak traced memory.  The per-dataset
+summary (p50/p95 latency, sandbox total, max peak memory, mean attempts,
+answered count) is compared with a stored baseline; a metric that got worse
+by more than ``--tolerance`` is a regression and the exit status is 1.
+A missing baseline also exits 1 (``--allow-missing-baseline`` to only warn);
+benchmarks/pipeline_baseline.json holds the one for the default sizes.
+
+Usage
+-----
+    python3 benchmarks/pipeline_bench.py                # 10k,100k vs. the stored baseline
+    python3 benchmarks/pipeline_bench.py --sizes 10k,1m,20m --baseline big.json --save-baseline
+    python3 benchmarks/pipeline_bench.py --output run.json
+    python3 benchmarks/pipeline_bench.py --sizes 1m --compact   # vs. the float64 baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from typing import List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import matplotlib  # noqa: E402
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import sandbox  # noqa: E402
+from agents import provider  # noqa: E402
+from agents.crosschecker import repair_with_critic, _verdicts  # noqa: E402
+from main import dataframe_context  # noqa: E402
+from utils import tracing  # noqa: E402
+from utils.compact import compact_frame, memory_mb  # noqa: E402
+from utils.llm_cache import set_response_cache  # noqa: E402
+from utils.prompt import render_generation_prompt  # noqa: E402
+
+NOTEBOOKS = {"uci": "notebook/llm_queries.ipynb",
+             "titanic": "notebook/llm_queries_titanic.ipynb"}
+BASELINE = os.path.join(ROOT, "benchmarks", "pipeline_baseline.json")
+DEFAULT_SIZES = "10k,100k"                     # CI-sized; pass 1m,20m for the large frames
+TITANIC_ROWS = 891
+UCI_START, UCI_END = "2006-12-16 17:24", "2010-11-26 21:02"   # the real dataset's range
+SEED = 0
+
+_QUERY_RE = re.compile(r"User Query\s*\d+:\s*(.+)")
+_SIZE_RE = re.compile(r"^(\d+(?:\.\d+)?)([km]?)$", re.I)
+
+# metric → True when bigger is worse
+_METRICS = {"latency_p50": True, "latency_p95": True, "sandbox_seconds": True,
+            "peak_mb": True, "mean_attempts": True, "answered": False}
+
+
+# -----------------------------------------------------------------------------
+# Inputs
+# -----------------------------------------------------------------------------
+
+def load_recorded(dataset: str) -> List[Tuple[str, str]]:
+    """(query, recorded generator reply) pairs from the evaluation notebook."""
+    with open(os.path.join(ROOT, NOTEBOOKS[dataset]), "r", encoding="utf-8") as f:
+        cells = json.load(f)["cells"]
+    pairs = []
+    for cell, reply in zip(cells, cells[1:]):
+        match = _QUERY_RE.search("".join(cell["source"]))
+        if cell["cell_type"] == "markdown" and match and reply["cell_type"] == "code":
+            pairs.append((match.group(1).strip("* "), "".join(reply["source"])))
+    return pairs
+
+
+def parse_size(text: str) -> int:
+    match = _SIZE_RE.match(text.strip())
+    if not match:
+        raise argparse.ArgumentTypeError(f"Bad size '{text}' (e.g. 10k, 1m, 20m)")
+    scale = {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2).lower()]
+    return int(float(match.group(1)) * scale)
+
+
+def make_uci(rows: int, seed: int = SEED) -> pd.DataFrame:
+    """UCI-shaped readings over the real date range, same columns/dtypes.
+
+    The step is scaled to *rows* (whole seconds, one minute at the real
+    2,075,259 rows), so the replayed questions about 2007-2010 dates find
+    data at every size.
+    """
+    rng = np.random.default_rng(seed)
+    span = pd.Timestamp(UCI_END) - pd.Timestamp(UCI_START)
+    step = max(pd.Timedelta(seconds=1), (span / max(rows - 1, 1)).floor("s"))
+    index = pd.date_range(UCI_START, periods=rows, freq=step, name="datetime")
+    active = rng.gamma(1.5, 0.7, rows).round(3)
+    return pd.DataFrame({
+        "Global_active_power": active,
+        "Global_reactive_power": rng.gamma(1.2, 0.1, rows).round(3),
+        "Voltage": rng.normal(240.8, 3.2, rows).round(2),
+        "Global_intensity": (active * 4.2).round(1),
+        "Sub_metering_1": rng.poisson(1.1, rows).astype(float),
+        "Sub_metering_2": rng.poisson(1.3, rows).astype(float),
+        "Sub_metering_3": rng.poisson(6.4, rows).astype(float),
+    }, index=index)
+
+
+def make_titanic(rows: int = TITANIC_ROWS, seed: int = SEED) -> pd.DataFrame:
+    """Titanic-shaped passenger table with the Kaggle train.csv columns."""
+    rng = np.random.default_rng(seed)
+    pclass = rng.choice([1, 2, 3], rows, p=[0.24, 0.21, 0.55])
+    decks = np.array(list("ABCDEFG"))
+    cabin = np.where(rng.random(rows) < 0.23,
+                     [f"{d}{n}" for d, n in zip(rng.choice(decks, rows),
+                                                rng.integers(1, 130, rows))], None)
+    age = rng.normal(29.7, 14.5, rows).clip(0.4, 80).round(1)
+    age[rng.random(rows) < 0.2] = np.nan
+    return pd.DataFrame({
+        "PassengerId": np.arange(1, rows + 1),
+        "Survived": (rng.random(rows) < np.select([pclass == 1, pclass == 2],
+                                                  [0.63, 0.47], 0.24)).astype(int),
+        "Pclass": pclass,
+        "Name": [f"Passenger, Mr. No{i}" for i in range(rows)],
+        "Sex": rng.choice(["male", "female"], rows, p=[0.65, 0.35]),
+        "Age": age,
+        "SibSp": rng.choice([0, 1, 2, 3, 4, 5, 8], rows,
+                            p=[0.68, 0.23, 0.03, 0.02, 0.02, 0.01, 0.01]),
+        "Parch": rng.choice([0, 1, 2, 3, 4, 5, 6], rows,
+                            p=[0.76, 0.13, 0.09, 0.005, 0.005, 0.005, 0.005]),
+        "Ticket": [f"T{n}" for n in rng.integers(1000, 400000, rows)],
+        "Fare": rng.gamma(1.2, 27.0, rows).round(4),
+        "Cabin": cabin,
+        "Embarked": rng.choice(["S", "C", "Q"], rows, p=[0.72, 0.19, 0.09]),
+    })
+
+
+# -----------------------------------------------------------------------------
+# Replay model
+# -----------------------------------------------------------------------------
+
+class Replay:
+    """Stub responder: recorded code for the current query, approving critic."""
+
+    def __init__(self) -> None:
+        self.reply = ""
+
+    def __call__(self, prompt: str) -> str:
+        if "code-review assistant" in prompt:
+            return provider.STUB_CRITIC_REPLY
+        return self.reply
+
+
+def _use_replay(replay: Replay) -> None:
+    def factory(model: str = "stub", temperature: float = 0, **_):
+        return provider.StubChatModel(model, temperature, responder=replay)
+    factory.__name__ = "replay"
+    provider.set_backend(factory)
+    set_response_cache(None)                   # every query takes the full path
+
+
+# -----------------------------------------------------------------------------
+# Runs
+# -----------------------------------------------------------------------------
+
+def _replay_query(df: pd.DataFrame, ctx: str, query: str):
+    with tracing.trace(query) as tr, contextlib.redirect_stdout(io.StringIO()):
+        out = repair_with_critic(render_generation_prompt(ctx, query), df, ctx, query)
+    plt.close("all")
+    return out, tr
+
+
+def _peak_memory_mb(df: pd.DataFrame, ctx: str, query: str) -> float:
+    """Peak traced allocation of one more replay of *query*, in MiB.
+
+    A separate pass, so tracemalloc's overhead never skews the timings.
+    """
+    tracemalloc.start()
+    try:
+        _replay_query(df, ctx, query)
+        return round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+    finally:
+        tracemalloc.stop()
+
+
+def run_query(df: pd.DataFrame, ctx: str, query: str, measure_memory: bool) -> dict:
+    t0 = time.perf_counter()
+    out, tr = _replay_query(df, ctx, query)
+    latency = time.perf_counter() - t0
+    stages = tr.stage_totals()
+    row = {"query": query, "ok": out["ok"], "latency": round(latency, 4),
+           "sandbox_seconds": round(sum(v for k, v in stages.items()
+                                        if k.startswith("sandbox")), 4),
+           "attempts": out["attempts"], "critic_rounds": out.get("critic_rounds", 0),
+           "peak_mb": _peak_memory_mb(df, ctx, query) if measure_memory else None}
+    if not out["ok"]:
+        row["error"] = out.get("error", "")[:200]
+    return row
+
+
+def summarize_rows(rows: List[dict]) -> dict:
+    latencies = sorted(r["latency"] for r in rows)
+    peaks = [r["peak_mb"] for r in rows if r["peak_mb"] is not None]
+    return {
+        "queries": len(rows),
+        "answered": sum(r["ok"] for r in rows),
+        "latency_p50": round(tracing._percentile(latencies, 50), 4),
+        "latency_p95": round(tracing._percentile(latencies, 95), 4),
+        "sandbox_seconds": round(sum(r["sandbox_seconds"] for r in rows), 4),
+        "peak_mb": max(peaks) if peaks else None,
+        "mean_attempts": round(sum(r["attempts"] for r in rows) / len(rows), 3),
+    }
+
+
+def bench_dataset(name: str, df: pd.DataFrame, replay: Replay,
+                  measure_memory: bool) -> dict:
+    ctx = dataframe_context(df)
+    rows = []
+    for query, reply in load_recorded(name.split("@")[0]):
+        replay.reply = reply
+        rows.append(run_query(df, ctx, query, measure_memory))
+    return {"rows": len(df), "summary": summarize_rows(rows), "queries": rows}
+
+
+def bench(sizes: List[int], timeout: float, measure_memory: bool = True,
+          compact: bool = False) -> dict:
+    replay = Replay()
+    _use_replay(replay)
+    sandbox.DEFAULT_TIMEOUT = timeout
+
+    results = {}
+    datasets = [(f"uci@{n}", lambda n=n: make_uci(n)) for n in sizes]
+    datasets.append(("titanic", make_titanic))
+    for name, build in datasets:
+        _verdicts.clear()                       # critic memo must not carry over
+        df = build()
+        footprint = None
+        if compact:
+            df, footprint = compact_frame(df)
+        t0 = time.perf_counter()
+        results[name] = bench_dataset(name, df, replay, measure_memory)
+        results[name]["wall_seconds"] = round(time.perf_counter() - t0, 3)
+        results[name]["frame_mb"] = footprint["after_mb"] if footprint else memory_mb(df)
+        print(f"{name:<14} {results[name]['summary']}", file=sys.stderr)
+        sandbox._samples.clear()                # drop the sample (and the frame ref)
+        del df
+        gc.collect()
+
+    return {"python": sys.version.split()[0], "pandas": pd.__version__,
+            "timeout": timeout, "compact": compact, "datasets": results}
+
+
+# -----------------------------------------------------------------------------
+# Baseline comparison
+# -----------------------------------------------------------------------------
+
+def compare(run: dict, baseline: dict, tolerance: float,
+            min_seconds: float = 0.005) -> List[str]:
+    """Regression messages for every metric worse than *baseline* by > *tolerance*.
+
+    Timing deltas below *min_seconds* are ignored as noise.
+    """
+    problems = []
+    for name, result in run["datasets"].items():
+        base = baseline.get("datasets", {}).get(name)
+        if base is None:
+            continue
+        for metric, bigger_is_worse in _METRICS.items():
+            now, before = result["summary"].get(metric), base["summary"].get(metric)
+            if now is None or before is None:
+                continue
+            if not bigger_is_worse:
+                if now < before:
+                    problems.append(f"{name}: {metric} {before} → {now}")
+                continue
+            slack = min_seconds if metric.startswith(("latency", "sandbox")) else 0.0
+            if now > before * (1 + tolerance) + slack:
+                problems.append(f"{name}: {metric} {before} → {now} "
+                                f"(+{(now / before - 1) * 100 if before else float('inf'):.0f}%)")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"Comma-separated UCI row counts (default {DEFAULT_SIZES})")
+    parser.add_argument("--timeout", type=float, default=sandbox.DEFAULT_TIMEOUT,
+                        help="Sandbox seconds per snippet (default %(default)s)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip the tracemalloc pass that measures peak memory")
+    parser.add_argument("--compact", action="store_true",
+                        help="Narrow dtypes first (utils/compact.py), as main.py --compact")
+    parser.add_argument("--output", help="Write the full run (per-query rows) as JSON here")
+    parser.add_argument("--baseline", default=BASELINE,
+                        help="Baseline JSON to compare against (default %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store this run as the new baseline instead of comparing")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="Only warn (exit 0) when there is no baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown before flagging (default 0.25)")
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline)
+    os.chdir(ROOT)                              # prompt templates are repo-relative
+
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    run = bench(sizes, args.timeout, measure_memory=not args.no_memory,
+                compact=args.compact)
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2, default=str)
+    print(json.dumps({k: v["summary"] for k, v in run["datasets"].items()}, indent=2))
+
+    if args.save_baseline:
+        with open(baseline, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2, default=str)
+        print(f"baseline saved to {baseline}", file=sys.stderr)
+        return 0
+    if not os.path.exists(baseline):
+        print(f"no baseline at {baseline}; rerun with --save-baseline to store one",
+              file=sys.stderr)
+        return 0 if args.allow_missing_baseline else 1
+    with open(baseline, "r", encoding="utf-8") as f:
+        problems = compare(run, json.load(f), args.tolerance)
+    for line in problems:
+        print("REGRESSION", line, file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+benchmarks/startup_bench.py
+
+Cold-start benchmark for the CLI entry point.
+
+Each scenario runs in a fresh interpreter, ``--repeat`` times:
+
+    import     – ``import main``
+    help       – ``main.py --help``
+    cache_hit  – ``main.py ask`` (default flags) on a small CSV whose question
+                 is already in the semantic code cache (no LLM call, and no
+                 sandbox workers: the pool only starts on a cache miss)
+
+It reports the median wall time and which heavy modules got imported.
+A scenario that imports a module it must not (pandas for ``--help``, the
+langchain integration or matplotlib for a cache hit, ...) always fails.
+Median times are compared with a stored baseline like
+benchmarks/pipeline_bench.py; a slowdown beyond ``--tolerance`` is a
+regression and the exit status is 1, as is a missing baseline
+(``--allow-missing-baseline`` to only warn).  benchmarks/startup_baseline.json
+is the committed one.
+
+Usage
+-----
+    python3 benchmarks/startup_bench.py [--repeat 5]
+    python3 benchmarks/startup_bench.py --save-baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE = os.path.join(ROOT, "benchmarks", "startup_baseline.json")
+
+HEAVY = ("pandas", "numpy", "pyarrow", "matplotlib", "seaborn", "dotenv",
+         "langchain_core", "langchain_google_genai")
+
+# modules each scenario must not import
+FORBIDDEN: Dict[str, tuple] = {
+    "import":    HEAVY,
+    "help":      HEAVY,
+    "cache_hit": ("matplotlib", "seaborn", "dotenv",
+                  "langchain_core", "langchain_google_genai"),
+}
+
+CACHE_HIT_QUERY = "What is the average Fare per Pclass?"
+CACHE_HIT_CODE = "_ = df.groupby('Pclass')['Fare'].mean()"
+
+# runs in the child: execute main.py (or import main) and report sys.modules
+_PROBE = """
+import json, runpy, sys
+out, mode, argv = sys.argv[1], sys.argv[2], sys.argv[3:]
+sys.path.insert(0, {root!r})
+try:
+    if mode == "import":
+        import main  # noqa: F401
+    else:
+        sys.argv = ["main.py"] + argv
+        runpy.run_path("main.py", run_name="__main__")
+except SystemExit:
+    pass
+with open(out, "w") as f:
+    json.dump(sorted({{m.split(".")[0] for m in sys.modules}}), f)
+"""
+
+
+def make_cache_hit_dataset(folder: str) -> str:
+    """Small CSV plus a code-cache entry for ``CACHE_HIT_QUERY``."""
+    import pandas as pd
+    from main import dataframe_context, load_dataframe
+    from utils.code_cache import get_code_cache, schema_fingerprint
+
+    path = os.path.join(folder, "passengers.csv")
+    pd.DataFrame({"Pclass": [1, 2, 3, 1, 3] * 20,
+                  "Fare": [71.3, 13.0, 7.9, 53.1, 8.1] * 20}).to_csv(path, index=False)
+    df = load_dataframe(path)               # warm the Feather + profile caches
+    dataframe_context(df, path)
+    get_code_cache(path).store(schema_fingerprint(df), CACHE_HIT_QUERY, CACHE_HIT_CODE)
+    return path
+
+
+def scenarios(data_path: str) -> Dict[str, List[str]]:
+    return {
+        "import":    ["import"],
+        "help":      ["run", "--help"],
+        # default flags: a hit must not start sandbox workers
+        "cache_hit": ["run", "ask", "--data", data_path, "--query", CACHE_HIT_QUERY],
+    }
+
+
+def run_scenario(args: List[str], repeat: int) -> dict:
+    """Median wall seconds over *repeat* fresh interpreters + modules imported."""
+    times, modules = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "modules.json")
+        probe = _PROBE.format(root=ROOT)
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, "-c", probe, out, *args], cwd=ROOT,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                           check=True)
+            times.append(time.perf_counter() - t0)
+            with open(out, "r", encoding="utf-8") as f:
+                modules = json.load(f)
+    return {"median_s": round(statistics.median(times), 4),
+            "min_s": round(min(times), 4),
+            "heavy": [m for m in HEAVY if m in modules]}
+
+
+def bench(repeat: int) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        data_path = make_cache_hit_dataset(folder)
+        for name, args in scenarios(data_path).items():
+            results[name] = run_scenario(args, repeat)
+    return {"python": sys.version.split()[0], "repeat": repeat, "scenarios": results}
+
+
+def check_imports(run: dict) -> List[str]:
+    return [f"{name}: imported {m}"
+            for name, result in run["scenarios"].items()
+            for m in result["heavy"] if m in FORBIDDEN.get(name, ())]
+
+
+def compare(run: dict, baseline: dict, tolerance: float,
+            min_seconds: float = 0.02) -> List[str]:
+    """Scenarios whose median got slower than *baseline* by > *tolerance*.
+
+    Deltas below *min_seconds* are ignored as interpreter-startup noise.
+    """
+    problems = []
+    for name, result in run["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        now, before = result["median_s"], base["median_s"]
+        if now > before * (1 + tolerance) + min_seconds:
+            problems.append(f"{name}: median {before}s → {now}s "
+                            f"(+{(now / before - 1) * 100:.0f}%)")
+    return problems
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="CLI cold-start benchmark")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="Fresh interpreters per scenario (default %(default)s)")
+    parser.add_argument("--baseline", default=BASELINE,
+                        help="Baseline JSON to compare against (default %(default)s)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Store this run as the new baseline instead of comparing")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="Only warn (exit 0) when there is no baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative slowdown before flagging (default 0.25)")
+    args = parser.parse_args(argv)
+
+    run = bench(max(1, args.repeat))
+    print(json.dumps(run["scenarios"], indent=2))
+
+    problems = check_imports(run)
+    if args.save_baseline and not problems:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(run, f, indent=2)
+        print(f"baseline saved to {args.baseline}", file=sys.stderr)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems += compare(run, json.load(f), args.tolerance)
+    else:
+        print(f"no baseline at {args.baseline}; rerun with --save-baseline to store one",
+              file=sys.stderr)
+    for line in problems:
+        print("REGRESSION", line, file=sys.stderr)
+    missing = not args.save_baseline and not os.path.exists(args.baseline)
+    return 1 if problems or (missing and not args.allow_missing_baseline) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
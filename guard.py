@@ -7,7 +7,8 @@ Functions:
     validate_code(code_str: str, df_meta: dict, allowed_names: set[str] | None = None) -> dict
         Returns a dict: {'ok': bool, 'issues': list[str]}
 
-The guard performs three fast static checks without executing the code:
+The guard performs three fast static checks in one AST walk, without executing
+the code (verdicts are LRU-cached per code + column set):
 1. **Syntax gate** – Using ast.parse.
 2. **Safety visitor** – Blocks import statements, eval/exec, and dangerous attribute roots.
 3. **Schema check** – Extracts df['col'] accesses and verifies them against df_meta['columns'].
@@ -19,15 +20,16 @@ from __future__ import annotations
 
 import ast
 import difflib
-from typing import Dict, List, Set, Tuple
 import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Set, Tuple
 
 # -----------------------------------------------------------------------------
 # Configuration
 # -----------------------------------------------------------------------------
 
 # Base names that a generated snippet is allowed to reference without complaint
-_BASE_ALLOWED_NAMES: Set[str] = {
+_BASE_ALLOWED_NAMES: FrozenSet[str] = frozenset({
     "df",        # the DataFrame itself
     "pd",        # pandas alias
     "np",        # numpy alias
@@ -38,22 +40,35 @@ _BASE_ALLOWED_NAMES: Set[str] = {
     "x",         # common variable names for plotting
     "y",         # common variable names for plotting
     "_",       # common placeholder for final result
-}
+})
 
 # Attribute roots that are considered unsafe (prevent file/network/system ops)
 _DISALLOWED_ATTR_PREFIXES: Tuple[str, ...] = (
     "os", "sys", "subprocess", "shutil", "socket", "pathlib", "builtins", "open", "eval", "exec", "__",
 )
 
+# 'YYYY-MM' or 'YYYY-MM-DD' string subscripts are index slices, not columns
+DATE_SLICE_RE = re.compile(r"^\d{4}-\d{2}(-\d{2})?$")
+
+_DISALLOWED_CALLS = frozenset({"eval", "exec", "__import__"})
+
+# Verdicts kept for repeated / cached generations
+GUARD_CACHE_SIZE = 2048
+
 # -----------------------------------------------------------------------------
-# AST Visitors
+# AST Visitor
 # -----------------------------------------------------------------------------
 
 class SafeNodeVisitor(ast.NodeVisitor):
-    def __init__(self) -> None:
+    """Single walk that does the safety, column and name checks together."""
+
+    def __init__(self, allowed_names: Set[str] | frozenset = frozenset()) -> None:
         self.errors: List[str] = []
         self.columns: Set[str] = set()   # columns read
         self.created: Set[str] = set()  # variables created (to avoid false positives)
+        self.allowed_names = allowed_names
+        self.defined: Set[str] = set()   # names assigned so far (walk order)
+        self.unknown: List[str] = []     # names loaded before any definition
 
     # --- Import statements ---
     # def visit_Import(self, node: ast.Import) -> None:  # noqa: N802 (snake‑case enforced elsewhere)
@@ -64,7 +79,7 @@ class SafeNodeVisitor(ast.NodeVisitor):
 
     # --- eval/exec ---
     def visit_Call(self, node: ast.Call) -> None:  # noqa: N802
-        if isinstance(node.func, ast.Name) and node.func.id in {"eval", "exec", "__import__"}:
+        if isinstance(node.func, ast.Name) and node.func.id in _DISALLOWED_CALLS:
             self.errors.append(f"Disallowed call to {node.func.id}()")
         self.generic_visit(node)
 
@@ -76,16 +91,13 @@ class SafeNodeVisitor(ast.NodeVisitor):
         self.generic_visit(node)
 
     # --- df["col"] accesses ---
-    DATE_SLICE_RE = re.compile(r"^\d{4}-\d{2}(-\d{2})?$")  # 'YYYY-MM' or 'YYYY-MM-DD'
-
     def visit_Subscript(self, node: ast.Subscript) -> None:
-        DATE_SLICE_RE = re.compile(r"^\d{4}-\d{2}(-\d{2})?$")
         if (
             isinstance(node.value, ast.Name)
             and node.value.id == "df"
-            and isinstance(node.slice, (ast.Constant, ast.Str))
+            and isinstance(node.slice, ast.Constant)
         ):
-            col = node.slice.s if isinstance(node.slice, ast.Str) else node.slice.value
+            col = node.slice.value
 
             # skip date-like index slices
             if isinstance(col, str) and DATE_SLICE_RE.match(col):
@@ -99,6 +111,19 @@ class SafeNodeVisitor(ast.NodeVisitor):
                     self.columns.add(col)
         self.generic_visit(node)
 
+    # --- bare names (unknown globals) ---
+    def visit_Name(self, node: ast.Name) -> None:             # noqa: N802
+        if isinstance(node.ctx, ast.Store):
+            # variable is created/assigned → remember it
+            self.defined.add(node.id)
+        elif (
+            isinstance(node.ctx, ast.Load)
+            and node.id not in self.allowed_names
+            and node.id not in self.defined
+        ):
+            # columns may be read later in the walk; resolved in validate_code
+            self.unknown.append(node.id)
+
     # ---------------------------------------------------------------------
     # Helpers
     # ---------------------------------------------------------------------
@@ -129,9 +154,46 @@ def _check_columns(used: Set[str], known: Set[str]) -> List[str]:
     return issues
 
 
+@lru_cache(maxsize=GUARD_CACHE_SIZE)
+def _validate_cached(code_str: str, columns: FrozenSet[str],
+                     allowed_names: FrozenSet[str]) -> Tuple[bool, Tuple[str, ...]]:
+    """Guard verdict for (code, column set, allowed names); memoised."""
+    # ------------------------------------------------------------------
+    # 1. Syntax check
+    # ------------------------------------------------------------------
+    try:
+        tree = ast.parse(code_str, mode="exec")
+    except SyntaxError as exc:
+        return False, (f"SyntaxError: {exc.msg} (line {exc.lineno})",)
+
+    # ------------------------------------------------------------------
+    # 2. Safety + column + name collection (one walk)
+    # ------------------------------------------------------------------
+    visitor = SafeNodeVisitor(allowed_names)
+    visitor.visit(tree)
+    issues: List[str] = list(visitor.errors)
+
+    # ------------------------------------------------------------------
+    # 3. Column‑name validation
+    # ------------------------------------------------------------------
+    known_cols: Set[str] = set(columns) | visitor.created   # ← CHANGED
+    issues.extend(_check_columns(visitor.columns, known_cols))
+
+    # ------------------------------------------------------------------
+    # 4. Name validation (unknown globals)
+    # ------------------------------------------------------------------
+    issues.extend(f"Use of unknown variable '{name}'"
+                  for name in visitor.unknown if name not in visitor.columns)
+
+    return not issues, tuple(issues)
+
+
 def validate_code(code_str: str, df_meta: Dict[str, object], *, allowed_names: Set[str] | None = None) -> Dict[str, object]:
     """Fast static validation of a generated pandas snippet.
 
+    Verdicts are cached (LRU, keyed by the code and the column / allowed-name
+    sets), so re-validating a repeated or cached generation is free.
+
     Parameters
     ----------
     code_str : str
@@ -148,55 +210,15 @@ def validate_code(code_str: str, df_meta: Dict[str, object], *, allowed_names: S
         'issues' → list[str]  (empty if ok)
     """
 
-    allowed_names = (_BASE_ALLOWED_NAMES | (allowed_names or set()))
-    issues: List[str] = []
-
-    # ------------------------------------------------------------------
-    # 1. Syntax check
-    # ------------------------------------------------------------------
-    try:
-        tree = ast.parse(code_str, mode="exec")
-    except SyntaxError as exc:
-        return {
-            "ok": False,
-            "issues": [f"SyntaxError: {exc.msg} (line {exc.lineno})"],
-        }
-
-    # ------------------------------------------------------------------
-    # 2. Safety + column collection visitor
-    # ------------------------------------------------------------------
-    visitor = SafeNodeVisitor()
-    visitor.visit(tree)
-    issues.extend(visitor.errors)
+    allowed = _BASE_ALLOWED_NAMES | frozenset(allowed_names or ())
+    columns = frozenset(str(c) for c in df_meta.get("columns", []))
+    ok, issues = _validate_cached(code_str, columns, allowed)
+    return {"ok": ok, "issues": list(issues)}
 
-    # ------------------------------------------------------------------
-    # 3. Column‑name validation
-    # ------------------------------------------------------------------
-    known_cols: Set[str] = set(df_meta.get("columns", [])) | visitor.created   # ← CHANGED
-    issues.extend(_check_columns(visitor.columns, known_cols))
 
-    # ------------------------------------------------------------------
-    # 4. Name validation (unknown globals)
-    # ------------------------------------------------------------------
-    class NameCollector(ast.NodeVisitor):
-        def __init__(self) -> None:
-            self.defined: set[str] = set()
-
-        def visit_Name(self, node: ast.Name) -> None:             # noqa: N802
-            if isinstance(node.ctx, ast.Store):
-                # variable is created/assigned → remember it
-                self.defined.add(node.id)
-            elif (
-                isinstance(node.ctx, ast.Load)
-                and node.id not in allowed_names
-                and node.id not in visitor.columns
-                and node.id not in self.defined          # <-- new check
-            ):
-                issues.append(f"Use of unknown variable '{node.id}'")
-
-    NameCollector().visit(tree)
-
-    return {"ok": not issues, "issues": issues}
+def guard_cache_info():
+    """Hit/miss statistics of the verdict cache (functools CacheInfo)."""
+    return _validate_cached.cache_info()
 
 
 # -----------------------------------------------------------------------------
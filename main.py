@@ -1,80 +1,339 @@
+from __future__ import annotations
+
 import argparse
+import contextlib
+import json
 import os
-import pandas as pd
-import matplotlib           # use a non-GUI backend for headless safety
-matplotlib.use("Agg")
+import sys
+import time
+from typing import TYPE_CHECKING
+
+# Only light modules at import time: pandas and the data layer load with the
+# dataset, matplotlib with the first plotting snippet (sandbox.py), the LLM
+# client on the first cache miss (agents/provider.py).  See
+# benchmarks/startup_bench.py.
+from utils.prompt import render_generation_prompt, load_prompt, LAZY_FRAME_NOTE
+from utils.code_cache import get_code_cache, schema_fingerprint
+from agents.meta_agent import guard_and_run   # guard+sandbox loop
+from agents.crosschecker import (validate_answer, repair_with_critic,
+                                 VALIDATION_POLICIES, CONSENSUS_N)
+from sandbox import (add_sandbox_args, attach_pool_from_args, ensure_pool,
+                     figures_for_json, save_figures)
+from utils import tracing
 
-from utils.preprocess import ucl_dataset_prep
-from utils.prompt import load_prompt
-from agents.meta_agent import try_generate_and_execute        # guard+sandbox loop
-from agents.crosschecker import cross_check, repair_with_critic
+if TYPE_CHECKING:
+    import pandas as pd
 
 # ───────────────────────── helpers ──────────────────────────
 
-def dataframe_context(df: pd.DataFrame, n_rows: int = 5) -> str:
-    """Return schema + n sample rows as markdown-flavoured text."""
-    schema = "\n".join(f"- **{c}**: {t}" for c, t in df.dtypes.items())
-    sample = df.head(n_rows).to_markdown(index=False)
-    return f"### Dataset schema\n{schema}\n\n### Sample rows\n{sample}\n"
+def dataframe_context(df: pd.DataFrame, source: str | None = None) -> str:
+    """Return schema, column stats + sample rows as compact text.
+
+    With *source* the profile is cached next to the dataset (utils/profile.py),
+    so warm starts skip the stats pass entirely.  A LazyFrame also gets the
+    note describing the chunked API the generated code must use.
+    """
+    from utils.lazy import LazyFrame
+    from utils.profile import load_profile, render_profile
+
+    profile = load_profile(df, source, loader_version(source) if source else "")
+    if isinstance(df, LazyFrame):
+        return render_profile(profile) + "\n" + load_prompt(LAZY_FRAME_NOTE)
+    return render_profile(profile)
+
+
+def row_count(df: pd.DataFrame, source: str | None = None) -> int:
+    """Number of rows in *df*.
+
+    A LazyFrame's count comes from its (cached) profile, so logging it
+    doesn't stream the whole source again.
+    """
+    from utils.lazy import LazyFrame
+    from utils.profile import load_profile
+
+    if isinstance(df, LazyFrame):
+        return load_profile(df, source, loader_version(source) if source else "")["rows"]
+    return len(df)
+
+CSV_LOADER_VERSION = "1"
+
+def loader_version(path: str, compact: bool = False) -> str:
+    """Version of the loader used for *path* (part of cache keys)."""
+    from utils.preprocess import UCL_LOADER_VERSION
 
-def load_dataframe(path: str) -> pd.DataFrame:
-    """Dispatch loader by file extension."""
     if path.endswith(".txt"):
-        return ucl_dataset_prep(path)
-    if path.endswith(".csv"):
-        return pd.read_csv(path)
-    if path.endswith(".xlsx"):
-        return pd.read_excel(path)
-    if path.endswith(".parquet"):
-        return pd.read_parquet(path)
-    if path.endswith(".feather"):
-        return pd.read_feather(path)
-    raise ValueError("Unsupported file type: " + os.path.basename(path))
+        version = UCL_LOADER_VERSION
+    elif path.endswith(".csv"):
+        version = CSV_LOADER_VERSION
+    else:
+        version = "raw"
+    if compact:
+        from utils.compact import COMPACT_VERSION
+        version += f"+compact{COMPACT_VERSION}"
+    return version
+
+def load_dataframe(path: str, use_cache: bool = True, chunk_rows: int = 0,
+                   compact: bool = False) -> pd.DataFrame:
+    """Dispatch loader by file extension.
+
+    Text formats (.txt/.csv) go through the Feather cache in utils/cache.py,
+    so warm starts memory-map the parsed frame instead of re-reading text.
+    *chunk_rows* > 0 returns a LazyFrame that streams the file in chunks of
+    that many rows instead (out-of-core mode, utils/lazy.py).
+    *compact* narrows dtypes losslessly (utils/compact.py; cached in that
+    form) and prints the before/after memory footprint to stderr.
+    """
+    import pandas as pd
+    from utils.cache import load_cached_frame
+    from utils.lazy import LazyFrame
+    from utils.preprocess import ucl_dataset_prep, ucl_prep_frame, UCL_READ_OPTIONS
+
+    if chunk_rows > 0:
+        if compact:
+            raise ValueError("Compact loading needs an in-memory frame (chunk_rows=0)")
+        if path.endswith(".txt"):
+            return LazyFrame(path, chunk_rows, read_options=UCL_READ_OPTIONS,
+                             prep=ucl_prep_frame)
+        return LazyFrame(path, chunk_rows)
+
+    if path.endswith(".txt") or path.endswith(".csv"):
+        from utils.compact import compacting, load_report, tidy_datetime_index
+
+        loader = ucl_dataset_prep if path.endswith(".txt") else pd.read_csv
+        version = loader_version(path, compact)
+        if not compact:
+            return load_cached_frame(path, loader, version, use_cache=use_cache)
+        df = load_cached_frame(path, compacting(loader, version), version,
+                               use_cache=use_cache)
+        df, _ = tidy_datetime_index(df)          # Feather doesn't keep the freq
+        report = load_report(path, version)
+    else:
+        if path.endswith(".xlsx"):
+            df = pd.read_excel(path)
+        elif path.endswith(".parquet"):
+            df = pd.read_parquet(path)
+        elif path.endswith(".feather"):
+            df = pd.read_feather(path)
+        else:
+            raise ValueError("Unsupported file type: " + os.path.basename(path))
+        if not compact:
+            return df
+        from utils.compact import compact_frame
+        df, report = compact_frame(df)
+
+    if report is not None:
+        from utils.compact import render_report
+        print(f"{os.path.basename(path)}: {render_report(report)}", file=sys.stderr)
+    return df
 
 # ───────────────────────── pipeline ─────────────────────────
 
+def cached_answer(df: pd.DataFrame, query: str, source: str | None = None) -> dict | None:
+    """Answer *query* from the semantic code cache without any LLM call.
+
+    Reused code is re-guarded and re-run on *df*; returns None on a miss or
+    when the reused code no longer runs.
+    """
+    cache = get_code_cache(source)
+    fingerprint = schema_fingerprint(df)
+    with tracing.span("code_cache.lookup"):
+        if source:
+            cache.retain(fingerprint)          # long-unused schemas age out
+        hit = cache.lookup(fingerprint, query)
+        tracing.annotate(hit=hit is not None)
+    if hit is None:
+        return None
+    run, error_type, error_msg = guard_and_run(hit["code"], df)
+    if run is None:
+        tracing.event("code_cache.stale", cause=error_type)
+        return None
+    return {"ok": True, "code": hit["code"], "result": run["result"],
+            "result_summary": run["summary"], "figures": run.get("figures", []),
+            "attempts": 0, "critic_rounds": 0,
+            "cached_from": hit["query"], "similarity": hit["similarity"]}
+
+
+def remember_answer(df: pd.DataFrame, query: str, code: str,
+                    source: str | None = None) -> None:
+    """Store critic-approved *code* for *query* in the semantic code cache."""
+    get_code_cache(source).store(schema_fingerprint(df), query, code)
+
+
+def answer_query(df: pd.DataFrame, ctx: str, query: str,
+                 validation: str = "single", consensus_n: int = CONSENSUS_N,
+                 speculative: int = 0, source: str | None = None,
+                 reuse: bool = True) -> dict:
+    """Run generate → guard/sandbox → critic for one question.
+
+    *validation* is the final-confirmation policy ('off' / 'single' /
+    'consensus'); see agents.crosschecker.validate_answer.
+    *speculative* > 1 generates that many candidates in parallel for the
+    first attempt (and each critic repair) and keeps the first one that
+    passes guard + sandbox; guard / sandbox repairs run serially.
+    With *reuse*, a close match of an earlier approved question on the same
+    schema (utils/code_cache.py) is answered without any LLM call; *source*
+    is the dataset path the cache is persisted next to.
+    Returns a dict with keys 'ok', 'code' and either 'result' or 'error'
+    (plus 'reason'/'fix_hint' when the final critic pass rejects the code).
+    """
+    if reuse:
+        out = cached_answer(df, query, source)
+        if out is not None:
+            return out
+    ensure_pool(df)                            # workers only once generation is needed
+
+    base_prompt = render_generation_prompt(ctx, query)
+    out = repair_with_critic(base_prompt, df, ctx, query, speculative)
+    if not out["ok"]:
+        return out
+
+    # final confirmation; 'single' is served from the critic's verdict memo
+    verdict = validate_answer(query, ctx, out["code"], validation, consensus_n,
+                              result_snippet=out["result_summary"])
+    if not verdict["valid"]:
+        return {"ok": False, "code": out["code"],
+                "error": "Cross-checker still doubts the answer",
+                "reason": verdict["reason"], "fix_hint": verdict["fix_hint"]}
+    if reuse:
+        remember_answer(df, query, out["code"], source)
+    return out
+
+
+def serve(df: pd.DataFrame, ctx: str,
+          stdin=sys.stdin, stdout=sys.stdout, **answer_kwargs) -> None:
+    """Answer a stream of JSONL queries against one resident DataFrame.
+
+    Each input line is either {"query": "...", "id": ...} or a bare string.
+    Each answer is written as one JSON line to *stdout*; pipeline chatter
+    (attempt logs, critic replies) goes to stderr so the stream stays clean.
+    A successful reply's 'result' is the size-capped text summary of the
+    result (there is no separate 'result_summary').
+    """
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            req = json.loads(line)
+        except json.JSONDecodeError:
+            req = {"query": line}
+        if isinstance(req, str):
+            req = {"query": req}
+        query = req.get("query")
+        reply = {"id": req.get("id")}
+
+        if not query:
+            reply.update(ok=False, error="Missing 'query'")
+        else:
+            t0 = time.perf_counter()
+            with tracing.trace(reply["id"]) as tr:
+                try:
+                    with contextlib.redirect_stdout(sys.stderr):
+                        out = answer_query(df, ctx, query, **answer_kwargs)
+                except Exception as exc:         # keep the server alive
+                    out = {"ok": False, "code": "", "error": f"{type(exc).__name__}: {exc}"}
+            reply.update({k: v for k, v in out.items()
+                          if k not in ("result", "result_summary")})
+            if out["ok"]:
+                reply["result"] = out["result_summary"]   # the text summary, once
+                reply["figures"] = figures_for_json(out.get("figures", []))
+            reply["seconds"] = round(time.perf_counter() - t0, 3)
+            reply["stages"] = tr.stage_totals()
+
+        stdout.write(json.dumps(reply, default=str) + "\n")
+        stdout.flush()
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="SafeFrame-AI CLI")
+    parser.add_argument("command", nargs="?", choices=["ask", "serve"], default="ask",
+                        help="'ask' answers --query once; 'serve' reads JSONL queries "
+                             "from stdin and keeps the dataset loaded")
     parser.add_argument("--data",  required=True,
                         help="Dataset path (.txt/.csv/.parquet/.feather)")
-    parser.add_argument("--query", required=True,
-                        help="Natural-language question for the LLM")
+    parser.add_argument("--query",
+                        help="Natural-language question for the LLM (ask mode)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-parse text datasets instead of using the on-disk cache")
+    parser.add_argument("--no-reuse", action="store_true",
+                        help="Don't answer from (or add to) the semantic query→code cache")
+    parser.add_argument("--chunk-rows", type=int, default=0, metavar="N",
+                        help="Out-of-core mode: stream the dataset in chunks of N rows "
+                             "instead of loading it (0 = load into memory)")
+    parser.add_argument("--compact", action="store_true",
+                        help="Narrow dtypes losslessly at load time (float32, int32, "
+                             "category) and report the memory saved")
+    parser.add_argument("--trace",
+                        help="Write per-stage timing spans (JSONL) to this file")
+    parser.add_argument("--validation", choices=VALIDATION_POLICIES, default="single",
+                        help="Final confirmation of accepted code: off (skip), single "
+                             "(reuse the critic's verdict), consensus (majority of N)")
+    parser.add_argument("--consensus-n", type=int, default=CONSENSUS_N,
+                        help="Critic votes for --validation consensus")
+    parser.add_argument("--speculative", type=int, default=0, metavar="K",
+                        help="Generate K candidates in parallel for the first attempt "
+                             "and keep the first that passes guard + sandbox; later "
+                             "repairs are serial (0 = off)")
+    parser.add_argument("--save-figures", metavar="DIR",
+                        help="Write the answer's rendered figures to DIR (ask mode)")
+    add_sandbox_args(parser)
     args = parser.parse_args()
+    if args.trace:
+        tracing.set_span_sink(args.trace)
+    if args.command == "ask" and not args.query:
+        parser.error("--query is required in ask mode")
+    if args.compact and args.chunk_rows:
+        parser.error("--compact applies to in-memory frames; drop --chunk-rows")
 
     # 1. Load dataset
-    df = load_dataframe(args.data)
+    df = load_dataframe(args.data, use_cache=not args.no_cache,
+                        chunk_rows=args.chunk_rows, compact=args.compact)
+    attach_pool_from_args(df, args)            # workers start on the first cache miss
 
-    # 2. Build prompt context
-    ctx       = dataframe_context(df)
-    template  = load_prompt("prompts/meta_agent.txt")
-    base_prompt = (template
-                   .replace("{{DATASET_INFO}}", ctx)
-                   .replace("{{USER_QUERY}}", args.query))
+    # 2. Build prompt context (once, shared by every query in serve mode)
+    ctx       = dataframe_context(df, args.data)
+
+    if args.command == "serve":
+        print(f"Serving {os.path.basename(args.data)} "
+              f"({row_count(df, args.data):,} rows); send JSONL queries on stdin.", file=sys.stderr)
+        serve(df, ctx, validation=args.validation,
+              consensus_n=args.consensus_n, speculative=args.speculative,
+              source=args.data, reuse=not args.no_reuse)
+        return
 
     # 3. Generate → guard/sandbox loop → critic self-healing
-    out = repair_with_critic(base_prompt, df, ctx, args.query)
+    out = answer_query(df, ctx, args.query,
+                       validation=args.validation, consensus_n=args.consensus_n,
+                       speculative=args.speculative,
+                       source=args.data, reuse=not args.no_reuse)
 
     # 4. Handle outcome
     if not out["ok"]:
-        print("\n Pipeline failed:", out["error"])
-        print("\nLast code attempt:\n", out["code"])
-        return
-
-    # # (optional extra critic pass; kept for completeness)
-    verdict = cross_check(args.query, ctx, out["code"])
-    if not verdict["valid"]:
-        print("\n  Cross-checker still doubts the answer:")
-        print("Reason :", verdict["reason"])
-        print("Hint   :", verdict["fix_hint"])
+        if "reason" in out:
+            print("\n  Cross-checker still doubts the answer:")
+            print("Reason :", out["reason"])
+            print("Hint   :", out["fix_hint"])
+        else:
+            print("\n Pipeline failed:", out["error"])
         print("\nLast code attempt:\n", out["code"])
         return
 
     # # 5. Success!
     print("\n Answer (validated):")
+    if "cached_from" in out:
+        print(f"(reused code approved for: {out['cached_from']!r}, "
+              f"similarity {out['similarity']})")
 
     # print(out["result"])
     print("\nGenerated code:\n", out["code"])
 
+    figures = out.get("figures", [])
+    if figures and args.save_figures:
+        for path, fig in zip(save_figures(figures, args.save_figures), figures):
+            print(f"\nFigure saved to {path}: {fig['description']}")
+    elif figures:
+        print(f"\n{len(figures)} figure(s) rendered; pass --save-figures DIR to keep them.")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
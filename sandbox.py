@@ -1,19 +1,773 @@
-from langchain_experimental.tools.python.tool import PythonAstREPLTool
+"""
+sandbox.py
+
+Runs generated snippets against the DataFrame.
+
+Two execution paths share the same semantics (exec every statement, eval a
+trailing expression, return ``_`` if the snippet assigned it, else the
+trailing expression's value):
+
+* **Process pool** (``SandboxPool``) – pre-warmed worker processes that have
+  pandas / numpy imported and the frame attached.  The frame is
+  published once as an uncompressed Feather file in shared memory
+  (``/dev/shm`` when available) and memory-mapped by every worker, so
+  spawning or replacing a worker never re-sends the data.  A timeout kills
+  the worker and starts a fresh one, so runaway code cannot stall the
+  pipeline.  Optional per-task CPU-seconds and per-worker address-space
+  limits (POSIX ``resource``) are enforced inside the worker.
+* **In-thread fallback** – used when no pool is attached to the frame.  The
+  timeout only abandons the thread; it cannot stop it.
+
+Each run gets a shallow, copy-on-write view of the frame (see
+``isolated_view``), so columns a snippet adds or overwrites never leak into
+the next attempt or query, and nothing is duplicated up front.  A chunked
+``LazyFrame`` (utils/lazy.py) is read-only and is passed to workers as a
+file reference; its sample tier is simply its first rows.
+
+matplotlib (``plt``) and seaborn (``sns``) are imported only for snippets
+that plot, so non-plotting queries never load them.  A plotting snippet
+runs in its own figure scope: every figure it opens is LTTB-downsampled,
+rendered to PNG / SVG bytes in the executing worker (or thread) and closed,
+so nothing accumulates in pyplot's global state; full-tier results carry
+the bytes under ``'figures'`` (see utils/plotting.py).
+
+``attach_pool(df, ...)`` registers a pool for a frame; ``run_in_repl(code,
+df)`` then routes to it automatically.  ``defer_pool`` registers the same
+settings but only starts the workers on ``ensure_pool``.
+"""
+
+from __future__ import annotations
+
+import ast
+import atexit
+import base64
+import multiprocessing as mp
+import os
+import queue
+import sys
+import tempfile
+import threading
+import uuid
+import weakref
 from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils.summarize import summarize_result
+
+DEFAULT_TIMEOUT = 2.0
+PLOT_NAMES = frozenset({"plt", "sns"})      # names that pull in the plotting stack
+PLOT_ATTRS = frozenset({"plot", "hist", "boxplot", "plotting"})   # pandas plotting
+FIGURE_FORMAT = "png"                       # 'png' or 'svg'
+MAX_FIGURES = 4                             # rendered per run; extra figures are just closed
+
+
+# -----------------------------------------------------------------------------
+# Execution semantics (shared by both paths)
+# -----------------------------------------------------------------------------
+
+def enable_copy_on_write() -> bool:
+    """Turn on pandas Copy-on-Write (pandas >= 2.0); return whether it is on."""
+    import pandas as pd
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True                           # always on; the option is deprecated
+    try:
+        pd.set_option("mode.copy_on_write", True)
+        return True
+    except (KeyError, ValueError):           # OptionError is a KeyError
+        return False
+
+
+def isolated_view(df):
+    """Cheap per-run view of *df* that the snippet may freely mutate.
+
+    ``copy(deep=False)`` shares every column buffer with *df*; no data is
+    duplicated.  New columns (``df['hour'] = df.index.hour``), index swaps
+    and inplace drops only touch the view.  With Copy-on-Write enabled,
+    in-place writes to existing columns copy just the touched column
+    first, so the shared frame stays pristine across attempts and queries.
+    """
+    return df.copy(deep=False)
+
+
+def _pyplot():
+    """matplotlib.pyplot on the headless Agg backend, imported on first use.
+
+    Also (re)installs the hook that tags new figures with their run.
+    """
+    if "matplotlib.pyplot" not in sys.modules:
+        import matplotlib
+        matplotlib.use("Agg")
+    import matplotlib
+    import matplotlib.pyplot as plt
+    hooks = matplotlib.rcParams["figure.hooks"]
+    if _FIGURE_HOOK not in hooks:
+        matplotlib.rcParams["figure.hooks"] = [*hooks, _FIGURE_HOOK]
+    return plt
+
+
+def _plotting(tree: ast.AST) -> Set[str]:
+    """Plot names the snippet uses ('plt' / 'sns'), plus 'pandas' when it
+    calls a pandas plotting method (``df.plot()``, ``s.hist()``, ...)."""
+    used = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in PLOT_NAMES:
+            used.add(node.id)
+        elif isinstance(node, ast.Attribute) and node.attr in PLOT_ATTRS:
+            used.add("pandas")
+    return used
+
+
+_FIGURE_HOOK = f"{__name__}:_tag_figure"   # matplotlib "figure.hooks" entry
+_current_run = threading.local()           # .run: the _Run of the executing thread
+_backend_lock = threading.Lock()           # guards the two globals below + holds_backend
+_backend_users = 0
+_saved_backend: Optional[str] = None
+
+
+class _Run:
+    """Identity of one snippet execution; new figures are tagged with it."""
+
+    __slots__ = ("abandoned", "holds_backend")
+
+    def __init__(self) -> None:
+        self.abandoned = False                 # set when an in-thread run times out
+        self.holds_backend = False             # counted in _backend_users
+
+
+def _tag_figure(fig) -> None:
+    """Called by pyplot for every new figure: remember which run made it."""
+    fig._sandbox_run = getattr(_current_run, "run", None)
+
+
+def _close_abandoned_figures(plt) -> None:
+    """Close figures of timed-out runs, so they can't stay the current figure."""
+    for num in plt.get_fignums():
+        run = getattr(plt.figure(num), "_sandbox_run", None)
+        if run is not None and run.abandoned:
+            plt.close(num)
+
+
+def _acquire_plot_backend(run: _Run) -> None:
+    """Route pandas' ``.plot()`` through utils/plotting.py while at least one
+    plotting snippet runs; the previous backend returns after the last one."""
+    import pandas as pd
+    global _backend_users, _saved_backend
+
+    with _backend_lock:
+        if _backend_users == 0:
+            _saved_backend = pd.get_option("plotting.backend")
+            pd.set_option("plotting.backend", "utils.plotting")
+        _backend_users += 1
+        run.holds_backend = True
+
+
+def _release_plot_backend(run: _Run) -> None:
+    import pandas as pd
+    global _backend_users
+
+    with _backend_lock:
+        if not run.holds_backend:
+            return
+        run.holds_backend = False
+        _backend_users -= 1
+        if _backend_users == 0:
+            pd.set_option("plotting.backend", _saved_backend)
 
-def run_in_repl(code_str: str, df):
-    repl = PythonAstREPLTool(locals={"df": df})
 
-    def _exec():
-        # run() returns only printed output; capture result from repl.globals
-        repl.run(code_str)
-        return repl.globals.get("_")  # convention: code assigns result to _
+def _abandon(run: _Run) -> None:
+    """Give up on a timed-out in-thread run: its figures are closed by the
+    next plotting scope and it stops counting as a plot backend user."""
+    run.abandoned = True
+    if "pandas" in sys.modules:
+        _release_plot_backend(run)
 
-    with ThreadPoolExecutor() as exe:
-        fut = exe.submit(_exec)
+
+@contextmanager
+def _figure_scope():
+    """Run a plotting snippet in isolation; yields a callable returning the
+    figures opened by this run, all of which are closed on exit.
+
+    Figures are attributed to the run whose thread created them, so no lock
+    is held while the snippet executes and a runaway snippet abandoned by a
+    timeout blocks nothing (its figures are closed by the next scope).
+    New figures created without the tag (a snippet that reset ``rcParams``)
+    are closed too.  pyplot's *current* figure is still process-wide, so
+    concurrent in-thread plotting is best-effort; pool workers run one
+    snippet at a time.
+    """
+    from matplotlib._pylab_helpers import Gcf
+
+    plt = _pyplot()
+    own = getattr(_current_run, "run", None) is None
+    if own:
+        _current_run.run = _Run()
+    run = _current_run.run
+    _close_abandoned_figures(plt)
+    before = set(plt.get_fignums())
+
+    def opened():
+        return [m.canvas.figure for m in Gcf.get_all_fig_managers()
+                if getattr(m.canvas.figure, "_sandbox_run", None) is run
+                or (not hasattr(m.canvas.figure, "_sandbox_run") and m.num not in before)]
+
+    _acquire_plot_backend(run)
+    try:
+        yield opened
+    finally:
+        for fig in opened():
+            plt.close(fig)
+        _release_plot_backend(run)
+        if own:
+            _current_run.run = None
+
+
+def _snippet_namespace(tree: ast.AST, df, plotting: Set[str]) -> Dict[str, object]:
+    """Globals for one run: ``df``, ``pd``, ``np``, plus ``plt`` / ``sns``
+    only when the snippet uses them."""
+    import pandas as pd
+    import numpy as np
+
+    namespace = {"df": isolated_view(df), "pd": pd, "np": np}
+    if plotting:
+        namespace["plt"] = _pyplot()
+        if "sns" in plotting:
+            try:
+                import seaborn as sns
+                namespace["sns"] = sns
+            except ImportError:             # optional; the snippet gets a NameError
+                pass
+    return namespace
+
+
+def execute_snippet(code_str: str, df, figures: Optional[List[dict]] = None,
+                    figure_format: str = FIGURE_FORMAT):
+    """Execute *code_str* with ``df`` in scope and return its result.
+
+    Mirrors PythonAstREPLTool: every statement is exec'd and a trailing
+    expression is eval'd.  Unlike the tool, errors propagate as exceptions
+    instead of being returned as text, so the repair loop sees them.
+    The snippet sees an isolated view of *df*, never *df* itself.
+
+    Figures a plotting snippet opens are always closed afterwards; pass a
+    *figures* list to also get them rendered into it (utils/plotting.py).
+    """
+    tree = ast.parse(code_str, mode="exec")
+    plotting = _plotting(tree)
+    if not plotting:
+        return _exec_tree(tree, _snippet_namespace(tree, df, plotting))
+
+    from utils.plotting import render_figure
+
+    with _figure_scope() as opened:
+        result = _exec_tree(tree, _snippet_namespace(tree, df, plotting))
+        if figures is not None:
+            figures.extend(render_figure(fig, figure_format)
+                           for fig in opened()[:MAX_FIGURES])
+    return result
+
+
+def _exec_tree(tree: ast.Module, namespace: Dict[str, object]):
+    last_value = None
+    body, tail = tree.body, None
+    if body and isinstance(body[-1], ast.Expr):
+        body, tail = body[:-1], body[-1]
+
+    exec(compile(ast.Module(body=body, type_ignores=[]), "<snippet>", "exec"), namespace)
+    if tail is not None:
+        last_value = eval(compile(ast.Expression(tail.value), "<snippet>", "eval"), namespace)
+
+    # convention: code assigns result to _ ; fall back to the trailing expression
+    return namespace["_"] if "_" in namespace else last_value
+
+
+_cow_enabled = False
+
+
+def _is_plot_object(obj) -> bool:
+    """matplotlib Figure / Axes, or the array of Axes from plt.subplots."""
+    if type(obj).__name__ == "ndarray" and obj.dtype == object and obj.size:
+        obj = obj.flat[0]
+    return type(obj).__module__.startswith("matplotlib")
+
+
+def _run_and_summarize(code_str: str, df,
+                       figure_format: Optional[str] = None) -> Dict[str, object]:
+    """Run *code_str*; with *figure_format* its figures are rendered too."""
+    figures: Optional[List[dict]] = [] if figure_format else None
+    result = execute_snippet(code_str, df, figures, figure_format or FIGURE_FORMAT)
+    if _is_plot_object(result):
+        # its figure is closed by now; what it showed is in 'figures'
+        summary, result = f"{type(result).__name__} (plot)", None
+    else:
+        try:
+            summary = summarize_result(result)
+        except Exception as e:                 # summary is best-effort
+            summary = f"{type(result).__name__} (summary failed: {e})"
+    reply = {"ok": True, "result": result, "summary": summary}
+    if figures:
+        reply["figures"] = figures
+        reply["summary"] = summary + "\nfigures: " + " | ".join(
+            f"[{i}] {fig['description']}" for i, fig in enumerate(figures, 1))
+    return reply
+
+
+def _run_in_thread(code_str: str, df, timeout: float,
+                   figure_format: Optional[str] = None):
+    global _cow_enabled
+    if not _cow_enabled:
+        _cow_enabled = enable_copy_on_write()
+    run = _Run()
+
+    def target():
+        _current_run.run = run
         try:
-            return {"ok": True, "result": fut.result(timeout=2)}
-        except TimeoutError:
-            return {"ok": False, "error": "Timeout"}
+            return _run_and_summarize(code_str, df, figure_format)
+        finally:
+            _current_run.run = None
+
+    exe = ThreadPoolExecutor(max_workers=1)
+    fut = exe.submit(target)
+    try:
+        return fut.result(timeout=timeout)
+    except TimeoutError:
+        _abandon(run)
+        return {"ok": False, "error": "Timeout"}
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    finally:
+        exe.shutdown(wait=False)               # don't block on a runaway thread
+
+
+def _probe_frame(df):
+    """Small frame for ``tier="sample"`` runs; a LazyFrame probes its head."""
+    from utils.lazy import LazyFrame
+    from utils.sample import SAMPLE_ROWS, stratified_sample
+
+    if isinstance(df, LazyFrame):
+        return df.limit(SAMPLE_ROWS)
+    return stratified_sample(df)
+
+
+# -----------------------------------------------------------------------------
+# Worker process
+# -----------------------------------------------------------------------------
+
+def _shared_dir() -> str:
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def _publish_frame(df) -> Tuple[str, object]:
+    """Return a handle workers can open cheaply: a mmap-able Feather path
+    when pyarrow is available, else the frame itself (pickled per worker).
+    A LazyFrame is only a file reference, so it is always pickled."""
+    from utils.lazy import LazyFrame
+
+    if isinstance(df, LazyFrame):
+        return ("pickle", df)
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return ("pickle", df)
+    path = os.path.join(_shared_dir(), f"safeframe-{uuid.uuid4().hex}.feather")
+    try:
+        feather.write_feather(df, path, compression="uncompressed")
+    except (OSError, ValueError, TypeError):
+        return ("pickle", df)
+    return ("feather", path)
+
+
+def _open_frame(handle):
+    kind, payload = handle
+    if kind == "feather":
+        import pyarrow.feather as feather
+        return feather.read_table(payload, memory_map=True).to_pandas(split_blocks=True)
+    return payload
+
+
+def _apply_memory_limit(memory_mb: Optional[int]) -> None:
+    if not memory_mb:
+        return
+    try:
+        import resource
+    except ImportError:                       # not POSIX
+        return
+    limit = int(memory_mb) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _arm_cpu_limit(cpu_seconds: Optional[float]) -> None:
+    """Allow *cpu_seconds* more CPU time for the next task (SIGXCPU kills)."""
+    if not cpu_seconds:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = usage.ru_utime + usage.ru_stime
+    soft = int(used + cpu_seconds) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _worker_main(conn, handle, cpu_seconds, memory_mb) -> None:
+    # pre-warm: heavy imports happen once per worker, not per snippet
+    # (matplotlib waits for the first plotting snippet, see _snippet_namespace)
+    import numpy  # noqa: F401
+    import pandas  # noqa: F401
+    enable_copy_on_write()          # mmapped columns are read-only; CoW copies on write
+
+    df = _open_frame(handle)
+    sample = None                   # built on the first sample-tier task
+    _apply_memory_limit(memory_mb)
+    conn.send("ready")
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        code_str, tier, figure_format = task
+
+        try:
+            _arm_cpu_limit(cpu_seconds)
+            target = df
+            if tier == "sample":
+                if sample is None:
+                    sample = _probe_frame(df)
+                target = sample
+            reply = _run_and_summarize(code_str, target, figure_format)
+        except MemoryError:
+            reply = {"ok": False, "error": "MemoryError: sandbox memory limit exceeded"}
         except Exception as e:
-            return {"ok": False, "error": str(e)}
\ No newline at end of file
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+        try:
+            conn.send(reply)
+        except Exception:
+            # result isn't picklable → send its summary (figures are bytes)
+            conn.send({**reply, "result": reply["summary"]})
+
+
+class _Worker:
+    def __init__(self, ctx, handle, cpu_seconds, memory_mb) -> None:
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main,
+                                args=(child, handle, cpu_seconds, memory_mb),
+                                daemon=True)
+        self.proc.start()
+        child.close()
+
+    def wait_ready(self, timeout: float) -> bool:
+        try:
+            return self.conn.poll(timeout) and self.conn.recv() == "ready"
+        except (EOFError, OSError):
+            return False
+
+    def kill(self) -> None:
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join(timeout=1)
+        self.conn.close()
+
+
+# -----------------------------------------------------------------------------
+# Pool
+# -----------------------------------------------------------------------------
+
+class SandboxPool:
+    """Pre-warmed worker processes bound to one DataFrame.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Frame every snippet sees as ``df``.
+    workers : int
+        Number of worker processes (= snippets that can run at once).
+    timeout : float
+        Wall-clock seconds per snippet; on expiry the worker is killed and
+        replaced.
+    cpu_seconds : float, optional
+        CPU-time cap per snippet (POSIX only).
+    memory_mb : int, optional
+        Address-space cap per worker in MiB (POSIX only; includes the
+        memory-mapped frame).
+    """
+
+    STARTUP_TIMEOUT = 60.0                      # seconds for imports + frame attach
+    ACQUIRE_POLL = 1.0                          # seconds between live-worker checks
+
+    def __init__(self, df, workers: int = 2, timeout: float = DEFAULT_TIMEOUT,
+                 cpu_seconds: Optional[float] = None,
+                 memory_mb: Optional[int] = None) -> None:
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self._ctx = mp.get_context("spawn")    # safe with threads in the parent
+        self._handle = _publish_frame(df)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._closed = False
+        self._live = max(1, workers)            # workers running or being restarted
+        self._live_lock = threading.Lock()
+
+        # start all workers first so their warm-up overlaps
+        started = [self._spawn() for _ in range(max(1, workers))]
+        for worker in started:
+            if not worker.wait_ready(self.STARTUP_TIMEOUT):
+                for w in started:
+                    w.kill()
+                self._drop_frame()
+                raise RuntimeError("Sandbox worker failed to start")
+            self._idle.put(worker)
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._ctx, self._handle, self.cpu_seconds, self.memory_mb)
+
+    def _replace(self) -> None:
+        """Start a replacement worker in the background and add it when warm,
+        so the caller that hit a timeout doesn't also pay the warm-up."""
+        def _start() -> None:
+            for _ in range(3):
+                if self._closed:
+                    return
+                worker = self._spawn()
+                if worker.wait_ready(self.STARTUP_TIMEOUT):
+                    if self._closed:
+                        worker.kill()
+                    else:
+                        self._idle.put(worker)
+                    return
+                worker.kill()
+            with self._live_lock:
+                self._live -= 1
+            print("sandbox: could not restart a worker; pool is smaller now",
+                  file=sys.stderr)
+        threading.Thread(target=_start, daemon=True).start()
+
+    @property
+    def alive(self) -> bool:
+        """False once the pool is closed or every worker failed to restart."""
+        return not self._closed and self._live > 0
+
+    def _acquire(self) -> Optional[_Worker]:
+        """Next idle worker; None as soon as the pool can't provide one."""
+        while True:
+            try:
+                return self._idle.get(timeout=self.ACQUIRE_POLL)
+            except queue.Empty:
+                if not self.alive:
+                    return None
+
+    def run(self, code_str: str, tier: str = "full",
+            figure_format: Optional[str] = None) -> Dict[str, object]:
+        """Execute *code_str* in a worker; same return shape as run_in_repl.
+
+        With *figure_format* the worker renders the snippet's figures.
+        """
+        worker = self._acquire()
+        if worker is None:
+            return {"ok": False, "error": "Sandbox pool has no workers left"}
+        healthy = False
+        try:
+            worker.conn.send((code_str, tier, figure_format))
+            if not worker.conn.poll(self.timeout):
+                return {"ok": False, "error": "Timeout"}
+            reply = worker.conn.recv()
+            healthy = True
+            return reply
+        except (EOFError, OSError):
+            # worker died mid-task (CPU limit, OOM kill, segfault)
+            return {"ok": False, "error": "Sandbox worker died (resource limit exceeded?)"}
+        finally:
+            if healthy and not self._closed:
+                self._idle.put(worker)
+            else:
+                worker.kill()
+                if not self._closed:
+                    self._replace()
+
+    def close(self) -> None:
+        """Stop every idle worker and drop the shared frame file."""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+        self._drop_frame()
+
+    def _drop_frame(self) -> None:
+        kind, payload = self._handle
+        if kind == "feather":
+            try:
+                os.remove(payload)
+            except OSError:
+                pass
+
+
+# -----------------------------------------------------------------------------
+# Public API
+# -----------------------------------------------------------------------------
+
+# keyed by id(frame); the weak reference tells a live frame from a reused id
+_pools: Dict[int, Tuple[weakref.ref, SandboxPool]] = {}
+_pools_lock = threading.Lock()
+
+
+def _forget_pool(key: int, pool: SandboxPool) -> None:
+    """Frame was garbage-collected: drop and close its pool."""
+    with _pools_lock:
+        if key in _pools and _pools[key][1] is pool:
+            del _pools[key]
+    pool.close()
+
+
+def attach_pool(df, **kwargs) -> SandboxPool:
+    """Start a SandboxPool for *df*; run_in_repl(code, df) will use it.
+
+    Only a weak reference to *df* is kept here; the pool closes when *df*
+    is garbage-collected.  (A pool whose frame could not be published as
+    Feather keeps the frame itself to restart workers, so it lives until
+    ``close_pools``.)
+    """
+    pool = SandboxPool(df, **kwargs)
+    with _pools_lock:
+        old = _pools.pop(id(df), None)
+        _pools[id(df)] = (weakref.ref(df), pool)
+    weakref.finalize(df, _forget_pool, id(df), pool)
+    if old is not None:
+        old[1].close()
+    return pool
+
+
+# pool settings registered by defer_pool; ensure_pool starts them
+_deferred: Dict[int, Tuple[weakref.ref, dict]] = {}
+_deferred_lock = threading.Lock()
+
+
+def defer_pool(df, **kwargs) -> None:
+    """Register SandboxPool settings for *df* without starting any worker.
+
+    ``ensure_pool(df)`` starts the pool; until then run_in_repl runs
+    in-thread, so a process that never needs a worker (e.g. a code-cache
+    hit) doesn't pay for spawning them and publishing the frame.
+    """
+    with _deferred_lock:
+        _deferred[id(df)] = (weakref.ref(df), kwargs)
+    weakref.finalize(df, _deferred.pop, id(df), None)
+
+
+def ensure_pool(df) -> Optional[SandboxPool]:
+    """Start the pool deferred for *df*, once; returns its pool (or None)."""
+    with _deferred_lock:                         # concurrent callers wait for one start
+        entry = _deferred.pop(id(df), None)
+        if entry is not None and entry[0]() is df:
+            return attach_pool(df, **entry[1])
+    return get_pool(df)
+
+
+def get_pool(df) -> Optional[SandboxPool]:
+    with _pools_lock:
+        entry = _pools.get(id(df))
+    return entry[1] if entry is not None and entry[0]() is df else None
+
+
+@atexit.register
+def close_pools() -> None:
+    with _pools_lock:
+        entries = list(_pools.values())
+        _pools.clear()
+    for _, pool in entries:
+        pool.close()
+
+
+def add_sandbox_args(parser) -> None:
+    """Register the sandbox CLI flags shared by main.py and batch.py."""
+    parser.add_argument("--sandbox-workers", type=int, default=2,
+                        help="Worker processes for snippet execution (0 = run in-thread)")
+    parser.add_argument("--sandbox-timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help="Seconds per snippet before the worker is killed")
+    parser.add_argument("--sandbox-cpu", type=float, default=None,
+                        help="CPU-seconds cap per snippet (POSIX only)")
+    parser.add_argument("--sandbox-mem-mb", type=int, default=None,
+                        help="Address-space cap per worker in MiB (POSIX only)")
+    parser.add_argument("--figure-format", choices=("png", "svg"), default=FIGURE_FORMAT,
+                        help="Format plot snippets' figures are rendered in")
+
+
+def attach_pool_from_args(df, args) -> None:
+    """Apply the CLI sandbox flags to *df*; the pool itself is deferred.
+
+    Workers start on the first ``ensure_pool(df)`` (main.answer_query calls
+    it after a code-cache miss).
+    """
+    global FIGURE_FORMAT
+    FIGURE_FORMAT = args.figure_format         # read by run_in_repl at call time
+    if args.sandbox_workers > 0:
+        defer_pool(df, workers=args.sandbox_workers,
+                   timeout=args.sandbox_timeout,
+                   cpu_seconds=args.sandbox_cpu,
+                   memory_mb=args.sandbox_mem_mb)
+
+
+_samples: Dict[int, Tuple[weakref.ref, object]] = {}   # like _pools: weak frame refs
+
+
+def _cached_sample(df):
+    entry = _samples.get(id(df))
+    if entry is None or entry[0]() is not df:
+        sample = _probe_frame(df)
+        # a small frame is its own sample; don't hold it strongly
+        entry = _samples[id(df)] = (weakref.ref(df), None if sample is df else sample)
+        weakref.finalize(df, _samples.pop, id(df), None)
+    return df if entry[1] is None else entry[1]
+
+
+def run_in_repl(code_str: str, df, timeout: Optional[float] = None,
+                tier: str = "full", figure_format: Optional[str] = None):
+    """Run *code_str* against *df*.
+
+    Returns {'ok': True, 'result', 'summary'} or {'ok': False, 'error'};
+    'summary' is a size-capped text description (utils/summarize.py).
+    A full-tier run of a plotting snippet also returns 'figures': a list of
+    {'format', 'data' (bytes), 'width', 'height', 'description'}, rendered
+    as *figure_format* (default ``FIGURE_FORMAT`` at call time).
+
+    ``tier="sample"`` runs against a small cached stratified sample of *df*
+    (see utils/sample.py) instead of the full frame.  *timeout* defaults to
+    ``DEFAULT_TIMEOUT`` as set at call time (pools use their own timeout).
+    """
+    # probe runs only need the figures closed, not drawn
+    fmt = (figure_format or FIGURE_FORMAT) if tier == "full" else None
+    pool = get_pool(df)
+    if pool is not None and pool.alive:
+        return pool.run(code_str, tier, fmt)
+    target = _cached_sample(df) if tier == "sample" else df
+    return _run_in_thread(code_str, target,
+                          DEFAULT_TIMEOUT if timeout is None else timeout, fmt)
+
+
+def figures_for_json(figures: List[dict]) -> List[dict]:
+    """*figures* with their bytes base64-encoded, for JSONL replies/rows."""
+    return [{**fig, "data": base64.b64encode(fig["data"]).decode("ascii")}
+            for fig in figures]
+
+
+def save_figures(figures: List[dict], folder: str, stem: str = "figure") -> List[str]:
+    """Write *figures* to *folder* as ``<stem>-1.png``, ...; returns the paths."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for i, fig in enumerate(figures, 1):
+        path = os.path.join(folder, f"{stem}-{i}.{fig['format']}")
+        with open(path, "wb") as f:
+            f.write(fig["data"])
+        paths.append(path)
+    return paths
@@ -0,0 +1,60 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from agents import provider
+from agents.crosschecker import arepair_with_critic, repair_with_critic
+from agents.provider import StubChatModel
+from utils import llm_cache
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": [10.0, 20.0, 30.0]})
+
+
+@pytest.fixture
+def scripted(monkeypatch):
+    """Stub backend whose generator fails once (unknown column), then fixes it."""
+    def responder(prompt):
+        if "code-review assistant" in prompt:
+            return provider.STUB_CRITIC_REPLY
+        if "Previous attempt failed" in prompt:
+            return "_ = df['a'].sum()"
+        return "_ = df['nope'].sum()"
+
+    def factory(model="stub", temperature=0, **_):
+        return StubChatModel(model, temperature, responder=responder)
+
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setattr(llm_cache, "_configured", True)
+    provider.set_backend(factory)
+    yield
+    provider.set_backend("stub")
+
+
+def _same_shape(sync_out, async_out):
+    assert sync_out.keys() == async_out.keys()
+    for key in ("ok", "code", "result_summary", "figures", "verdict", "attempts",
+                "critic_rounds"):
+        assert sync_out[key] == async_out[key], key
+    if isinstance(sync_out["result"], pd.DataFrame):
+        pd.testing.assert_frame_equal(sync_out["result"], async_out["result"])
+    else:
+        assert sync_out["result"] == async_out["result"]
+
+
+def test_async_repair_matches_sync(frame):
+    sync_out = repair_with_critic("question", frame, "ctx", "total of a")
+    async_out = asyncio.run(arepair_with_critic("question", frame, "ctx", "total of a"))
+    _same_shape(sync_out, async_out)
+    assert async_out["ok"] and async_out["attempts"] == 1
+
+
+def test_async_repair_after_a_guard_failure_matches_sync(frame, scripted):
+    sync_out = repair_with_critic("question", frame, "ctx", "total of a")
+    async_out = asyncio.run(arepair_with_critic("question", frame, "ctx", "total of a"))
+    _same_shape(sync_out, async_out)
+    assert async_out["ok"] and async_out["result"] == 6.0
+    assert async_out["attempts"] == 2 and async_out["critic_rounds"] == 1
@@ -0,0 +1,54 @@
+import json
+
+import pandas as pd
+import pytest
+
+import batch
+import main
+
+
+@pytest.fixture
+def records(tmp_path):
+    path = str(tmp_path / "meters.csv")
+    pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": [4.0, 5.0, 6.0]}).to_csv(path, index=False)
+    return [{"id": 1, "data": path, "query": "describe the meters"},
+            {"id": 2, "data": str(tmp_path / "missing.csv"), "query": "describe"}]
+
+
+def _rows(output):
+    with open(output, encoding="utf-8") as f:
+        return {row["id"]: row for row in map(json.loads, f)}
+
+
+def test_run_batch_with_the_stub_backend(records, tmp_path):
+    output = str(tmp_path / "out.jsonl")
+    summary = batch.run_batch(records, output, workers=2, validation="off")
+    assert (summary["queries"], summary["ok"], summary["failed"]) == (2, 1, 1)
+    rows = _rows(output)
+    ok = rows[1]
+    assert ok["ok"] and ok["code"] == "_ = df.describe()"
+    assert "count" in ok["result"] and "result_summary" not in ok
+    assert ok["attempts"] == 1 and ok["figures"] == []
+    assert "llm.generate" in ok["stages"] and ok["seconds"] >= 0
+    assert not rows[2]["ok"] and rows[2]["error"].startswith("FileNotFoundError")
+    assert "sandbox.full" in summary["trace"]["stages"]
+
+    # the approved answer is reused from the code cache on the next run
+    batch.run_batch(records[:1], output, workers=1, validation="off")
+    assert _rows(output)[1]["cached_from"] == "describe the meters"
+
+
+def test_run_batch_applies_the_validation_policy(records, tmp_path, monkeypatch):
+    seen = []
+
+    def doubting(query, ctx, code, policy, n, result_snippet=None):
+        seen.append((policy, n))
+        return {"valid": False, "reason": "wrong aggregate", "fix_hint": "use sum"}
+
+    monkeypatch.setattr(main, "validate_answer", doubting)
+    output = str(tmp_path / "out.jsonl")
+    batch.run_batch(records[:1], output, validation="consensus", consensus_n=5,
+                    reuse=False)
+    row = _rows(output)[1]
+    assert seen == [("consensus", 5)]
+    assert not row["ok"] and row["reason"] == "wrong aggregate"
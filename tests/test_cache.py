@@ -0,0 +1,102 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from utils.cache import cache_dir_for, cache_path_for, load_cached_frame
+
+
+def _write(path, rows=3):
+    pd.DataFrame({"a": range(rows)}).to_csv(path, index=False)
+    return path
+
+
+def _feathers(folder):
+    return sorted(n for n in os.listdir(cache_dir_for(os.path.join(folder, "x")))
+                  if n.endswith(".feather"))
+
+
+def test_warm_load_reads_the_cache(tmp_path):
+    src = _write(tmp_path / "data.csv")
+    calls = []
+
+    def loader(p):
+        calls.append(p)
+        return pd.read_csv(p)
+
+    first = load_cached_frame(str(src), loader, "1")
+    second = load_cached_frame(str(src), loader, "1")
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_changed_source_replaces_its_entry(tmp_path):
+    src = str(_write(tmp_path / "data.csv"))
+    load_cached_frame(src, pd.read_csv, "1")
+    old = cache_path_for(src, "1")
+    _write(src, rows=5)
+    os.utime(src, ns=(1, 1))                     # force a different mtime
+    df = load_cached_frame(src, pd.read_csv, "1")
+    assert len(df) == 5
+    assert not os.path.exists(old)
+    assert _feathers(tmp_path) == [os.path.basename(cache_path_for(src, "1"))]
+
+
+@pytest.mark.parametrize("names", [("data.csv", "data.txt"), ("data-2.csv", "data.csv")])
+def test_similar_sources_keep_their_own_entries(tmp_path, names):
+    paths = [str(_write(tmp_path / name)) for name in names]
+    for path in paths:
+        load_cached_frame(path, pd.read_csv, "1")
+    assert all(os.path.exists(cache_path_for(p, "1")) for p in paths)
+
+
+def test_versions_of_one_source_coexist(tmp_path):
+    src = str(_write(tmp_path / "data.csv"))
+    load_cached_frame(src, pd.read_csv, "2")
+    load_cached_frame(src, pd.read_csv, "2+compact1")
+    assert os.path.exists(cache_path_for(src, "2"))
+    assert os.path.exists(cache_path_for(src, "2+compact1"))
+
+
+def test_compact_and_plain_loads_stay_cached(tmp_path, monkeypatch):
+    import main
+
+    src = str(tmp_path / "data.csv")
+    pd.DataFrame({"a": [1.5, 2.5, 3.5] * 10, "b": ["x", "y", "x"] * 10}).to_csv(src, index=False)
+    main.load_dataframe(src)
+    main.load_dataframe(src, compact=True)
+    main.dataframe_context(main.load_dataframe(src), src)
+    main.dataframe_context(main.load_dataframe(src, compact=True), src)
+    profiles = [n for n in os.listdir(cache_dir_for(src)) if n.endswith(".profile.json")]
+    assert len(profiles) == 2
+
+    parsed = []
+    monkeypatch.setattr(pd, "read_csv", lambda *a, **k: parsed.append(a) or pytest.fail("re-parsed"))
+    assert main.load_dataframe(src)["a"].dtype == "float64"
+    assert main.load_dataframe(src, compact=True)["a"].dtype == "float32"
+    assert parsed == []
+
+
+def test_unwritable_frame_falls_back_without_leftovers(tmp_path):
+    path = _write(str(tmp_path / "mixed.csv"))
+    mixed = pd.DataFrame({"a": pd.Series([1, "x", 2.5], dtype=object)})
+    out = load_cached_frame(path, lambda p: mixed, "v1")
+    assert out is mixed
+    assert os.listdir(cache_dir_for(path)) == []
+
+
+def test_failed_write_removes_its_tmp_file(tmp_path, monkeypatch):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    def partial_write(df, dest, **kwargs):
+        with open(dest, "wb") as f:
+            f.write(b"ARROW1")
+        raise pa.ArrowNotImplementedError("unsupported type")
+
+    monkeypatch.setattr(feather, "write_feather", partial_write)
+    path = _write(str(tmp_path / "data.csv"))
+    assert len(load_cached_frame(path, pd.read_csv, "v1")) == 3
+    assert os.listdir(cache_dir_for(path)) == []
@@ -0,0 +1,141 @@
+import pandas as pd
+import pytest
+
+from utils.code_cache import (CodeCache, analyse_query, code_cache_path,
+                              get_code_cache, schema_fingerprint, substitute_literals)
+
+FP = "fingerprint"
+CODE_2008 = "result = df.loc['2008', 'Sub_metering_2'].resample('ME').mean()"
+
+
+def test_analyse_query_splits_literals():
+    tokens, literals = analyse_query("Total 'kitchen' use in March 2008 above 1.5")
+    assert literals == [("str", "kitchen"), ("month", "march"), ("year", "2008"),
+                        ("num", "1.5")]
+    assert tokens == ["total", "<str>", "use", "<month>", "<year>", "above", "<num>"]
+
+
+@pytest.mark.parametrize("old, new, code, expected", [
+    ([("year", "2008")], [("year", "2009")],
+     "df.loc['2008']", "df.loc['2009']"),
+    ([("month", "march")], [("month", "june")],
+     "df.loc['2007-03']", "df.loc['2007-06']"),
+    ([("num", "10")], [("num", "25")],
+     "df[df['x'] > 10].head(10)", "df[df['x'] > 25].head(25)"),
+    ([("str", "kitchen")], [("str", "laundry")],
+     "df[df['room'] == 'kitchen']", "df[df['room'] == 'laundry']"),
+    # two-phase: 2007→2008 and 2008→2009 don't cascade
+    ([("year", "2007"), ("year", "2008")], [("year", "2008"), ("year", "2009")],
+     "df.loc['2007':'2008']", "df.loc['2008':'2009']"),
+])
+def test_substitute_literals(old, new, code, expected):
+    assert substitute_literals(code, old, new) == expected
+
+
+def test_substitution_leaves_lookalike_numbers_alone():
+    code = "df.loc['2008'].head(120).round(2008.5)"
+    assert substitute_literals(code, [("year", "2008")], [("year", "2009")]) \
+        == "df.loc['2009'].head(120).round(2008.5)"
+
+
+@pytest.mark.parametrize("old, new, code", [
+    # literal not in the code
+    ([("year", "2008")], [("year", "2009")], "df.resample('ME').mean()"),
+    # kinds don't line up
+    ([("year", "2008")], [("num", "5")], "df.loc['2008']"),
+    ([("year", "2008")], [("year", "2008"), ("year", "2009")], "df.loc['2008']"),
+    # one literal mapped two ways
+    ([("year", "2008"), ("year", "2008")], [("year", "2009"), ("year", "2010")],
+     "df.loc['2008']"),
+    # one literal both kept and changed
+    ([("year", "2008"), ("year", "2008")], [("year", "2008"), ("year", "2009")],
+     "df.loc['2008']"),
+])
+def test_substitution_refuses(old, new, code):
+    assert substitute_literals(code, old, new) is None
+
+
+def test_lookup_reuses_code_with_new_literals():
+    cache = CodeCache()
+    cache.store(FP, "average Sub_metering_2 per month in 2008", CODE_2008)
+    hit = cache.lookup(FP, "average Sub_metering_2 per month in 2009")
+    assert hit["code"] == CODE_2008.replace("2008", "2009")
+    assert hit["query"] == "average Sub_metering_2 per month in 2008"
+    assert hit["similarity"] == 1.0
+    assert cache.stats()["hits"] == 1
+
+
+def test_lookup_misses_other_schema_or_unrelated_question():
+    cache = CodeCache()
+    cache.store(FP, "average Sub_metering_2 per month in 2008", CODE_2008)
+    assert cache.lookup("other", "average Sub_metering_2 per month in 2009") is None
+    assert cache.lookup(FP, "plot voltage against hour of day") is None
+    assert cache.lookup(FP, "average Sub_metering_2 per month in 2009",
+                        threshold=1.01) is None
+    assert cache.stats()["misses"] == 3
+
+
+def test_lookup_falls_through_unsubstitutable_entries():
+    cache = CodeCache()
+    cache.store(FP, "average Sub_metering_2 in 2008", "result = df['Sub_metering_2'].mean()")
+    assert cache.lookup(FP, "average Sub_metering_2 in 2009") is None
+
+
+def test_lru_eviction():
+    cache = CodeCache(max_entries=2)
+    cache.store(FP, "total Voltage", "result = df['Voltage'].sum()")
+    cache.store(FP, "total Global_intensity", "result = df['Global_intensity'].sum()")
+    assert cache.lookup(FP, "total Voltage") is not None          # now most recent
+    cache.store(FP, "total Sub_metering_1", "result = df['Sub_metering_1'].sum()")
+    assert cache.lookup(FP, "total Global_intensity") is None
+    assert cache.lookup(FP, "total Voltage") is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_retain_keeps_recent_schemas():
+    cache = CodeCache()
+    for fp in ("s1", "s2", "s3"):
+        cache.store(fp, "total Voltage", "result = df['Voltage'].sum()")
+    assert cache.retain("s3", max_schemas=2) == 1          # s1 is the oldest
+    assert cache.lookup("s1", "total Voltage") is None
+    assert cache.lookup("s2", "total Voltage") is not None
+    assert cache.retain("s1", max_schemas=2) == 1          # new schema pushes out s3
+    assert cache.lookup("s2", "total Voltage") is not None
+    assert cache.lookup("s3", "total Voltage") is None
+
+
+def test_plain_and_compact_loads_keep_their_answers(tmp_path):
+    import main
+
+    path = str(tmp_path / "meters.csv")
+    pd.DataFrame({"Voltage": [240.5, 241.0, 239.75] * 10,
+                  "count": [1.0, 2.0, 3.0] * 10}).to_csv(path, index=False)
+    plain = main.load_dataframe(path)
+    compact = main.load_dataframe(path, compact=True)
+    assert schema_fingerprint(plain) != schema_fingerprint(compact)
+    main.remember_answer(plain, "total Voltage", "_ = df['Voltage'].sum()", path)
+    main.remember_answer(compact, "total Voltage", "_ = df['Voltage'].sum()", path)
+    for df in (plain, compact, plain):
+        out = main.cached_answer(df, "total Voltage", path)
+        assert out is not None and out["result"] == pytest.approx(7212.5)
+
+
+def test_persisted_entries_reload(tmp_path):
+    path = str(tmp_path / "cache" / "q.code_cache.json")
+    CodeCache(path).store(FP, "average Sub_metering_2 per month in 2008", CODE_2008)
+    hit = CodeCache(path).lookup(FP, "average Sub_metering_2 per month in 2010")
+    assert hit["code"] == CODE_2008.replace("2008", "2010")
+
+
+def test_same_stem_sources_keep_separate_caches(tmp_path):
+    csv, txt = tmp_path / "data.csv", tmp_path / "data.txt"
+    assert code_cache_path(str(csv)) != code_cache_path(str(txt))
+    get_code_cache(str(csv)).store(FP, "total Voltage", "result = df['Voltage'].sum()")
+    assert get_code_cache(str(txt)).lookup(FP, "total Voltage") is None
+
+
+def test_schema_fingerprint_ignores_values():
+    a = pd.DataFrame({"x": [1.0, 2.0], "y": ["a", "b"]})
+    b = pd.DataFrame({"x": [5.0, 6.0, 7.0], "y": ["c", "d", "e"]})
+    assert schema_fingerprint(a) == schema_fingerprint(b)
+    assert schema_fingerprint(a) != schema_fingerprint(a.astype({"x": "float32"}))
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.compact import compact_frame, render_report, tidy_datetime_index
+
+
+@pytest.fixture
+def readings():
+    rng = np.random.default_rng(0)
+    n = 1_000
+    idx = pd.date_range("2007-01-01", periods=n, freq="min", name="Datetime")
+    whole_nan = rng.integers(0, 40, n).astype(float)
+    whole_nan[::50] = np.nan
+    return pd.DataFrame({
+        "whole": rng.integers(0, 40, n).astype(float),
+        "whole_nan": whole_nan,
+        "three_dp": np.round(rng.random(n) * 5, 3),
+        "noisy": rng.random(n),
+        "huge": rng.integers(0, 40, n).astype(float) * 1e10,
+        "count": rng.integers(0, 1_000, n),
+        "wide": rng.integers(0, 1_000, n) + 2**40,
+        "kind": rng.choice(["a", "b", "c"], n).astype(object),
+        "label": [f"row{i}" for i in range(n)],
+    }, index=idx)
+
+
+def test_dtypes(readings):
+    out, report = compact_frame(readings)
+    assert out["whole"].dtype == np.int32
+    assert out["whole_nan"].dtype == "Int32"
+    assert out["three_dp"].dtype == np.float32
+    assert out["noisy"].dtype == np.float64                # float32 would round it
+    assert out["huge"].dtype == np.float64                 # whole but past int32
+    assert out["count"].dtype == np.int32
+    assert out["wide"].dtype == np.int64
+    assert isinstance(out["kind"].dtype, pd.CategoricalDtype)
+    assert not isinstance(out["label"].dtype, pd.CategoricalDtype)   # all distinct
+    assert {c for c, _, _ in report["changes"]} == {"whole", "whole_nan", "three_dp",
+                                                      "count", "kind"}
+    assert report["after_mb"] < report["before_mb"]
+
+
+def test_values_unchanged(readings):
+    out, _ = compact_frame(readings)
+    out = out.astype({"whole_nan": "float64", "kind": object})
+    out["three_dp"] = np.round(out["three_dp"].astype(np.float64), 3)
+    pd.testing.assert_frame_equal(out, readings, check_dtype=False, check_freq=False)
+
+
+def test_input_untouched(readings):
+    before = readings.dtypes.copy()
+    compact_frame(readings)
+    pd.testing.assert_series_equal(readings.dtypes, before)
+
+
+def test_all_missing_and_inf_left_alone():
+    df = pd.DataFrame({"empty": [np.nan] * 4, "inf": [1.0, np.inf, 2.0, 3.0]})
+    out, report = compact_frame(df)
+    assert report["changes"] == []
+    assert (out.dtypes == np.float64).all()
+
+
+def test_datetime_index_sorted_with_freq():
+    idx = pd.date_range("2007-01-01", periods=10, freq="min")
+    df = pd.DataFrame({"x": np.arange(10.0)}, index=idx[::-1])
+    out, note = tidy_datetime_index(df)
+    assert out.index.is_monotonic_increasing
+    assert out.index.freqstr == "min"
+    assert note == "index sorted, freq=min"
+
+
+def test_render_report():
+    report = {"before_mb": 100.0, "after_mb": 40.0,
+              "changes": [["Voltage", "float64", "float32"]], "index": "freq=min"}
+    assert render_report(report) == ("memory 100.00 MB → 40.00 MB (-60%); "
+                                     "Voltage float64→float32; freq=min")
+    assert render_report({"before_mb": 0.0, "after_mb": 0.0, "changes": [],
+                          "index": None}) == "memory 0.00 MB → 0.00 MB"
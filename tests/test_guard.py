@@ -0,0 +1,36 @@
+import json
+import os
+
+import pytest
+
+from guard import validate_code, guard_cache_info, _validate_cached
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# verdicts recorded with the multi-pass guard that predates the single-pass
+# rewrite, over the notebook snippets plus failure-path cases
+with open(os.path.join(HERE, "data", "guard_verdicts.json"), encoding="utf-8") as f:
+    RECORDED = json.load(f)
+
+COLUMNS = [
+    "Global_active_power", "Global_reactive_power", "Voltage", "Global_intensity",
+    "Sub_metering_1", "Sub_metering_2", "Sub_metering_3",
+    "PassengerId", "Survived", "Pclass", "Name", "Sex", "Age", "SibSp",
+    "Parch", "Ticket", "Fare", "Cabin", "Embarked",
+]
+
+
+@pytest.mark.parametrize("case", RECORDED, ids=range(len(RECORDED)))
+def test_verdict_matches_recorded(case):
+    assert validate_code(case["code"], {"columns": COLUMNS}) == {
+        "ok": case["ok"], "issues": case["issues"]}
+
+
+def test_verdicts_are_cached_per_column_set():
+    _validate_cached.cache_clear()
+    code = "_ = df['Age'].mean()"
+    assert validate_code(code, {"columns": ["Age"]})["ok"]
+    assert validate_code(code, {"columns": ["Age"]})["ok"]
+    assert not validate_code(code, {"columns": ["Fare"]})["ok"]
+    info = guard_cache_info()
+    assert info.hits == 1 and info.misses == 2
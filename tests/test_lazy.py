@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from utils.lazy import LazyFrame
+
+
+@pytest.fixture
+def power(tmp_path):
+    rng = np.random.default_rng(0)
+    idx = pd.date_range("2007-01-01", periods=5_000, freq="min", name="Datetime")
+    df = pd.DataFrame({"power": rng.random(5_000) * 5,
+                       "meter": rng.integers(0, 30, 5_000).astype(float),
+                       "kind": rng.choice(["a", "b", "c"], 5_000)}, index=idx)
+    df.loc[df.index[::97], "power"] = np.nan
+    path = tmp_path / "power.parquet"
+    df.to_parquet(path)
+    return df, str(path)
+
+
+def test_serve_row_count_reads_the_cached_profile(power, tmp_path, monkeypatch):
+    import main
+
+    df, _ = power
+    path = str(tmp_path / "power.csv")
+    df.reset_index().to_csv(path, index=False)
+    lf = LazyFrame(path, 1_000)
+    main.dataframe_context(lf, path)                 # profiles (and caches) once
+    monkeypatch.setattr(LazyFrame, "iter_chunks",
+                        lambda self: pytest.fail("row count streamed the source"))
+    assert main.row_count(lf, path) == len(df)
+
+
+@pytest.mark.parametrize("func", ["sum", "mean", "min", "max", "std", "var", "count"])
+def test_reductions_match_pandas(power, func):
+    df, path = power
+    lf = LazyFrame(path, 700)
+    assert getattr(lf["power"], func)() == pytest.approx(getattr(df["power"], func)())
+    pd.testing.assert_series_equal(getattr(lf[["power", "meter"]], func)(),
+                                   getattr(df[["power", "meter"]], func)(),
+                                   check_dtype=False, check_names=False)
+
+
+def test_groupby_agg_matches_pandas(power):
+    df, path = power
+    funcs = ["sum", "mean", "min", "max", "std", "count"]
+    got = LazyFrame(path, 700).groupby("kind")["power"].agg(funcs)
+    want = df.groupby("kind")["power"].agg(funcs)
+    pd.testing.assert_frame_equal(got.sort_index(), want, check_dtype=False,
+                                  check_names=False)
+
+
+def test_resample_matches_pandas(power):
+    df, path = power
+    got = LazyFrame(path, 700).resample("h")["power"].mean()
+    want = df.resample("h")["power"].mean()
+    pd.testing.assert_series_equal(got, want, check_dtype=False, check_names=False,
+                                   check_freq=False)
+
+
+def test_loc_window_matches_pandas(power):
+    df, path = power
+    lf = LazyFrame(path, 700)
+    window = lf.loc["2007-01-02 06:00":"2007-01-03 12:00", "power"]
+    want = df.loc["2007-01-02 06:00":"2007-01-03 12:00", "power"]
+    assert len(window) == len(want)
+    assert window.mean() == pytest.approx(want.mean())
+    pd.testing.assert_series_equal(window.collect(), want, check_freq=False)
+
+
+def test_masked_selection_matches_pandas(power):
+    df, path = power
+    lf = LazyFrame(path, 700)
+    got = lf[(lf["meter"] > 10) & lf.index.hour.isin([1, 2])]["power"].sum()
+    want = df[(df["meter"] > 10) & df.index.hour.isin([1, 2])]["power"].sum()
+    assert got == pytest.approx(want)
+
+
+@pytest.mark.parametrize("skip", [0, 1_000, 1_500])
+@pytest.mark.parametrize("rule", ["h", "3h", "D", "2D", "7D", "W", "ME"])
+def test_multi_day_resample_bins_match_pandas(tmp_path, rule, skip):
+    rng = np.random.default_rng(1)
+    idx = pd.date_range("2007-01-01 17:00", periods=20_000, freq="min", name="Datetime")
+    df = pd.DataFrame({"power": rng.random(20_000)}, index=idx).iloc[skip:]
+    path = tmp_path / "minutes.parquet"
+    df.to_parquet(path)
+    got = LazyFrame(str(path), 3_000).resample(rule)["power"].agg(["sum", "count"])
+    want = df.resample(rule)["power"].agg(["sum", "count"])
+    pd.testing.assert_frame_equal(got, want, check_dtype=False, check_freq=False)
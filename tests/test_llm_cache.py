@@ -0,0 +1,138 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from agents.provider import StubChatModel
+from utils import llm_cache, tracing
+from utils.llm_cache import (LRUCache, SQLiteCache, acached_invoke, cache_key,
+                             cached_invoke, set_response_cache)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    cache = LRUCache()
+    monkeypatch.setattr(llm_cache, "_cache", cache)     # restored afterwards
+    monkeypatch.setattr(llm_cache, "_configured", True)
+    return cache
+
+
+def test_cache_key_depends_on_model_and_prompt():
+    assert cache_key("m", "p") == cache_key("m", "p")
+    assert cache_key("m", "p") != cache_key("m2", "p")
+    assert cache_key("m", "p") != cache_key("m", "p ")
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"                   # b is now the oldest
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+    assert cache.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75}
+
+
+def test_lru_ttl_expiry(clock):
+    cache = LRUCache(ttl=60)
+    cache.set("a", "1")
+    clock[0] += 59
+    assert cache.get("a") == "1"
+    clock[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_sqlite_round_trip_across_instances(tmp_path):
+    path = str(tmp_path / "sub" / "replies.sqlite")
+    SQLiteCache(path).set("k", "reply")
+    again = SQLiteCache(path)
+    assert again.get("k") == "reply"
+    assert again.get("missing") is None
+    again.set("k", "newer")                        # INSERT OR REPLACE
+    assert SQLiteCache(path).get("k") == "newer"
+    again.clear()
+    assert SQLiteCache(path).get("k") is None
+
+
+def test_sqlite_ttl_expiry(tmp_path, clock):
+    path = str(tmp_path / "replies.sqlite")
+    SQLiteCache(path, ttl=10).set("k", "reply")
+    clock[0] += 11
+    assert SQLiteCache(path, ttl=10).get("k") is None
+    assert SQLiteCache(path).get("k") is None      # expired rows are deleted
+
+
+def test_sqlite_shared_across_threads(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "replies.sqlite"))
+    errors = []
+
+    def work(t):
+        try:
+            for i in range(50):
+                cache.set(f"{t}-{i}", str(i))
+                assert cache.get(f"{t}-{i}") == str(i)
+        except Exception as exc:                   # pragma: no cover - reported below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=work, args=(t,)) for t in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert cache.stats()["hits"] == 400
+
+
+def test_cached_invoke_hit_skips_the_client(response_cache):
+    built = []
+
+    def factory():
+        built.append(1)
+        return StubChatModel(responder=lambda p: f"reply to {p}")
+
+    with tracing.trace("q") as tr:
+        with tracing.span("llm.generate"):
+            assert cached_invoke(factory, "m", "prompt") == "reply to prompt"
+        with tracing.span("llm.generate"):
+            assert cached_invoke(factory, "m", "prompt") == "reply to prompt"
+    assert built == [1]                            # the hit never built a client
+    assert [s["cache"] for s in tr.spans if s["stage"] == "llm.generate"] == ["miss", "hit"]
+    assert response_cache.get(cache_key("m", "prompt")) == "reply to prompt"
+
+
+def test_use_cache_false_bypasses_the_cache(response_cache):
+    replies = iter(["first", "second"])
+    llm = StubChatModel(responder=lambda p: next(replies))
+    response_cache.set(cache_key("m", "prompt"), "cached")
+    assert cached_invoke(llm, "m", "prompt", use_cache=False) == "first"
+    assert cached_invoke(llm, "m", "prompt", use_cache=False) == "second"
+    assert response_cache.get(cache_key("m", "prompt")) == "cached"
+    assert llm.calls == 2
+
+
+def test_acached_invoke_shares_the_cache(response_cache):
+    llm = StubChatModel(responder=lambda p: "async reply")
+    assert asyncio.run(acached_invoke(llm, "m", "prompt")) == "async reply"
+    assert cached_invoke(llm, "m", "prompt") == "async reply"
+    assert asyncio.run(acached_invoke(llm, "m", "prompt", use_cache=False)) == "async reply"
+    assert llm.calls == 2
+
+
+def test_disabled_cache_always_calls(monkeypatch):
+    monkeypatch.setattr(llm_cache, "_cache", llm_cache._cache)
+    monkeypatch.setattr(llm_cache, "_configured", llm_cache._configured)
+    set_response_cache(None)
+    llm = StubChatModel(responder=lambda p: "reply")
+    for _ in range(2):
+        cached_invoke(llm, "m", "prompt")
+    assert llm.calls == 2
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("matplotlib")
+
+import sandbox
+from utils.plotting import lttb_indices, downsample_for_plot
+
+
+def test_lttb_keeps_endpoints_and_length():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 50)
+    keep = lttb_indices(x, y, 500)
+    assert len(keep) == 500
+    assert keep[0] == 0 and keep[-1] == len(x) - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_lttb_short_input_is_untouched():
+    x = np.arange(10, dtype=float)
+    assert lttb_indices(x, x, 50).tolist() == list(range(10))
+
+
+def test_downsample_for_plot_shares_budget_across_columns():
+    idx = pd.date_range("2007-01-01", periods=20_000, freq="min")
+    df = pd.DataFrame(np.random.default_rng(0).random((20_000, 2)), index=idx, columns=["a", "b"])
+    out = downsample_for_plot(df, max_points=1000)
+    assert len(out) <= 1000
+    assert out.index.is_monotonic_increasing
+
+
+def test_figures_rendered_and_closed():
+    plt = sandbox._pyplot()
+    df = pd.DataFrame({"v": np.arange(50.0)})
+    out = sandbox.run_in_repl("_ = df['v'].plot(title='v')", df, timeout=10)
+    assert out["ok"] and len(out["figures"]) == 1
+    assert out["figures"][0]["data"].startswith(b"\x89PNG")
+    assert plt.get_fignums() == []
+    assert pd.get_option("plotting.backend") == "matplotlib"
+
+
+def test_timed_out_plot_does_not_block_later_plots():
+    sandbox._pyplot()
+    df = pd.DataFrame({"v": np.arange(5.0)})
+    spin = "plt.figure()\nimport time\nfor _ in range(400): time.sleep(0.01)"
+    assert sandbox.run_in_repl(spin, df, timeout=0.2) == {"ok": False, "error": "Timeout"}
+    out = sandbox.run_in_repl("plt.plot([1, 2, 3])", df, timeout=3)
+    assert out["ok"] and len(out["figures"]) == 1
+    assert pd.get_option("plotting.backend") == "matplotlib"
@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+
+from utils.compact import compact_frame
+from utils.profile import compute_profile, render_profile
+
+
+def test_sample_rows_of_compacted_frame_have_no_float32_noise():
+    df = pd.DataFrame({"power": [55.7, 44.836, np.nan, 1.25],
+                       "kind": ["a", "b", "a", "a"]})
+    compacted, _ = compact_frame(df)
+    assert compacted["power"].dtype == np.float32
+    text = render_profile(compute_profile(compacted))
+    assert "55.7" in text and "44.836" in text
+    assert "55.70000076293945" not in text and "44.83599853515625" not in text
+    assert "nan" in text
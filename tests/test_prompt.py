@@ -0,0 +1,37 @@
+import pytest
+
+from utils.prompt import (MAX_REPAIR_CODE_CHARS, MAX_REPAIR_ERROR_CHARS, _truncate,
+                          build_repair_prompt, render_generation_prompt)
+
+BASE = render_generation_prompt("columns: a:float64", "total of a")
+
+
+@pytest.mark.parametrize("size", [10, 599, 600, 601, 5_000, 1_000_000])
+def test_truncate_respects_the_limit(size):
+    text = "".join(chr(ord("a") + i % 26) for i in range(size))
+    out = _truncate(text, 600)
+    assert len(out) <= 600
+    if size <= 600:
+        assert out == text
+    else:
+        assert out.startswith(text[:200]) and out.endswith(text[-200:])
+        assert f"[{size} chars, middle truncated]" in out
+
+
+def test_repair_block_is_bounded():
+    code = "_ = df['a'].sum()\n" * 5_000
+    error = "Traceback (most recent call last):\n" + "  File ...\n" * 10_000 + "KeyError: 'b'"
+    prompt = build_repair_prompt(BASE, code, "sandbox", error)
+    assert prompt.startswith(BASE)
+    block = prompt[len(BASE):]
+    fixed = len(build_repair_prompt("", "", "sandbox", ""))
+    assert len(block) <= fixed + MAX_REPAIR_CODE_CHARS + MAX_REPAIR_ERROR_CHARS
+    assert "KeyError: 'b'" in block                   # the tail of the error survives
+
+
+def test_repair_prompts_do_not_grow_with_attempts():
+    code, error = "_ = df['b']" * 400, "KeyError: 'b'" * 400
+    first = build_repair_prompt(BASE, code, "sandbox", error)
+    again = build_repair_prompt(BASE, code + "# retry", "sandbox", error + " again")
+    assert abs(len(again) - len(first)) <= 1
+    assert again.count("Previous attempt failed") == 1
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+from agents import provider
+from agents.provider import StubChatModel, run_async
+
+
+def test_run_async_reuses_one_event_loop():
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    first = run_async(current_loop())
+    seen = []
+    threads = [threading.Thread(target=lambda: seen.append(run_async(current_loop())))
+               for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert seen == [first] * 3
+    assert not first.is_closed()
+
+
+def test_shared_client_across_async_calls():
+    llm = provider.get_llm("generator")
+    assert isinstance(llm, StubChatModel)
+    for _ in range(2):
+        assert run_async(llm.ainvoke("prompt")).content
+    assert provider.get_llm("generator") is llm
+
+
+def test_speculative_runs_repeatedly_on_the_shared_loop():
+    import pandas as pd
+    from agents.meta_agent import speculative_generate_and_execute
+
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0]})
+    for _ in range(2):                        # second call reuses loop + clients
+        out = speculative_generate_and_execute("question", df, k=2)
+        assert out["ok"] and out["code"] == provider.STUB_CODE_REPLY
+
+
+def test_speculative_repairs_stay_within_max_tries(monkeypatch):
+    import pandas as pd
+    from agents import meta_agent
+    from utils import llm_cache
+
+    def factory(model="stub", temperature=0, **_):
+        return StubChatModel(model, temperature, responder=lambda p: "_ = df['nope'].sum()")
+
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setattr(llm_cache, "_configured", True)
+    provider.set_backend(factory)
+    try:
+        df = pd.DataFrame({"a": [1.0, 2.0, 3.0]})
+        out = meta_agent.speculative_generate_and_execute("question", df, k=3)
+        assert not out["ok"]
+        assert out["attempts"] == meta_agent.MAX_TRIES
+        assert out["error"].startswith(f"Failed after {meta_agent.MAX_TRIES} tries (guard)")
+        monkeypatch.setattr(meta_agent, "MAX_TRIES", 1)
+        assert meta_agent.speculative_generate_and_execute("question", df, k=2)["attempts"] == 1
+    finally:
+        provider.set_backend("stub")
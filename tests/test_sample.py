@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.meta_agent import _sample_error_is_conclusive, guard_and_run
+from utils.sample import stratified_sample
+
+
+@pytest.fixture
+def passengers():
+    rng = np.random.default_rng(0)
+    n = 20_000
+    df = pd.DataFrame({
+        "Name": [f"Passenger {i}" for i in range(n)],
+        "Sex": rng.choice(["male", "female"], n, p=[0.9999, 0.0001]),
+        "Embarked": rng.choice(["S", "C", "Q"], n),
+        "Fare": rng.random(n) * 100,
+    })
+    df.loc[12_345, "Name"] = "Braund, Mr. Owen Harris"
+    df.loc[12_345, "Fare"] = 12345.0
+    df.loc[17_777, "Sex"] = "unknown"
+    return df
+
+
+@pytest.mark.parametrize("error, conclusive", [
+    ("NameError: name 'dff' is not defined", True),
+    ("AttributeError: 'DataFrame' object has no attribute 'foo'", True),
+    ("TypeError: unsupported operand type(s)", True),
+    ("Timeout: snippet ran longer than 2s", True),
+    ("KeyError: 'Braund, Mr. Owen Harris'", False),
+    ("KeyError: '2007-03'", False),
+    ("KeyError: Timestamp('2006-12-25 00:00:00')", False),
+    ("KeyError: 17", False),
+    ("KeyError: 'Fare'", False),
+    ("ValueError: cannot reindex on an axis with duplicate labels", False),
+    ("IndexError: single positional indexer is out-of-bounds", False),
+])
+def test_sample_error_is_conclusive(error, conclusive):
+    assert _sample_error_is_conclusive(error) is conclusive
+
+
+def test_label_missing_from_sample_still_runs_on_full_frame(passengers):
+    code = "df.set_index('Name').loc['Braund, Mr. Owen Harris', 'Fare']"
+    run, error_type, error = guard_and_run(code, passengers)
+    assert error is None
+    assert run["result"] == 12345.0
+
+
+@pytest.mark.filterwarnings("error")      # pandas 3: 'object' alone no longer picks str
+def test_sample_keeps_every_string_value(passengers):
+    sample = stratified_sample(passengers, n_rows=500)
+    assert len(sample) < len(passengers)
+    for col in ("Sex", "Embarked"):
+        assert set(sample[col]) == set(passengers[col])
+    assert sample.dtypes.equals(passengers.dtypes)
+    assert sample.index.is_monotonic_increasing
+
+
+def test_small_frame_is_its_own_sample(passengers):
+    small = passengers.head(100)
+    assert stratified_sample(small) is small
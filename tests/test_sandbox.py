@@ -0,0 +1,131 @@
+import gc
+import multiprocessing as mp
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sandbox
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({"a": np.arange(100.0), "k": ["x", "y"] * 50})
+
+
+class _DeadWorker:
+    def wait_ready(self, timeout):
+        return False
+
+    def kill(self):
+        pass
+
+
+def test_drained_pool_errors_instead_of_blocking(frame):
+    pytest.importorskip("pyarrow")
+    pool = sandbox.attach_pool(frame, workers=1, timeout=0.5)
+    try:
+        pool._spawn = _DeadWorker                    # every restart fails
+        assert pool.run("while True: pass") == {"ok": False, "error": "Timeout"}
+        for _ in range(50):
+            if not pool.alive:
+                break
+            threading.Event().wait(0.1)
+        assert not pool.alive
+        assert pool.run("_ = 1")["error"] == "Sandbox pool has no workers left"
+        # run_in_repl falls back to in-thread execution
+        assert sandbox.run_in_repl("_ = df['a'].sum()", frame)["result"] == 4950.0
+    finally:
+        sandbox.close_pools()
+
+
+def test_cpu_limit_failure_is_reported(frame, monkeypatch):
+    def broken(cpu_seconds):
+        raise ValueError("not allowed to raise maximum limit")
+
+    monkeypatch.setattr(sandbox, "_arm_cpu_limit", broken)
+    parent, child = mp.Pipe()
+    worker = threading.Thread(target=sandbox._worker_main,
+                              args=(child, ("pickle", frame), 1.0, None))
+    worker.start()
+    assert parent.recv() == "ready"
+    parent.send(("_ = 1", "full", None))
+    reply = parent.recv()
+    parent.send(None)
+    worker.join(5)
+    assert reply["ok"] is False and "not allowed" in reply["error"]
+
+
+def test_module_caches_hold_frames_weakly():
+    df = pd.DataFrame({"a": np.arange(1000.0)})
+    assert sandbox.run_in_repl("_ = df['a'].mean()", df, tier="sample")["ok"]
+    key = id(df)
+    assert key in sandbox._samples
+    del df
+    gc.collect()
+    assert key not in sandbox._samples
+
+
+def test_pool_closes_with_its_frame():
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame({"a": np.arange(10.0)})
+    pool = sandbox.attach_pool(df, workers=1)
+    key = id(df)
+    del df
+    gc.collect()
+    assert key not in sandbox._pools
+    assert not pool.alive
+
+
+MUTATIONS = [
+    "df['a'] = 0",
+    "df.loc[df.index[0], 'a'] = -1.0",
+    "df.drop(columns=['k'], inplace=True)",
+    "df['hour'] = 1",
+    "df.sort_values('a', ascending=False, inplace=True)",
+    "df.set_index('k', inplace=True)",
+]
+
+
+@pytest.mark.parametrize("code", MUTATIONS)
+def test_mutating_snippet_leaves_frame_untouched(frame, code):
+    before = frame.copy(deep=True)
+    out = sandbox.run_in_repl(code + "\n_ = len(df.columns)", frame)
+    assert out["ok"], out
+    pd.testing.assert_frame_equal(frame, before)
+
+
+def test_pool_workers_do_not_leak_mutations(frame):
+    pytest.importorskip("pyarrow")
+    sandbox.attach_pool(frame, workers=1)
+    try:
+        assert sandbox.run_in_repl("df['a'] = 0\ndf['new'] = 1\n_ = 0", frame)["ok"]
+        out = sandbox.run_in_repl("_ = (float(df['a'].sum()), list(df.columns))", frame)
+        assert out["result"] == (4950.0, ["a", "k"])
+    finally:
+        sandbox.close_pools()
+
+
+def test_deferred_pool_starts_on_the_first_cache_miss(tmp_path):
+    pytest.importorskip("pyarrow")
+    import main
+    from utils.code_cache import get_code_cache, schema_fingerprint
+
+    path = str(tmp_path / "a.csv")
+    df = pd.DataFrame({"a": np.arange(100.0)})
+    df.to_csv(path, index=False)
+    get_code_cache(path).store(schema_fingerprint(df), "total of a", "_ = df['a'].sum()")
+    ctx = main.dataframe_context(df)
+    sandbox.defer_pool(df, workers=1)
+    try:
+        out = main.answer_query(df, ctx, "total of a", validation="off", source=path)
+        assert out["ok"] and "cached_from" in out
+        assert sandbox.get_pool(df) is None              # a hit needs no workers
+        out = main.answer_query(df, ctx, "describe it", validation="off", source=path)
+        assert out["ok"] and "cached_from" not in out
+        pool = sandbox.get_pool(df)
+        assert pool is not None and pool.alive
+        assert sandbox.ensure_pool(df) is pool           # started once
+    finally:
+        sandbox.close_pools()
@@ -0,0 +1,17 @@
+import io
+import json
+
+import pandas as pd
+
+import main
+
+
+def test_serve_reply_carries_the_summary_once():
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0]})
+    out = io.StringIO()
+    main.serve(df, main.dataframe_context(df), stdin=io.StringIO('{"id": 7, "query": "describe"}\n'),
+               stdout=out, reuse=False, validation="off")
+    reply = json.loads(out.getvalue())
+    assert reply["id"] == 7 and reply["ok"]
+    assert "result_summary" not in reply
+    assert "count" in reply["result"]
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.summarize import EDGE_ROWS, MAX_CHARS, MAX_COLS, summarize_result
+
+
+def test_wide_frame_stays_within_the_cap():
+    wide = pd.DataFrame(np.random.default_rng(0).random((50_000, 300)),
+                        columns=[f"a_rather_long_sensor_column_name_{i}" for i in range(300)])
+    text = summarize_result(wide)
+    assert len(text) <= MAX_CHARS
+    assert text.startswith("DataFrame shape=(50000, 300)")
+    assert f"(+{300 - MAX_COLS} more)" in text
+
+
+def test_long_series_shows_only_its_edges(monkeypatch):
+    idx = pd.date_range("2007-01-01", periods=2_000_000, freq="min")
+    series = pd.Series(np.arange(2_000_000.0), index=idx, name="power")
+    rendered = []
+    original = pd.Series.to_string
+
+    def to_string(self, *args, **kwargs):
+        rendered.append(len(self))
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(pd.Series, "to_string", to_string)
+    text = summarize_result(series)
+    assert len(text) <= MAX_CHARS
+    assert rendered == [EDGE_ROWS, EDGE_ROWS]          # never the full repr
+    assert "len=2000000" in text and "\n...\n" in text
+    assert "1999999.0" in text
+
+
+@pytest.mark.parametrize("result", [
+    "x" * 10_000,
+    list(range(100_000)),
+    {f"key{i}": "v" * 500 for i in range(1_000)},
+    np.arange(1_000_000).reshape(1000, 1000),
+    pd.Index([f"label-{i}" * 20 for i in range(10_000)]),
+])
+def test_other_results_stay_within_the_cap(result):
+    assert len(summarize_result(result)) <= MAX_CHARS
+
+
+def test_custom_cap():
+    text = summarize_result(pd.DataFrame({"a": range(1_000)}), max_chars=50)
+    assert len(text) == 50 and text.endswith("…")
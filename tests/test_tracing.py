@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+
+from utils import tracing
+
+
+def _spans(durations, stage="sandbox.full", **attrs):
+    return [{"stage": stage, "start": 0.0, "seconds": s, **attrs} for s in durations]
+
+
+@pytest.mark.parametrize("pct, expected", [(0, 1), (10, 1), (50, 5), (51, 6),
+                                           (90, 9), (99, 10), (100, 10)])
+def test_percentile_is_nearest_rank(pct, expected):
+    assert tracing._percentile([float(i) for i in range(1, 11)], pct) == expected
+
+
+def test_percentile_of_100_values():
+    values = [float(i) for i in range(1, 101)]
+    assert tracing._percentile(values, 50) == 50
+    assert tracing._percentile(values, 95) == 95
+    assert tracing._percentile(values, 99) == 99
+    assert tracing._percentile([], 50) == 0.0
+
+
+def test_summarize_known_durations():
+    spans = (_spans([0.4, 0.1, 0.3, 0.2])
+             + _spans([1.0, 3.0], stage="llm.generate", prompt_tokens=100,
+                      response_tokens=10, cache="miss")
+             + _spans([0.0], stage="llm.generate", prompt_tokens=100,
+                      response_tokens=10, cache="hit")
+             + [{"stage": "retry", "start": 0.0, "seconds": 0.0, "cause": "guard"},
+                {"stage": "retry", "start": 0.0, "seconds": 0.0, "cause": "guard"},
+                {"stage": "retry", "start": 0.0, "seconds": 0.0, "cause": "critic"}])
+    summary = tracing.summarize(spans)
+    assert summary["stages"]["sandbox.full"] == {"count": 4, "total": 1.0, "mean": 0.25,
+                                                 "p50": 0.2, "p99": 0.4, "max": 0.4}
+    assert summary["stages"]["llm.generate"] == {"count": 3, "total": 4.0, "mean": 1.3333,
+                                                 "p50": 1.0, "p99": 3.0, "max": 3.0}
+    assert "retry" not in summary["stages"]
+    assert summary["retries"] == {"guard": 2, "critic": 1}
+    assert summary["tokens"] == {"prompt": 300, "response": 30}
+    assert summary["llm_cache"] == {"hit": 1, "miss": 2}
+
+
+def test_format_report():
+    report = tracing.format_report(tracing.summarize(_spans([0.5, 1.5])))
+    lines = report.splitlines()
+    assert lines[0].split() == ["stage", "count", "total", "s", "p50", "s", "p99", "s",
+                                "max", "s"]
+    assert lines[1].split() == ["sandbox.full", "2", "2.000", "0.500", "1.500", "1.500"]
+    assert lines[2:] == ["retries: {}", "tokens : {'prompt': 0, 'response': 0}",
+                         "cache  : {'hit': 0, 'miss': 0}"]
+
+
+def test_annotate_reaches_the_innermost_span():
+    with tracing.trace("q") as tr:
+        with tracing.span("outer"):
+            with tracing.span("inner"):
+                tracing.annotate(ok=True)
+            tracing.annotate(cache="hit")
+    inner, outer = tr.spans                      # finished innermost first
+    assert (inner["stage"], inner["ok"]) == ("inner", True)
+    assert (outer["stage"], outer["cache"]) == ("outer", "hit")
+    assert "cache" not in inner and "ok" not in outer
+    assert outer["seconds"] >= inner["seconds"]
+
+
+def test_span_records_errors():
+    with tracing.trace("q") as tr:
+        with pytest.raises(KeyError):
+            with tracing.span("sandbox.full"):
+                raise KeyError("x")
+    assert tr.spans[0]["error"] == "KeyError"
+
+
+def test_concurrent_threads_keep_their_own_traces():
+    barrier = threading.Barrier(4)
+    traces = {}
+
+    def work(i):
+        with tracing.trace(i) as tr:
+            barrier.wait()
+            for _ in range(20):
+                with tracing.span(f"stage-{i}"):
+                    tracing.annotate(owner=i)
+            tracing.event("retry", cause=f"c{i}")
+        traces[i] = tr
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i, tr in traces.items():
+        assert len(tr.spans) == 21
+        assert {s["trace"] for s in tr.spans} == {i}
+        assert {s["stage"] for s in tr.spans} == {f"stage-{i}", "retry"}
+        assert all(s.get("owner", i) == i for s in tr.spans)
+
+
+def test_concurrent_tasks_and_worker_threads_keep_their_own_traces():
+    def blocking(i):
+        with tracing.span("sandbox.full"):
+            tracing.annotate(owner=i)
+
+    async def query(i):
+        with tracing.trace(i) as tr:
+            with tracing.span("llm.generate"):
+                await asyncio.sleep(0.01)
+                tracing.annotate(owner=i)
+            await asyncio.to_thread(blocking, i)
+        return tr
+
+    async def main():
+        return await asyncio.gather(*(query(i) for i in range(5)))
+
+    for i, tr in enumerate(asyncio.run(main())):
+        assert [(s["stage"], s["owner"], s["trace"]) for s in tr.spans] == \
+            [("llm.generate", i, i), ("sandbox.full", i, i)]
+
+
+def test_spans_outside_a_trace_are_not_collected():
+    with tracing.trace("q") as tr:
+        pass
+    with tracing.span("orphan"):
+        tracing.annotate(ok=True)
+    assert tr.spans == []
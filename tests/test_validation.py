@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from agents import crosschecker
+from agents.crosschecker import cross_check, validate_answer
+
+VALID = json.dumps({"valid": True, "reason": "ok", "fix_hint": ""})
+INVALID = json.dumps({"valid": False, "reason": "wrong column", "fix_hint": "use x"})
+
+
+@pytest.fixture
+def critic(monkeypatch):
+    """Scripted critic: returns queued replies and records (model, use_cache)."""
+    replies, calls = [], []
+
+    def invoke(llm, model, prompt, use_cache=True):
+        calls.append((model, use_cache))
+        return replies.pop(0)
+
+    monkeypatch.setattr(crosschecker, "cached_invoke", invoke)
+    monkeypatch.setattr(crosschecker, "_verdicts", crosschecker.LRUCache(maxsize=8))
+    return replies, calls
+
+
+def test_off_skips_the_critic(critic):
+    _, calls = critic
+    verdict = validate_answer("q", "ctx", "code", policy="off")
+    assert verdict["valid"]
+    assert calls == []
+
+
+def test_single_reuses_the_critic_loop_verdict(critic):
+    replies, calls = critic
+    replies.append(INVALID)
+    assert cross_check("q", "ctx", "code", "42") == {"valid": False,
+                                                      "reason": "wrong column",
+                                                      "fix_hint": "use x"}
+    verdict = validate_answer("q", "ctx", "code", policy="single", result_snippet="42")
+    assert not verdict["valid"]
+    assert len(calls) == 1                                  # served from the memo
+
+
+def test_single_on_a_different_result_asks_again(critic):
+    replies, calls = critic
+    replies.extend([VALID, INVALID])
+    cross_check("q", "ctx", "code", "42")
+    assert not validate_answer("q", "ctx", "code", "single", result_snippet="43")["valid"]
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("votes, valid, tally", [
+    ([VALID, VALID, INVALID], True, "2/3 valid"),
+    ([VALID, INVALID, INVALID], False, "1/3 valid"),
+    ([INVALID, VALID, VALID], True, "2/3 valid"),
+])
+def test_consensus_takes_the_majority(critic, votes, valid, tally):
+    replies, calls = critic
+    replies.extend(votes)
+    verdict = validate_answer("q", "ctx", "code", policy="consensus", n=3)
+    assert verdict["valid"] is valid
+    assert verdict["votes"] == tally
+    # the reason comes from the winning side
+    assert verdict["reason"] == ("ok" if valid else "wrong column")
+    # first verdict is the memoised critic; the rest are fresh, uncached votes
+    assert calls[0] == (crosschecker.model_name("critic"), True)
+    assert calls[1:] == [(crosschecker.model_name("critic_vote"), False)] * 2
+
+
+def test_consensus_of_one_is_single(critic):
+    replies, calls = critic
+    replies.append(VALID)
+    verdict = validate_answer("q", "ctx", "code", policy="consensus", n=1)
+    assert verdict["valid"] and "votes" not in verdict
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("n", [1, 3])
+def test_unknown_policy_fails_before_any_critic_call(critic, n):
+    with pytest.raises(ValueError, match="Unknown validation policy"):
+        validate_answer("q", "ctx", "code", policy="bogus", n=n)
+    assert critic[1] == []
+
+
+def test_unparseable_vote_counts_as_invalid(critic):
+    replies, _ = critic
+    replies.extend([VALID, "not json", "```json\n" + INVALID + "\n```"])
+    verdict = validate_answer("q", "ctx", "code", policy="consensus", n=3)
+    assert not verdict["valid"]
+    assert verdict["votes"] == "1/3 valid"
@@ -0,0 +1,130 @@
+"""
+utils/cache.py
+
+On-disk columnar cache for preprocessed DataFrames.
+
+Text sources (.txt / .csv) are parsed once and written as uncompressed
+Feather next to the source file, under ``.safeframe_cache/``.  Later runs
+memory-map the Feather file instead of re-parsing the text.
+
+Cache entries are keyed by:
+    * absolute source path
+    * source mtime (ns) and size
+    * loader version (bump when the preprocessing changes)
+
+File names are ``<stem>-<source id>-<version id>-<fingerprint><suffix>``.
+The source id (a hash of the absolute path) keeps ``data.csv`` /
+``data.txt`` / ``data-2`` in one folder from replacing each other's
+entries; the version id keeps variants of one source (plain and
+``--compact`` loads, their profiles) side by side.  A newer entry only
+replaces older ones with the same source and version, i.e. after the
+source file changed.
+
+Feather needs ``pyarrow``; without it the loader is simply called directly.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:                                  # pandas loads with the first frame
+    import pandas as pd
+
+CACHE_DIRNAME = ".safeframe_cache"
+
+
+def cache_dir_for(path: str) -> str:
+    """Return the cache directory that sits next to *path*."""
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIRNAME)
+
+
+def source_fingerprint(path: str, version: str) -> str:
+    """Hash of (abs path, mtime, size, loader version) for *path*."""
+    st = os.stat(path)
+    key = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{version}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def source_id(path: str) -> str:
+    """Short hash of the absolute path; tells same-stem sources apart."""
+    return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+
+
+def _entry_prefix(path: str, version: str) -> str:
+    """File-name prefix shared by every cache entry of (*path*, *version*)."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    version_id = hashlib.sha1(version.encode("utf-8")).hexdigest()[:8]
+    return f"{stem}-{source_id(path)}-{version_id}-"
+
+
+def cache_path_for(path: str, version: str, suffix: str = ".feather") -> str:
+    """Return the cache file for *path* under the current fingerprint."""
+    return os.path.join(cache_dir_for(path),
+                        f"{_entry_prefix(path, version)}{source_fingerprint(path, version)}{suffix}")
+
+
+def prune_stale(path: str, version: str, keep: str, suffix: str) -> None:
+    """Remove older entries of the same kind for the same source and version."""
+    folder = cache_dir_for(path)
+    prefix = _entry_prefix(path, version)
+    for name in os.listdir(folder):
+        full = os.path.join(folder, name)
+        if name.startswith(prefix) and name.endswith(suffix) and full != keep:
+            try:
+                os.remove(full)
+            except OSError:
+                pass
+
+
+def load_cached_frame(path: str,
+                      loader: Callable[[str], pd.DataFrame],
+                      version: str,
+                      *, use_cache: bool = True) -> pd.DataFrame:
+    """Return ``loader(path)``, served from the Feather cache when warm.
+
+    Parameters
+    ----------
+    path : str
+        Source file (text format that is expensive to parse).
+    loader : callable
+        Function that parses + preprocesses *path* into a DataFrame.
+    version : str
+        Loader version; part of the cache key.
+    use_cache : bool, default True
+        Set False to bypass the cache entirely.
+    """
+    if not use_cache:
+        return loader(path)
+    try:
+        import pyarrow                           # optional dependency
+        import pyarrow.feather as feather
+    except ImportError:
+        return loader(path)
+
+    target = cache_path_for(path, version)
+    if os.path.exists(target):
+        try:
+            # pandas metadata in the schema restores the index on read
+            return feather.read_table(target, memory_map=True).to_pandas()
+        except Exception:
+            pass                                  # corrupt entry → rebuild
+
+    df = loader(path)
+    tmp = target + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # uncompressed so the reader can memory-map the columns
+        feather.write_feather(df, tmp, compression="uncompressed")
+        os.replace(tmp, target)                   # atomic publish
+        prune_stale(path, version, target, ".feather")
+    except (OSError, ValueError, TypeError, pyarrow.ArrowException):
+        pass                                      # read-only dir / odd dtypes
+    finally:
+        if os.path.exists(tmp):                   # failed write: no orphan
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+    return df
@@ -0,0 +1,321 @@
+"""
+utils/code_cache.py
+
+Semantic query → code cache.
+
+Users keep asking near-identical questions ("average Sub_metering_2 per
+month in 2008", then "... in 2009").  Once the critic has approved code for
+a question, the pair is stored here under the dataset's *schema
+fingerprint*; a later question that is close enough reuses that code
+without any LLM call.  The caller still re-runs it through the guard and
+sandbox, so a stale entry can only cost one sandbox run.
+
+Matching is local and offline:
+
+* Literals in the question (years, month names, numbers, quoted strings)
+  are replaced by placeholders (``<year>``, ``<month>``, ``<num>``,
+  ``<str>``), and the remaining words are compared with TF-IDF cosine
+  similarity over the stored questions.
+* When the best match is above ``SIMILARITY_THRESHOLD``, the literals that
+  differ are substituted into the stored code ('2008' → '2009').  A literal
+  that differs but cannot be found in the code (or whose substitution would
+  be ambiguous) makes the entry unusable for that question.
+
+Entries are bounded (LRU) and tied to the schema fingerprint (column names,
+dtypes, index type).  A cache bound to a dataset file keeps the entries of
+its ``MAX_SCHEMAS`` most recently used fingerprints, so variants of one
+file (plain and ``--compact`` loads) don't wipe each other's answers, while
+a schema the file no longer has ages out.  File-backed datasets persist
+their cache as JSON under ``.safeframe_cache/``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.cache import cache_dir_for, source_id
+
+SIMILARITY_THRESHOLD = 0.9
+MAX_ENTRIES = 256
+MAX_SCHEMAS = 4             # fingerprints kept per cache by retain()
+CODE_CACHE_VERSION = 1
+
+_MONTHS = ["january", "february", "march", "april", "may", "june", "july",
+           "august", "september", "october", "november", "december"]
+_MONTH_NUMBER = {m: i + 1 for i, m in enumerate(_MONTHS)}
+
+_TOKEN_RE = re.compile(r"""'([^']*)'|"([^"]*)"|(\d+(?:\.\d+)?)(?![\w.])|([A-Za-z_][\w]*)""")
+_STOPWORDS = frozenset("""
+    a an the of in on for to from by with and or at as is are was were be
+    what which show me give find please each per all across over during
+    this that there how do does
+""".split())
+
+
+# -----------------------------------------------------------------------------
+# Schema fingerprint
+# -----------------------------------------------------------------------------
+
+def schema_fingerprint(df) -> str:
+    """Hash of column names + dtypes + index type; data changes don't alter it."""
+    from utils.lazy import LazyFrame
+
+    frame = df.schema() if isinstance(df, LazyFrame) else df
+    parts = [f"{name}:{dtype}" for name, dtype in frame.dtypes.items()]
+    parts.append(f"index:{type(frame.index).__name__}:{frame.index.dtype}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+# -----------------------------------------------------------------------------
+# Query analysis
+# -----------------------------------------------------------------------------
+
+def analyse_query(query: str) -> Tuple[List[str], List[Tuple[str, str]]]:
+    """Split *query* into normalised word tokens and its literals.
+
+    Returns (tokens, literals); literals are (kind, value) pairs in order of
+    appearance and stand as placeholders in *tokens*.
+    """
+    tokens: List[str] = []
+    literals: List[Tuple[str, str]] = []
+    for match in _TOKEN_RE.finditer(query):
+        single, double, number, word = match.groups()
+        if single is not None or double is not None:
+            kind, value = "str", single if single is not None else double
+        elif number is not None:
+            is_year = len(number) == 4 and number.isdigit() and number[:2] in ("19", "20")
+            kind, value = ("year" if is_year else "num"), number
+        elif word.lower() in _MONTHS:
+            kind, value = "month", word.lower()
+        else:
+            word = word.lower()
+            if word not in _STOPWORDS:
+                tokens.append(word)
+            continue
+        literals.append((kind, value))
+        tokens.append(f"<{kind}>")
+    return tokens, literals
+
+
+def _tfidf(tokens: List[str], doc_freq: Counter, n_docs: int) -> Dict[str, float]:
+    counts = Counter(tokens)
+    return {t: (1 + math.log(c)) * (math.log((1 + n_docs) / (1 + doc_freq[t])) + 1)
+            for t, c in counts.items()}
+
+
+def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    dot = sum(w * b.get(t, 0.0) for t, w in a.items())
+    norm = math.sqrt(sum(w * w for w in a.values())) * math.sqrt(sum(w * w for w in b.values()))
+    return dot / norm if norm else 0.0
+
+
+def _literal_pattern(kind: str, value: str) -> str:
+    """Regex for where a query literal shows up in code."""
+    if kind == "str":
+        return r"(?<=['\"])" + re.escape(value) + r"(?=['\"])"
+    if kind == "month":
+        # month numbers inside date strings: '2007-01', '2007-01-15'
+        return r"(?<=['\"]\d{4}-)" + f"{_MONTH_NUMBER[value]:02d}" + r"(?=['\"-])"
+    return r"(?<![\w.])" + re.escape(value) + r"(?![\w.])"
+
+
+def _literal_text(kind: str, value: str) -> str:
+    return f"{_MONTH_NUMBER[value]:02d}" if kind == "month" else value
+
+
+def substitute_literals(code: str, old: List[Tuple[str, str]],
+                        new: List[Tuple[str, str]]) -> Optional[str]:
+    """Rewrite *code* written for literals *old* to use *new*.
+
+    Returns None when the literal lists don't line up, a changed literal
+    does not appear in *code*, or the mapping is ambiguous.
+    """
+    if [k for k, _ in old] != [k for k, _ in new]:
+        return None
+    changes: Dict[Tuple[str, str], str] = {}
+    unchanged = set()
+    for (kind, before), (_, after) in zip(old, new):
+        if before == after:
+            unchanged.add((kind, before))
+            continue
+        key = (kind, before)
+        if changes.get(key, after) != after:
+            return None                        # same literal mapped two ways
+        changes[key] = after
+    if unchanged & set(changes):
+        return None                            # literal both kept and changed
+
+    # two phases so 2007→2008 and 2008→2009 don't cascade
+    staged = code
+    for i, (kind, before) in enumerate(changes):
+        staged, hits = re.subn(_literal_pattern(kind, before), f"\0{i}\0", staged)
+        if not hits:
+            return None
+    for i, ((kind, _), after) in enumerate(changes.items()):
+        staged = staged.replace(f"\0{i}\0", _literal_text(kind, after))
+    return staged
+
+
+# -----------------------------------------------------------------------------
+# Store
+# -----------------------------------------------------------------------------
+
+class CodeCache:
+    """Thread-safe LRU of critic-approved (query, schema) → code entries.
+
+    Parameters
+    ----------
+    path : str, optional
+        JSON file to persist entries in; in-memory only when omitted.
+    max_entries : int
+        Oldest (least recently used) entries are evicted past this size.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = MAX_ENTRIES) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            self._load()
+
+    # ---- persistence -------------------------------------------------------
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return
+        if payload.get("version") != CODE_CACHE_VERSION:
+            return
+        for entry in payload.get("entries", []):
+            self._entries[self._entry_key(entry["fingerprint"], entry["query"])] = entry
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": CODE_CACHE_VERSION,
+                           "entries": list(self._entries.values())}, f)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass                                  # read-only dir: memory only
+
+    @staticmethod
+    def _entry_key(fingerprint: str, query: str) -> str:
+        tokens, literals = analyse_query(query)
+        return f"{fingerprint}|{' '.join(tokens)}|{literals}"
+
+    # ---- API ---------------------------------------------------------------
+
+    def retain(self, fingerprint: str, max_schemas: int = MAX_SCHEMAS) -> int:
+        """Keep *fingerprint* and the most recently used other schemas.
+
+        Entries of schemas beyond the *max_schemas* most recent ones are
+        dropped; returns how many entries were dropped.
+        """
+        with self._lock:
+            recent = [fingerprint]
+            for entry in reversed(self._entries.values()):    # most recent first
+                if entry["fingerprint"] not in recent:
+                    recent.append(entry["fingerprint"])
+            keep = set(recent[:max(1, max_schemas)])
+            stale = [k for k, e in self._entries.items() if e["fingerprint"] not in keep]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self._save()
+        return len(stale)
+
+    def store(self, fingerprint: str, query: str, code: str) -> None:
+        """Remember critic-approved *code* for *query* on this schema."""
+        tokens, literals = analyse_query(query)
+        entry = {"fingerprint": fingerprint, "query": query, "tokens": tokens,
+                 "literals": literals, "code": code, "created": time.time()}
+        with self._lock:
+            key = self._entry_key(fingerprint, query)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def lookup(self, fingerprint: str, query: str,
+               threshold: float = SIMILARITY_THRESHOLD) -> Optional[dict]:
+        """Best reusable entry for *query*, with literals substituted.
+
+        Returns {'code', 'query', 'similarity'} (the stored question and its
+        score) or None.  Candidates are tried best-first, so an entry whose
+        literals can't be substituted falls through to the next one.
+        """
+        tokens, literals = analyse_query(query)
+        with self._lock:
+            candidates = [(k, e) for k, e in self._entries.items()
+                          if e["fingerprint"] == fingerprint]
+            doc_freq: Counter = Counter()
+            for _, entry in candidates:
+                doc_freq.update(set(entry["tokens"]))
+            doc_freq.update(set(tokens))
+            n_docs = len(candidates) + 1
+            target = _tfidf(tokens, doc_freq, n_docs)
+
+            scored = sorted(((_cosine(target, _tfidf(e["tokens"], doc_freq, n_docs)), k, e)
+                             for k, e in candidates), key=lambda s: s[0], reverse=True)
+            for score, key, entry in scored:
+                if score < threshold:
+                    break
+                old = [tuple(lit) for lit in entry["literals"]]
+                code = substitute_literals(entry["code"], old, literals)
+                if code is None:
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return {"code": code, "query": entry["query"],
+                        "similarity": round(score, 3)}
+            self.misses += 1
+            return None
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._save()
+
+
+_caches: Dict[Optional[str], CodeCache] = {}
+_caches_lock = threading.Lock()
+
+
+def code_cache_path(source: str) -> str:
+    """Cache file for *source*; ``data.csv`` and ``data.txt`` get their own."""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(cache_dir_for(source),
+                        f"{stem}-{source_id(source)}.code_cache.json")
+
+
+def get_code_cache(source: Optional[str] = None) -> CodeCache:
+    """Shared cache for dataset file *source* (persisted), or in-memory for None."""
+    key = os.path.abspath(source) if source else None
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = CodeCache(code_cache_path(source) if source else None)
+    return cache
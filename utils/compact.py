@@ -0,0 +1,200 @@
+"""
+utils/compact.py
+
+Optional load-time memory optimisation (``--compact``).
+
+Every sandbox groupby / resample streams the frame's columns through memory,
+so narrower dtypes make them cheaper.  ``compact_frame`` only applies
+changes that lose no information:
+
+* float64 → integer when every value is a whole number: int32 without
+  missing values, nullable ``Int32`` with them.
+* float64 → float32 when every value survives the round-trip at the
+  column's own decimal precision (≤ 6 decimals; the UCI readings have 2-3).
+* int64 → int32 when the range fits.  Nothing goes narrower than 32 bits,
+  so arithmetic in generated code (``a + b``, ``x * 1000``) can't silently
+  overflow.
+* string columns with few distinct values (≤ ``CATEGORY_MAX_RATIO`` of the
+  rows) → ``category``.
+* a DatetimeIndex is sorted, and its frequency is set when it can be
+  inferred (a regular series with no gaps).
+
+The resulting dtypes are what the generator sees in the dataset context
+(utils/profile.py) and what the sandbox runs against.  Stored values are
+unchanged, but float32 aggregates (means, correlations) differ from the
+float64 ones around the 7th significant digit.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import cache_path_for, prune_stale
+
+COMPACT_VERSION = "1"
+CATEGORY_MAX_RATIO = 0.5     # distinct values / rows
+MAX_DECIMALS = 6             # float32 keeps ~7 significant digits
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    """Deep memory footprint of *df* (index included) in MiB."""
+    return round(float(df.memory_usage(index=True, deep=True).sum()) / 2**20, 2)
+
+
+def _whole_numbers(values: np.ndarray) -> bool:
+    return bool(np.array_equal(np.trunc(values), values))
+
+
+def _float32_lossless(values: np.ndarray) -> bool:
+    """True when float32 reproduces *values* at their decimal precision."""
+    narrowed = values.astype(np.float32).astype(np.float64)
+    if np.array_equal(narrowed, values):
+        return True
+    for decimals in range(MAX_DECIMALS + 1):
+        if np.array_equal(np.round(values, decimals), values):
+            return bool(np.array_equal(np.round(narrowed, decimals), values))
+    return False
+
+
+def _fits_int32(lo, hi) -> bool:
+    info = np.iinfo(np.int32)
+    return info.min <= lo and hi <= info.max
+
+
+def _compact_float(col: pd.Series) -> Optional[str]:
+    values = col.to_numpy(dtype=np.float64)
+    finite = values[~np.isnan(values)]
+    if finite.size == 0 or not np.isfinite(finite).all():
+        return None                                # all missing / ±inf: leave as is
+    if _whole_numbers(finite) and _fits_int32(finite.min(), finite.max()):
+        return "Int32" if finite.size < values.size else "int32"
+    if _float32_lossless(finite):
+        return "float32"
+    return None
+
+
+def _compact_int(col: pd.Series) -> Optional[str]:
+    if len(col) and _fits_int32(col.min(), col.max()):
+        return "int32"
+    return None
+
+
+def _compact_strings(col: pd.Series) -> Optional[str]:
+    if pd.api.types.infer_dtype(col, skipna=True) != "string":
+        return None
+    if col.nunique(dropna=True) <= max(1, CATEGORY_MAX_RATIO * len(col)):
+        return "category"
+    return None
+
+
+def _target_dtype(col: pd.Series) -> Optional[str]:
+    dtype = col.dtype
+    if dtype == np.float64:
+        return _compact_float(col)
+    if dtype == np.int64:
+        return _compact_int(col)
+    if isinstance(dtype, pd.CategoricalDtype) or not pd.api.types.is_string_dtype(dtype):
+        return None
+    return _compact_strings(col)
+
+
+def tidy_datetime_index(df: pd.DataFrame) -> Tuple[pd.DataFrame, Optional[str]]:
+    """Sort a DatetimeIndex and attach its inferred frequency.
+
+    Returns (frame, note) where note describes what changed (or None).  The
+    frequency isn't stored in Feather, so this also runs on warm loads.
+    """
+    index = df.index
+    if not isinstance(index, pd.DatetimeIndex) or len(index) < 3:
+        return df, None
+    notes = []
+    if not index.is_monotonic_increasing:
+        df = df.sort_index(kind="stable")
+        notes.append("index sorted")
+    if df.index.freq is None:
+        try:
+            freq = pd.infer_freq(df.index)
+        except (TypeError, ValueError):            # duplicates / too irregular
+            freq = None
+        if freq is not None:
+            df.index.freq = freq
+    if df.index.freq is not None:
+        notes.append(f"freq={df.index.freqstr}")
+    return df, ", ".join(notes) or None
+
+
+def compact_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, dict]:
+    """Return (compacted copy of *df*, report).
+
+    The report is JSON-serialisable: ``before_mb``, ``after_mb``,
+    ``changes`` ([column, old dtype, new dtype] triples) and ``index``.
+    """
+    before = memory_mb(df)
+    changes: List[List[str]] = []
+    out = df.copy(deep=False)                      # untouched columns stay shared
+    for name, col in df.items():
+        target = _target_dtype(col)
+        if target is None:
+            continue
+        out[name] = col.astype(target)
+        changes.append([str(name), str(col.dtype), target])
+
+    df, index_note = tidy_datetime_index(out)
+    return df, {"before_mb": before, "after_mb": memory_mb(df),
+                "changes": changes, "index": index_note}
+
+
+def render_report(report: dict) -> str:
+    """One-line summary, e.g. 'memory 110.40 MB → 55.30 MB (-50%); ...'."""
+    before, after = report["before_mb"], report["after_mb"]
+    saved = f" ({(after / before - 1) * 100:+.0f}%)" if before else ""
+    parts = [f"memory {before:,.2f} MB → {after:,.2f} MB{saved}"]
+    if report["changes"]:
+        parts.append(", ".join(f"{name} {old}→{new}" for name, old, new in report["changes"]))
+    if report.get("index"):
+        parts.append(report["index"])
+    return "; ".join(parts)
+
+
+# -----------------------------------------------------------------------------
+# Cached loaders
+# -----------------------------------------------------------------------------
+
+def _report_path(path: str, version: str) -> str:
+    return cache_path_for(path, version, suffix=".compact.json")
+
+
+def compacting(loader: Callable[[str], pd.DataFrame],
+               version: str) -> Callable[[str], pd.DataFrame]:
+    """Wrap *loader* so it returns the compacted frame.
+
+    The report is written next to the data cache (keyed by *version*), so
+    warm starts that memory-map the compacted Feather file can still show
+    the original footprint via ``load_report``.
+    """
+    def load(path: str) -> pd.DataFrame:
+        df, report = compact_frame(loader(path))
+        target = _report_path(path, version)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "w", encoding="utf-8") as f:
+                json.dump(report, f)
+            prune_stale(path, version, target, ".compact.json")
+        except OSError:
+            pass                                   # read-only dir: no report on warm starts
+        return df
+    return load
+
+
+def load_report(path: str, version: str) -> Optional[dict]:
+    """Report stored by a ``compacting`` loader for *path*, if any."""
+    try:
+        with open(_report_path(path, version), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,26 @@
+"""
+utils/env.py
+
+Reads ``.env`` into the process environment once, on first use.
+
+Only the code paths that need settings from ``.env`` call ``load_env``
+(building an LLM client, picking the response-cache backend), so startup,
+``--help`` and answers served from the code cache never pay for it.
+"""
+
+import threading
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env() -> None:
+    """Load ``.env`` (python-dotenv) the first time this is called."""
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _loaded = True
@@ -0,0 +1,805 @@
+"""
+utils/lazy.py
+
+Out-of-core execution: a lazy, chunked stand-in for the loaded DataFrame.
+
+``LazyFrame`` never holds the dataset in memory.  It streams Parquet row
+batches, Feather record batches or CSV chunks, applies the pending row
+selection (``.loc`` window, boolean masks, ``query``, ``limit``) and column
+projection to each chunk, and folds the chunk into mergeable partial
+aggregates:
+
+    sum, count, size, min, max  → merged with the same reduction
+    mean                        → sum / count
+    var, std                    → sum, sum of squares and count
+
+so ``df['x'].mean()``, ``df.groupby('k')['x'].agg(['mean', 'max'])`` and
+``df.resample('D')['x'].sum()`` run with memory bounded by one chunk plus
+the (usually small) result.  Anything else has to ``collect()`` a narrowed
+frame into pandas first.
+
+The API mirrors the pandas subset the generator already writes;
+prompts/lazy_frame.txt is the note added to its dataset context.
+"""
+
+from __future__ import annotations
+
+import operator
+import os
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+SCHEMA_ROWS = 100            # rows read up front for column names / dtypes
+
+# partial aggregates each user-facing aggregation is built from
+_PARTS = {
+    "sum": ("sum",), "count": ("count",), "size": ("size",),
+    "min": ("min",), "max": ("max",),
+    "mean": ("sum", "count"),
+    "var": ("sum", "sumsq", "count"),
+    "std": ("sum", "sumsq", "count"),
+}
+# how partials from different chunks are merged
+_MERGE = {"sum": "sum", "sumsq": "sum", "count": "sum", "size": "sum",
+          "min": "min", "max": "max"}
+AGGREGATIONS = tuple(_PARTS)
+
+
+# -----------------------------------------------------------------------------
+# Sources
+# -----------------------------------------------------------------------------
+
+def _offset_range(frame: pd.DataFrame, offset: int) -> pd.DataFrame:
+    # Arrow batches rebuild a stored RangeIndex from 0; keep it continuous
+    if isinstance(frame.index, pd.RangeIndex) and frame.index.start == 0 and offset:
+        frame.index = pd.RangeIndex(offset, offset + len(frame), name=frame.index.name)
+    return frame
+
+
+def _arrow_index_columns(schema) -> List[str]:
+    meta = schema.pandas_metadata or {}
+    return [c for c in meta.get("index_columns", []) if isinstance(c, str)]
+
+
+def _iter_parquet(path: str, chunk_rows: int, columns) -> Iterator[pd.DataFrame]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:                       # no streaming reader: slice in memory
+        yield from _iter_frame(pd.read_parquet(path, columns=columns), chunk_rows)
+        return
+    pf = pq.ParquetFile(path)
+    if columns is not None:
+        columns = list(columns) + _arrow_index_columns(pf.schema_arrow)
+    offset = 0
+    for batch in pf.iter_batches(batch_size=chunk_rows, columns=columns):
+        table = pa.Table.from_batches([batch]).replace_schema_metadata(
+            pf.schema_arrow.metadata)
+        yield _offset_range(table.to_pandas(), offset)
+        offset += batch.num_rows
+
+
+def _iter_feather(path: str, chunk_rows: int, columns) -> Iterator[pd.DataFrame]:
+    try:
+        import pyarrow as pa
+    except ImportError:
+        yield from _iter_frame(pd.read_feather(path, columns=columns), chunk_rows)
+        return
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        keep = None
+        if columns is not None:
+            keep = list(columns) + _arrow_index_columns(reader.schema)
+        offset = 0
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for start in range(0, batch.num_rows, chunk_rows):
+                table = pa.Table.from_batches([batch.slice(start, chunk_rows)],
+                                              schema=reader.schema)
+                if keep is not None:
+                    table = table.select(keep)
+                frame = _offset_range(table.to_pandas(), offset)
+                offset += len(frame)
+                yield frame
+
+
+def _iter_frame(df: pd.DataFrame, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def _iter_source(source, chunk_rows: int, columns=None,
+                 read_options: Optional[dict] = None,
+                 prep: Optional[Callable] = None) -> Iterator[pd.DataFrame]:
+    """Raw chunks of *source*; *columns* is a projection hint, not a promise."""
+    if isinstance(source, pd.DataFrame):
+        chunks = _iter_frame(source, chunk_rows)
+    else:
+        ext = os.path.splitext(source)[1].lower()
+        if ext == ".parquet":
+            chunks = _iter_parquet(source, chunk_rows, columns)
+        elif ext == ".feather":
+            chunks = _iter_feather(source, chunk_rows, columns)
+        elif ext in (".csv", ".txt"):
+            chunks = pd.read_csv(source, chunksize=chunk_rows, **(read_options or {}))
+        else:
+            raise ValueError("Chunked mode does not support " + os.path.basename(source))
+    for chunk in chunks:
+        yield prep(chunk) if prep is not None else chunk
+
+
+# -----------------------------------------------------------------------------
+# Row predicates and index keys
+# -----------------------------------------------------------------------------
+
+_COMPARE = {"==": operator.eq, "!=": operator.ne, "<": operator.lt,
+            "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
+def _operand(chunk: pd.DataFrame, ref):
+    if isinstance(ref, IndexKey):
+        return ref(chunk)
+    return chunk[ref]
+
+
+class _Comparable:
+    """Comparison operators that build a LazyMask instead of comparing."""
+
+    __hash__ = object.__hash__
+
+    def _ref(self):
+        raise NotImplementedError
+
+    def __eq__(self, other):  # type: ignore[override]
+        return LazyMask("==", self._ref(), other)
+
+    def __ne__(self, other):  # type: ignore[override]
+        return LazyMask("!=", self._ref(), other)
+
+    def __lt__(self, other):
+        return LazyMask("<", self._ref(), other)
+
+    def __le__(self, other):
+        return LazyMask("<=", self._ref(), other)
+
+    def __gt__(self, other):
+        return LazyMask(">", self._ref(), other)
+
+    def __ge__(self, other):
+        return LazyMask(">=", self._ref(), other)
+
+    def isin(self, values) -> "LazyMask":
+        return LazyMask("isin", self._ref(), list(values))
+
+    def between(self, left, right) -> "LazyMask":
+        return (self >= left) & (self <= right)
+
+
+class IndexKey(_Comparable):
+    """``df.index.<attr>`` of a LazyFrame, resolved per chunk.
+
+    Usable as a groupby key (``df.groupby(df.index.hour)``) or in a row
+    mask (``df[df.index.month.isin([12, 1, 2])]``).
+    """
+
+    def __init__(self, attr: Optional[str] = None) -> None:
+        self.attr = attr
+
+    def _ref(self):
+        return self
+
+    def __call__(self, chunk: pd.DataFrame):
+        return chunk.index if self.attr is None else getattr(chunk.index, self.attr)
+
+    def __repr__(self) -> str:
+        return f"df.index.{self.attr}" if self.attr else "df.index"
+
+
+class LazyIndex(IndexKey):
+    """``df.index`` of a LazyFrame: attribute access yields IndexKeys."""
+
+    def __init__(self, frame: "LazyFrame") -> None:
+        super().__init__(None)
+        self._frame = frame
+
+    def __getattr__(self, name: str) -> IndexKey:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return IndexKey(name)
+
+    def min(self):
+        return min((c.index.min() for c in self._frame.iter_chunks()), default=None)
+
+    def max(self):
+        return max((c.index.max() for c in self._frame.iter_chunks()), default=None)
+
+
+class LazyMask:
+    """Row predicate evaluated chunk by chunk; combine with ``&``, ``|``, ``~``."""
+
+    def __init__(self, op: str, left, right=None) -> None:
+        self.op, self.left, self.right = op, left, right
+
+    def evaluate(self, chunk: pd.DataFrame):
+        if self.op == "~":
+            return ~self.left.evaluate(chunk)
+        if self.op == "&":
+            return self.left.evaluate(chunk) & self.right.evaluate(chunk)
+        if self.op == "|":
+            return self.left.evaluate(chunk) | self.right.evaluate(chunk)
+        values = _operand(chunk, self.left)
+        if self.op == "isin":
+            return values.isin(self.right)
+        if self.op == "isna":
+            return values.isna()
+        if self.op == "notna":
+            return values.notna()
+        return _COMPARE[self.op](values, self.right)
+
+    def __and__(self, other: "LazyMask") -> "LazyMask":
+        return LazyMask("&", self, other)
+
+    def __or__(self, other: "LazyMask") -> "LazyMask":
+        return LazyMask("|", self, other)
+
+    def __invert__(self) -> "LazyMask":
+        return LazyMask("~", self)
+
+
+# -----------------------------------------------------------------------------
+# Streaming aggregation
+# -----------------------------------------------------------------------------
+
+def _resolve_keys(chunk: pd.DataFrame, keys: Sequence) -> list:
+    resolved = []
+    for key in keys:
+        if isinstance(key, str):
+            resolved.append(chunk[key])
+        elif callable(key) and not isinstance(key, pd.Grouper):
+            resolved.append(key(chunk))        # IndexKey or chunk -> keys
+        else:
+            resolved.append(key)
+    return resolved
+
+
+def _partial(values: pd.DataFrame, keys, part: str):
+    if part in ("sum", "sumsq"):
+        values = values.select_dtypes(include=["number", "bool"])
+        if part == "sumsq":
+            values = values.astype("float64") ** 2
+    how = "sum" if part == "sumsq" else part
+    if keys is None:
+        return len(values) if part == "size" else getattr(values, how)()
+    grouped = values.groupby(keys, observed=True)
+    return getattr(grouped, how)()
+
+
+def _merge(pieces: list, part: str, grouped: bool):
+    how = _MERGE[part]
+    if not grouped:
+        if part == "size":
+            return sum(pieces)
+        return getattr(pd.concat(pieces, axis=1), how)(axis=1)
+    joined = pd.concat(pieces)
+    return getattr(joined.groupby(level=list(range(joined.index.nlevels))), how)()
+
+
+def _like(count, ref):
+    """*count* restricted to the labels of *ref* (numeric columns only)."""
+    if isinstance(ref, pd.DataFrame):
+        return count.reindex(columns=ref.columns)
+    return count.reindex(ref.index)
+
+
+def _finalize(func: str, parts: dict):
+    if func in ("sum", "count", "size", "min", "max"):
+        return parts[func]
+    total = parts["sum"]
+    n = _like(parts["count"], total)
+    if func == "mean":
+        return total / n
+    var = ((parts["sumsq"] - total * total / n) / (n - 1)).clip(lower=0)
+    return var if func == "var" else var ** 0.5
+
+
+def aggregate(frame: "LazyFrame", funcs: Sequence[str], keys: Optional[Sequence] = None,
+              columns: Optional[Sequence[str]] = None) -> Dict[str, object]:
+    """Compute every aggregation in *funcs* over *frame* in one streaming pass.
+
+    *keys* groups rows (column names, IndexKeys, callables or pd.Grouper);
+    *columns* limits the value columns.  Returns {func: result}.
+    """
+    unknown = [f for f in funcs if f not in _PARTS]
+    if unknown:
+        raise ValueError(f"Unsupported lazy aggregation(s) {unknown}; "
+                         f"use one of {list(AGGREGATIONS)} or collect() first")
+    parts = sorted({p for f in funcs for p in _PARTS[f]})
+    pieces: Dict[str, list] = {p: [] for p in parts}
+    key_columns = [k for k in keys or () if isinstance(k, str)]
+
+    def _fold(chunk: pd.DataFrame) -> None:
+        resolved = _resolve_keys(chunk, keys) if keys is not None else None
+        values = chunk.drop(columns=key_columns) if key_columns else chunk
+        if columns is not None:
+            values = values[list(columns)]
+        for p in parts:
+            pieces[p].append(_partial(values, resolved, p))
+
+    for chunk in frame.iter_chunks():
+        _fold(chunk)
+    if not pieces[parts[0]]:                   # empty selection → empty result
+        empty = frame.schema().iloc[:0]
+        _fold(empty if frame._columns is None else empty[list(frame._columns)])
+
+    merged = {p: _merge(pieces[p], p, keys is not None) for p in parts}
+    return {f: _finalize(f, merged) for f in funcs}
+
+
+def _fill_bins(result, rule: str, func: str):
+    """Give a resample result every bin between its first and last label."""
+    if len(result) == 0:
+        return result
+    full = pd.date_range(result.index.min(), result.index.max(), freq=rule,
+                         name=result.index.name)
+    if func in ("sum", "count", "size"):
+        return result.reindex(full, fill_value=0)
+    return result.reindex(full)
+
+
+# -----------------------------------------------------------------------------
+# LazyFrame
+# -----------------------------------------------------------------------------
+
+class LazyFrame(_Comparable):
+    """Chunked, read-only view of a dataset too large to load.
+
+    Parameters
+    ----------
+    source : str or pd.DataFrame
+        .parquet / .feather / .csv / .txt path (or an in-memory frame, which
+        is simply sliced into chunks).
+    chunk_rows : int
+        Rows per chunk; peak memory is roughly one chunk.
+    read_options : dict, optional
+        Extra ``pd.read_csv`` options for text sources.
+    prep : callable, optional
+        Row-local ``prep(chunk) -> chunk`` applied to every raw chunk
+        (e.g. ``utils.preprocess.ucl_prep_frame``).
+
+    Selections (``df['col']``, ``df[['a', 'b']]``, ``df.loc[...]``,
+    ``df[mask]``, ``query``, ``limit``) return new LazyFrames; nothing is
+    read until an aggregation, ``head``, ``len`` or ``collect`` runs.
+    Selecting a single column gives a series-like LazyFrame whose
+    aggregations return scalars.
+    """
+
+    def __init__(self, source, chunk_rows: int = DEFAULT_CHUNK_ROWS, *,
+                 read_options: Optional[dict] = None,
+                 prep: Optional[Callable] = None) -> None:
+        self._source = source
+        self._chunk_rows = max(1, int(chunk_rows))
+        self._read_options = read_options
+        self._prep = prep
+        self._columns: Optional[tuple] = None  # projection
+        self._name: Optional[str] = None       # set for a single-column view
+        self._window: Optional[slice] = None   # .loc row window on the index
+        self._filters: tuple = ()              # LazyMask / query strings
+        self._limit: Optional[int] = None
+        self._schema: Optional[pd.DataFrame] = None
+
+    # ---- derivation --------------------------------------------------------
+
+    def _derive(self, **changes) -> "LazyFrame":
+        clone = object.__new__(LazyFrame)
+        clone.__dict__.update(self.__dict__)
+        clone.__dict__.update(changes)
+        return clone
+
+    def _select(self, columns) -> "LazyFrame":
+        if isinstance(columns, str):
+            self._check_columns([columns])
+            return self._derive(_columns=(columns,), _name=columns)
+        columns = list(columns)
+        self._check_columns(columns)
+        return self._derive(_columns=tuple(columns), _name=None)
+
+    def _check_columns(self, columns: List[str]) -> None:
+        available = self.schema().columns
+        missing = [c for c in columns if c not in available]
+        if missing:
+            raise KeyError(f"{missing} not in columns")
+
+    def __getitem__(self, key):
+        if isinstance(key, LazyMask):
+            return self._derive(_filters=self._filters + (key,))
+        if isinstance(key, slice):
+            return self.loc[key]
+        return self._select(key)
+
+    @property
+    def loc(self) -> "_LazyLoc":
+        return _LazyLoc(self)
+
+    def query(self, expr: str) -> "LazyFrame":
+        """Keep rows matching ``DataFrame.query(expr)``, chunk by chunk."""
+        return self._derive(_filters=self._filters + (expr,))
+
+    def limit(self, n: int) -> "LazyFrame":
+        """Only the first *n* selected rows."""
+        n = int(n) if self._limit is None else min(self._limit, int(n))
+        return self._derive(_limit=n)
+
+    def copy(self, deep: bool = False) -> "LazyFrame":
+        return self                            # immutable: selections return new views
+
+    def _ref(self):
+        if self._name is None:
+            raise TypeError("Comparisons need a single column, e.g. df['col'] > 0")
+        return self._name
+
+    def isna(self) -> LazyMask:
+        return LazyMask("isna", self._ref())
+
+    def notna(self) -> LazyMask:
+        return LazyMask("notna", self._ref())
+
+    # ---- reading -----------------------------------------------------------
+
+    def _raw_chunks(self, chunk_rows: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        pushdown = self._columns if not self._filters else None
+        return _iter_source(self._source, chunk_rows or self._chunk_rows, pushdown,
+                            self._read_options, self._prep)
+
+    def schema(self) -> pd.DataFrame:
+        """First few raw rows (all columns); cached, used for names / dtypes."""
+        if self._schema is None:
+            first = next(iter(_iter_source(self._source, SCHEMA_ROWS, None,
+                                           self._read_options, self._prep)), None)
+            self._schema = first if first is not None else pd.DataFrame()
+        return self._schema
+
+    def _past_window(self, index: pd.Index) -> bool:
+        """True when a sorted chunk starts after the window's end."""
+        if self._window is None or self._window.stop is None:
+            return False
+        try:
+            return index.slice_locs(end=self._window.stop)[1] == 0
+        except (KeyError, TypeError, ValueError):
+            return False
+
+    def iter_chunks(self) -> Iterator[pd.DataFrame]:
+        """Yield the selected rows/columns as pandas DataFrames, chunk by chunk."""
+        remaining = self._limit
+        if remaining is not None and remaining <= 0:
+            return
+        ordered, previous = True, None
+        for chunk in self._raw_chunks():
+            if len(chunk) == 0:
+                continue
+            if self._window is not None:
+                index = chunk.index
+                ordered = (ordered and index.is_monotonic_increasing
+                           and (previous is None or index[0] >= previous))
+                previous = index[-1]
+                if ordered and self._past_window(index):
+                    break                      # sorted index: nothing further matches
+                chunk = chunk.loc[self._window]
+            for flt in self._filters:
+                chunk = chunk.query(flt) if isinstance(flt, str) else chunk[flt.evaluate(chunk)]
+            if self._columns is not None:
+                chunk = chunk[list(self._columns)]
+            if remaining is not None:
+                chunk = chunk.iloc[:remaining]
+                remaining -= len(chunk)
+            if len(chunk):
+                yield chunk
+            if remaining == 0:
+                return
+
+    def _as_output(self, frame: pd.DataFrame):
+        return frame[self._name] if self._name is not None else frame
+
+    def head(self, n: int = 5):
+        """First *n* selected rows as pandas."""
+        return self.limit(n).collect()
+
+    def collect(self):
+        """Materialise the selection as a pandas DataFrame / Series.
+
+        Only for narrowed selections: the result must fit in memory.
+        """
+        chunks = list(self.iter_chunks())
+        frame = pd.concat(chunks) if chunks else self.schema().iloc[:0]
+        if self._columns is not None:
+            frame = frame[list(self._columns)]
+        return self._as_output(frame)
+
+    # ---- metadata ----------------------------------------------------------
+
+    @property
+    def columns(self) -> pd.Index:
+        cols = self.schema().columns
+        return cols if self._columns is None else pd.Index(self._columns)
+
+    @property
+    def dtypes(self):
+        dtypes = self.schema().dtypes
+        return dtypes if self._columns is None else dtypes[list(self._columns)]
+
+    @property
+    def dtype(self):
+        return self.dtypes[self._ref()]
+
+    @property
+    def name(self) -> Optional[str]:
+        return self._name
+
+    @property
+    def index(self) -> LazyIndex:
+        return LazyIndex(self)
+
+    def __len__(self) -> int:
+        if (self._window is None and not self._filters and self._limit is None
+                and isinstance(self._source, str) and self._source.endswith(".parquet")):
+            try:
+                import pyarrow.parquet as pq
+                return pq.ParquetFile(self._source).metadata.num_rows
+            except ImportError:
+                pass
+        return sum(len(c) for c in self.iter_chunks())
+
+    @property
+    def shape(self) -> tuple:
+        rows = len(self)
+        return (rows,) if self._name is not None else (rows, len(self.columns))
+
+    @property
+    def empty(self) -> bool:
+        return next(self.iter_chunks(), None) is None
+
+    def __repr__(self) -> str:
+        source = (self._source if isinstance(self._source, str)
+                  else f"<DataFrame {self._source.shape}>")
+        what = f"column={self._name!r}" if self._name else f"columns={list(self.columns)}"
+        return f"LazyFrame({source!r}, {what}, chunk_rows={self._chunk_rows})"
+
+    # ---- aggregation -------------------------------------------------------
+
+    def _reduce(self, func: str):
+        result = aggregate(self, [func])[func]
+        if self._name is None:
+            return result
+        if self._name not in result.index:
+            raise TypeError(f"{func}() needs a numeric column, got {self.dtype}")
+        return result[self._name]
+
+    def sum(self):
+        return self._reduce("sum")
+
+    def mean(self):
+        return self._reduce("mean")
+
+    def count(self):
+        return self._reduce("count")
+
+    def min(self):
+        return self._reduce("min")
+
+    def max(self):
+        return self._reduce("max")
+
+    def var(self):
+        return self._reduce("var")
+
+    def std(self):
+        return self._reduce("std")
+
+    def agg(self, func):
+        """pandas-style ``agg`` with a name, a list of names or {col: name(s)}."""
+        if isinstance(func, str):
+            return self._reduce(func)
+        if isinstance(func, dict):
+            if self._name is not None:
+                raise TypeError("Series.agg takes a name or a list of names")
+            specs = {c: [f] if isinstance(f, str) else list(f) for c, f in func.items()}
+            funcs = list(dict.fromkeys(f for fs in specs.values() for f in fs))
+            results = aggregate(self, funcs, columns=list(specs))
+            if all(isinstance(f, str) for f in func.values()):
+                return pd.Series({c: results[f].get(c, np.nan) for c, f in func.items()})
+            return pd.DataFrame({c: {f: results[f].get(c, np.nan) for f in fs}
+                                 for c, fs in specs.items()}).reindex(funcs)
+        funcs = list(func)
+        results = aggregate(self, funcs)
+        if self._name is not None:
+            return pd.Series({f: results[f].get(self._name, np.nan) for f in funcs},
+                             name=self._name)
+        return pd.DataFrame({f: results[f] for f in funcs}).T
+
+    aggregate = agg
+
+    def describe(self):
+        """count / mean / std / min / max of the numeric columns (no quantiles)."""
+        stats = ["count", "mean", "std", "min", "max"]
+        results = aggregate(self, stats)
+        numeric = results["mean"].index
+        table = pd.DataFrame({s: results[s].reindex(numeric) for s in stats}).T
+        return table[self._name] if self._name is not None else table
+
+    def value_counts(self, ascending: bool = False):
+        """Counts of each value of a single column, merged across chunks."""
+        name = self._ref()
+        pieces = [c[name].value_counts() for c in self.iter_chunks()]
+        if not pieces:
+            return pd.Series(dtype="int64", name="count")
+        counts = pd.concat(pieces).groupby(level=0).sum()
+        return counts.sort_values(ascending=ascending)
+
+    def nunique(self) -> int:
+        return len(self.value_counts())
+
+    def _arg_extreme(self, largest: bool):
+        name = self._ref()
+        best_label, best_value = None, None
+        for chunk in self.iter_chunks():
+            values = chunk[name].dropna()
+            if values.empty:
+                continue
+            label = values.idxmax() if largest else values.idxmin()
+            value = values.max() if largest else values.min()
+            if (best_value is None or (value > best_value if largest
+                                       else value < best_value)):
+                best_label, best_value = label, value
+        if best_label is None:
+            raise ValueError(f"attempt to get arg{'max' if largest else 'min'} of an empty sequence")
+        return best_label
+
+    def idxmax(self):
+        return self._arg_extreme(True)
+
+    def idxmin(self):
+        return self._arg_extreme(False)
+
+    def groupby(self, by) -> "LazyGroupBy":
+        keys = list(by) if isinstance(by, (list, tuple)) else [by]
+        return LazyGroupBy(self, keys, selection=self._name)
+
+    def resample(self, rule: str) -> "LazyGroupBy":
+        return LazyGroupBy(self, [pd.Grouper(freq=rule)], selection=self._name, rule=rule)
+
+
+class _LazyLoc:
+    """``df.loc[rows]`` / ``df.loc[rows, cols]`` for a LazyFrame.
+
+    Rows must be a label slice or a partial date string ('2007-01'),
+    which selects the same rows as pandas on a sorted DatetimeIndex.
+    """
+
+    def __init__(self, frame: LazyFrame) -> None:
+        self._frame = frame
+
+    def __getitem__(self, key):
+        rows, cols = key if isinstance(key, tuple) else (key, None)
+        frame = self._frame
+        if isinstance(rows, LazyMask):
+            frame = frame[rows]
+        elif isinstance(rows, slice):
+            if rows != slice(None):
+                if frame._window is not None:
+                    raise ValueError("Only one .loc row window per lazy selection")
+                frame = frame._derive(_window=rows)
+        elif isinstance(rows, str):
+            frame = frame._derive(_window=slice(rows, rows))
+        else:
+            raise TypeError("Lazy .loc rows must be a label slice, a date string "
+                            "or a mask; collect() first for other selections")
+        return frame if cols is None else frame._select(cols)
+
+
+class LazyGroupBy:
+    """groupby / resample over a LazyFrame; aggregations stream in one pass."""
+
+    def __init__(self, frame: LazyFrame, keys: list,
+                 selection=None, rule: Optional[str] = None) -> None:
+        self._frame = frame
+        self._keys = keys
+        self._selection = selection
+        self._rule = rule
+
+    def __getitem__(self, key) -> "LazyGroupBy":
+        return LazyGroupBy(self._frame, self._keys, key, self._rule)
+
+    def _value_columns(self):
+        if self._selection is None:
+            return None
+        return [self._selection] if isinstance(self._selection, str) else list(self._selection)
+
+    def _bin_keys(self, frame: LazyFrame) -> list:
+        """Keys with resample bins pinned to the selection's first day.
+
+        A bare ``pd.Grouper(freq=rule)`` anchors at each chunk's own first
+        day, so multi-day rules ('2D', '7D') would split bins differently
+        per chunk; pandas anchors once, at the first timestamp's midnight.
+        Day rules are given as fixed hours, the form ``origin`` applies to.
+        """
+        if self._rule is None:
+            return self._keys
+        freq = pd.tseries.frequencies.to_offset(self._rule)
+        if isinstance(freq, pd.offsets.Day):
+            freq = pd.tseries.frequencies.to_offset(pd.Timedelta(days=freq.n))
+        if not isinstance(freq, pd.offsets.Tick):
+            return self._keys                  # calendar rules ('W', 'ME') don't drift
+        first = next((c for c in frame.iter_chunks() if len(c)), None)
+        if first is None:
+            return self._keys
+        return [pd.Grouper(freq=freq, origin=first.index.min().normalize())]
+
+    def _run(self, funcs: List[str]) -> Dict[str, object]:
+        frame = self._frame
+        wanted = self._value_columns()
+        if wanted is not None and frame._name is None:
+            # read only the key + value columns
+            key_cols = [k for k in self._keys if isinstance(k, str)]
+            frame = frame._select(list(dict.fromkeys(key_cols + wanted)))
+        frame = frame._derive(_name=None)
+        results = aggregate(frame, funcs, self._bin_keys(frame), wanted)
+        if self._rule is not None:
+            results = {f: _fill_bins(r, self._rule, f) for f, r in results.items()}
+        return results
+
+    def _shape(self, result):
+        if isinstance(self._selection, str) and isinstance(result, pd.DataFrame):
+            return result[self._selection]
+        return result
+
+    def _reduce(self, func: str):
+        return self._shape(self._run([func])[func])
+
+    def sum(self):
+        return self._reduce("sum")
+
+    def mean(self):
+        return self._reduce("mean")
+
+    def count(self):
+        return self._reduce("count")
+
+    def size(self):
+        return self._run(["size"])["size"]
+
+    def min(self):
+        return self._reduce("min")
+
+    def max(self):
+        return self._reduce("max")
+
+    def var(self):
+        return self._reduce("var")
+
+    def std(self):
+        return self._reduce("std")
+
+    def agg(self, func):
+        """pandas-style ``agg`` with a name, a list of names or {col: name(s)}."""
+        if isinstance(func, str):
+            return self._reduce(func)
+        if isinstance(func, dict):
+            specs = {c: [f] if isinstance(f, str) else list(f) for c, f in func.items()}
+            funcs = list(dict.fromkeys(f for fs in specs.values() for f in fs))
+            grouped = LazyGroupBy(self._frame, self._keys, list(specs), self._rule)
+            results = grouped._run(funcs)
+            if all(isinstance(f, str) for f in func.values()):
+                return pd.DataFrame({c: results[f][c] for c, f in func.items()})
+            return pd.concat({(c, f): results[f][c] for c, fs in specs.items() for f in fs},
+                             axis=1)
+        funcs = list(func)
+        results = self._run(funcs)
+        if isinstance(self._selection, str):
+            return pd.DataFrame({f: self._shape(results[f]) for f in funcs})
+        columns = results[funcs[0]].columns
+        return pd.concat({(c, f): results[f][c] for c in columns for f in funcs
+                          if c in results[f].columns}, axis=1)
+
+    aggregate = agg
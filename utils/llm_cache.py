@@ -0,0 +1,216 @@
+"""
+utils/llm_cache.py
+
+Content-addressed cache for LLM replies.
+
+Both agents run at temperature=0, so the same (model, prompt) pair yields
+effectively the same reply.  Replies are stored under
+``sha256(model + "\\0" + prompt)`` so reruns of a benchmark or repeated
+questions skip the round-trip entirely.
+
+Backends
+--------
+* ``LRUCache``    – in-process, bounded by entry count, optional TTL.
+* ``SQLiteCache`` – on-disk, survives restarts, optional TTL.
+
+The process-wide cache defaults to an in-memory LRU.  Set the
+``SAFEFRAME_LLM_CACHE`` environment variable to a file path to use SQLite
+instead, or call ``set_response_cache`` (``None`` disables caching).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from utils.env import load_env
+from utils.tracing import annotate, record_tokens
+
+
+def cache_key(model: str, prompt: str) -> str:
+    """Stable key for one fully rendered prompt sent to *model*."""
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class _Stats:
+    """Hit/miss counters shared by every backend."""
+
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0}
+
+
+class LRUCache(_Stats):
+    """Thread-safe in-memory LRU with optional time-to-live (seconds)."""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl is not None \
+                    and time.time() - entry[0] > self.ttl:
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache(_Stats):
+    """On-disk cache in a single SQLite file; optional TTL (seconds)."""
+
+    def __init__(self, path: str, ttl: Optional[float] = None) -> None:
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, created REAL NOT NULL, value TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created, value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl is not None \
+                    and time.time() - row[0] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[1]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, created, value) VALUES (?, ?, ?)",
+                (key, time.time(), value),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+
+# -----------------------------------------------------------------------------
+# Process-wide cache
+# -----------------------------------------------------------------------------
+
+_cache = None
+_configured = False
+
+
+def get_response_cache():
+    """Return the active cache (built from SAFEFRAME_LLM_CACHE on first use)."""
+    global _cache, _configured
+    if not _configured:
+        load_env()
+        path = os.getenv("SAFEFRAME_LLM_CACHE")
+        _cache = SQLiteCache(path) if path else LRUCache()
+        _configured = True
+    return _cache
+
+
+def set_response_cache(cache) -> None:
+    """Swap the process-wide cache; pass None to disable caching."""
+    global _cache, _configured
+    _cache, _configured = cache, True
+
+
+def cache_stats() -> Dict[str, float]:
+    """Hit/miss counters of the active cache (zeros when disabled)."""
+    cache = get_response_cache()
+    return cache.stats() if cache is not None else _Stats().stats()
+
+
+def _client(llm):
+    """*llm* itself, or the client built by calling it (a lazy factory)."""
+    return llm if hasattr(llm, "invoke") else llm()
+
+
+def cached_invoke(llm, model: str, prompt: str,
+                  use_cache: bool = True) -> str:
+    """``llm.invoke(prompt).content`` served from the cache when possible.
+
+    *llm* may also be a zero-argument factory (e.g. ``partial(get_llm,
+    "critic")``); it is only called on a cache miss, so cache hits never
+    construct a client.
+    Annotates the active tracing span with cache hit/miss and token counts.
+    ``use_cache=False`` always calls the model (e.g. for sampled votes).
+    """
+    cache = get_response_cache() if use_cache else None
+    key = cache_key(model, prompt) if cache is not None else None
+    text = cache.get(key) if cache is not None else None
+    if text is not None:
+        annotate(cache="hit")
+        record_tokens(prompt, response=text)
+        return text
+
+    message = _client(llm).invoke(prompt)
+    text = message.content
+    annotate(cache="miss")
+    record_tokens(prompt, message, text)
+    if cache is not None:
+        cache.set(key, text)
+    return text
+
+
+async def acached_invoke(llm, model: str, prompt: str,
+                         use_cache: bool = True) -> str:
+    """Async twin of cached_invoke (uses ``llm.ainvoke``)."""
+    cache = get_response_cache() if use_cache else None
+    key = cache_key(model, prompt) if cache is not None else None
+    text = cache.get(key) if cache is not None else None
+    if text is not None:
+        annotate(cache="hit")
+        record_tokens(prompt, response=text)
+        return text
+
+    message = await _client(llm).ainvoke(prompt)
+    text = message.content
+    annotate(cache="miss")
+    record_tokens(prompt, message, text)
+    if cache is not None:
+        cache.set(key, text)
+    return text
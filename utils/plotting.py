@@ -0,0 +1,175 @@
+"""
+utils/plotting.py
+
+Figure post-processing for plotting snippets (used by sandbox.py).
+
+* ``lttb`` – Largest-Triangle-Three-Buckets decimation: keeps the points
+  that preserve a line's visual shape (peaks, dips) while cutting e.g. two
+  million UCI minute readings to a few thousand.
+* The module is also a pandas plotting backend (``plot`` below; everything
+  else is pandas' own matplotlib backend): sandbox.py enables it around
+  plotting snippets, so ``df['Global_active_power'].plot()`` hands pandas
+  a few thousand LTTB-picked rows instead of the full series.
+* ``downsample_lines`` – the same for every Line2D of a figure still longer
+  than ``MAX_PLOT_POINTS`` (e.g. drawn with ``plt.plot``), after the snippet
+  ran and before anything is rasterised.
+* ``render_figure`` – draws a figure to PNG / SVG bytes and describes it in
+  one line (for the result summary the critic reads).
+
+Only imported when a snippet plots, so matplotlib stays out of every other
+code path.
+"""
+
+from __future__ import annotations
+
+import importlib
+import io
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+MAX_PLOT_POINTS = 4000          # per line, after LTTB
+FIGURE_FORMATS = ("png", "svg")
+FIGURE_DPI = 100
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Positions of the *n_out* points LTTB keeps from the line (x, y).
+
+    The first and last points are always kept; each bucket in between
+    contributes the point forming the largest triangle with the previously
+    kept point and the average of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    every = (n - 2) / (n_out - 2)
+    edges = np.floor(np.arange(n_out - 1) * every).astype(np.int64) + 1
+    edges[-1] = n - 1
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[hi:nxt_hi].mean(), y[hi:nxt_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a])
+                      - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Downsample the line (x, y) to *n_out* points with LTTB."""
+    keep = lttb_indices(x, y, n_out)
+    return x[keep], y[keep]
+
+
+def _plot_x(index: pd.Index) -> np.ndarray:
+    """Numeric x positions for LTTB: the index when it is sorted and
+    datetime / numeric, else the row position."""
+    if index.is_monotonic_increasing:
+        if isinstance(index, pd.DatetimeIndex):
+            return index.asi8.astype(np.float64)
+        if pd.api.types.is_numeric_dtype(index.dtype):
+            return index.to_numpy(dtype=np.float64)
+    return np.arange(len(index), dtype=np.float64)
+
+
+def downsample_for_plot(data, max_points: int = MAX_PLOT_POINTS):
+    """Rows of a Series / DataFrame that LTTB keeps for a line plot.
+
+    Each numeric column picks its share of *max_points* from its finite
+    points; the union of those rows is returned, in the original order.
+    """
+    if len(data) <= max_points:
+        return data
+    x = _plot_x(data.index)
+    frame = data.to_frame() if isinstance(data, pd.Series) else data.select_dtypes("number")
+    per_column = max(3, max_points // max(1, frame.shape[1]))
+    keep = np.empty(0, dtype=np.int64)
+    for _, col in frame.items():
+        y = col.to_numpy(dtype=np.float64, na_value=np.nan)
+        finite = np.flatnonzero(np.isfinite(y))
+        keep = np.union1d(keep, finite[lttb_indices(x[finite], y[finite], per_column)])
+    return data.iloc[keep]
+
+
+# ---- pandas plotting backend (pd.options.plotting.backend = "utils.plotting") ----
+
+def _matplotlib_backend():
+    return importlib.import_module("pandas.plotting._matplotlib")
+
+
+def plot(data, x=None, y=None, kind: str = "line", **kwargs):
+    """pandas' ``.plot()`` entry point; long line plots are LTTB-downsampled.
+
+    The (possibly downsampled) data is then plotted by pandas itself with
+    its matplotlib backend, so every ``.plot()`` option behaves as usual.
+    Lines drawn against an ``x=`` column pass through as is.
+    """
+    if kind == "line" and x is None:
+        data = downsample_for_plot(data)
+    return data.plot(x=x, y=y, kind=kind, backend="matplotlib", **kwargs)
+
+
+def __getattr__(name: str):
+    # hist_series, boxplot_frame, ... : pandas' own implementations
+    return getattr(_matplotlib_backend(), name)
+
+
+def downsample_lines(fig, max_points: int = MAX_PLOT_POINTS) -> Tuple[int, int]:
+    """LTTB-decimate every long line in *fig* in place.
+
+    Non-finite points are dropped from a decimated line.  Returns
+    (points before, points after) over the decimated lines.
+    """
+    before = after = 0
+    for ax in fig.axes:
+        for line in ax.get_lines():
+            xy = np.asarray(line.get_xydata(), dtype=np.float64)    # unit-converted
+            if len(xy) <= max_points:
+                continue
+            xy = xy[np.isfinite(xy).all(axis=1)]
+            x, y = lttb(xy[:, 0], xy[:, 1], max_points)
+            line.set_data(x, y)
+            before += len(xy)
+            after += len(x)
+    return before, after
+
+
+def describe_figure(fig) -> str:
+    """Axes titles/labels and what they hold, in one line."""
+    parts = []
+    for ax in fig.axes:
+        label = ax.get_title() or ax.get_ylabel() or "untitled axes"
+        content = []
+        if ax.get_lines():
+            content.append(f"{len(ax.get_lines())} line(s)")
+        if ax.patches:
+            content.append(f"{len(ax.patches)} bar/patch(es)")
+        if ax.collections:
+            content.append(f"{len(ax.collections)} collection(s)")
+        parts.append(f"'{label}'" + (f" ({', '.join(content)})" if content else ""))
+    return "; ".join(parts) or "no axes"
+
+
+def render_figure(fig, fmt: str = "png", max_points: int = MAX_PLOT_POINTS) -> Dict[str, object]:
+    """Decimate, then draw *fig* to bytes.
+
+    Returns {'format', 'data', 'width', 'height', 'description'}.
+    """
+    if fmt not in FIGURE_FORMATS:
+        raise ValueError(f"Unsupported figure format '{fmt}'")
+    before, after = downsample_lines(fig, max_points)
+    description = describe_figure(fig)
+    if before:
+        description += f"; {before:,} points drawn as {after:,} (LTTB)"
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, dpi=FIGURE_DPI)
+    width, height = (fig.get_size_inches() * FIGURE_DPI).round().astype(int)
+    return {"format": fmt, "data": buf.getvalue(), "width": int(width),
+            "height": int(height), "description": description}
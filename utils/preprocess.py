@@ -1,11 +1,26 @@
 import pandas as pd
 
+# Bump whenever the preprocessing below changes; invalidates cached frames.
+UCL_LOADER_VERSION = "2"
+
+# UCI stores Date as d/m/yyyy and Time as hh:mm:ss
+UCL_DATETIME_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+# pd.read_csv options for the raw semicolon-delimited file
+UCL_READ_OPTIONS = dict(
+    sep=';',
+    dtype={'Date': str, 'Time': str},
+    na_values=['?'],
+    low_memory=False,
+)
+
 def ucl_dataset_prep(filepath: str) -> pd.DataFrame:
     """
     Load and preprocess the UCL Household Energy dataset from the given file path.
 
     Steps:
-    1. Reads the semicolon-delimited file, parsing Date & Time into a single datetime index.
+    1. Reads the semicolon-delimited file, parsing Date & Time into a single
+       datetime column with an explicit format (no per-row inference).
     2. Drops rows with any missing values.
     3. Converts Global_active_power to float.
     4. Sets the datetime column as the DataFrame index.
@@ -20,15 +35,17 @@ def ucl_dataset_prep(filepath: str) -> pd.DataFrame:
     pd.DataFrame
         Preprocessed DataFrame ready for analysis.
     """
-    df = pd.read_csv(
-        filepath,
-        sep=';',
-        parse_dates={'datetime': ['Date', 'Time']},
-        infer_datetime_format=True,
-        na_values=['?'],
-        low_memory=False
-    )
+    return ucl_prep_frame(pd.read_csv(filepath, **UCL_READ_OPTIONS))
+
+
+def ucl_prep_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Steps 1-4 of ``ucl_dataset_prep`` on an already-read frame.
+
+    Row-local, so it also applies chunk by chunk (see utils/lazy.py).
+    """
+    df.insert(0, 'datetime', pd.to_datetime(df.pop('Date') + ' ' + df.pop('Time'),
+                                             format=UCL_DATETIME_FORMAT))
     df = df.dropna()
     df['Global_active_power'] = df['Global_active_power'].astype(float)
     df = df.set_index('datetime')
-    return df
\ No newline at end of file
+    return df
@@ -0,0 +1,208 @@
+"""
+utils/profile.py
+
+Dataset profile: schema + per-column stats, computed once and cached.
+
+The profile replaces the per-run ``df.head().to_markdown()`` context.  It is
+a JSON-serialisable dict:
+
+    {"rows": int,
+     "index": {"name", "kind", "dtype", "start", "end", "freq"},
+     "columns": [{"name", "dtype", "min", "max", "nunique", "null_pct"}, ...],
+     "sample": {"index": [...], "rows": [[...], ...]}}
+
+For file-backed frames it is stored next to the Feather data cache, named
+by ``utils.cache.cache_path_for`` (``.safeframe_cache/<stem>-<source id>-
+<version id>-<fingerprint>.profile.json``) and keyed by the source
+fingerprint (path, mtime, size, loader + profile version), so warm
+starts read a few KB of JSON instead of rescanning the frame.  A chunked
+``LazyFrame`` (utils/lazy.py) is profiled in one streaming pass.
+
+``render_profile`` turns it into a compact, token-efficient context block
+for the generator and critic prompts.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from utils.cache import cache_path_for, prune_stale
+from utils.code_cache import schema_fingerprint
+from utils.lazy import LazyFrame
+
+PROFILE_VERSION = "2"
+SAMPLE_ROWS = 5
+NUNIQUE_CAP = 10_000         # chunked profiles stop counting distinct values here
+
+
+def _fmt(value) -> Optional[str]:
+    """Short, JSON-friendly text for a stat value (None for NaN/NaT)."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+def _index_profile(index: pd.Index) -> Dict[str, Optional[str]]:
+    info = {"name": index.name, "kind": type(index).__name__,
+            "dtype": str(index.dtype), "start": None, "end": None, "freq": None}
+    if len(index) == 0:
+        return info
+    if isinstance(index, pd.DatetimeIndex):
+        info["start"], info["end"] = str(index.min()), str(index.max())
+        head = index[:1000]
+        freq = index.freqstr                      # set by utils/compact.py
+        if freq is None and len(head) >= 3:
+            try:
+                freq = pd.infer_freq(head)
+            except (TypeError, ValueError):
+                freq = None
+        if freq is None and len(head) >= 2:
+            freq = str(head.to_series().diff().median())   # typical step
+        info["freq"] = freq
+    elif isinstance(index, pd.RangeIndex):
+        info["start"], info["end"] = str(index.start), str(index[-1])
+    return info
+
+
+def _column_entry(name, dtype, lo, hi, nunique: int, null_pct: float) -> dict:
+    return {"name": str(name), "dtype": str(dtype), "min": _fmt(lo), "max": _fmt(hi),
+            "nunique": int(nunique), "null_pct": round(float(null_pct), 2)}
+
+
+def _sample_value(value) -> str:
+    # itertuples widens float32 to Python floats: 55.7 would print as 55.70000076293945
+    text = _fmt(value)
+    return str(value) if text is None else text
+
+
+def _sample_block(head: pd.DataFrame) -> dict:
+    return {"index": [str(i) for i in head.index],
+            "rows": [[_sample_value(v) for v in row] for row in head.itertuples(index=False)]}
+
+
+def _compute_chunked_profile(lf: LazyFrame, n_rows: int) -> dict:
+    """compute_profile for a LazyFrame: one streaming pass over its chunks.
+
+    Distinct counts are exact up to NUNIQUE_CAP and reported as a lower
+    bound ("nunique_capped") past it.
+    """
+    rows, mins, maxs, counts = 0, [], [], []
+    uniques = {c: set() for c in lf.columns}
+    index_lo = index_hi = None
+    for chunk in lf.iter_chunks():
+        rows += len(chunk)
+        ordered = chunk.select_dtypes(include=["number", "datetime", "datetimetz"])
+        mins.append(ordered.min())
+        maxs.append(ordered.max())
+        counts.append(chunk.count())
+        for name, seen in uniques.items():
+            if len(seen) <= NUNIQUE_CAP:
+                seen.update(chunk[name].dropna().unique()[:NUNIQUE_CAP + 1])
+        lo, hi = chunk.index.min(), chunk.index.max()
+        index_lo = lo if index_lo is None else min(index_lo, lo)
+        index_hi = hi if index_hi is None else max(index_hi, hi)
+
+    mins = pd.concat(mins, axis=1).min(axis=1) if mins else pd.Series(dtype=object)
+    maxs = pd.concat(maxs, axis=1).max(axis=1) if maxs else pd.Series(dtype=object)
+    counts = pd.concat(counts, axis=1).sum(axis=1) if counts else pd.Series(dtype="int64")
+
+    head = lf.head(max(n_rows, 1000))
+    index = _index_profile(head.index)
+    if index_lo is not None and index["start"] is not None:
+        index["start"], index["end"] = str(index_lo), str(index_hi)
+
+    columns: List[dict] = []
+    for name, dtype in lf.dtypes.items():
+        entry = _column_entry(name, dtype, mins.get(name), maxs.get(name),
+                              min(len(uniques[name]), NUNIQUE_CAP),
+                              100 - 100 * counts.get(name, 0) / rows if rows else 0.0)
+        if len(uniques[name]) > NUNIQUE_CAP:
+            entry["nunique_capped"] = True
+        columns.append(entry)
+
+    return {"version": PROFILE_VERSION, "rows": rows, "index": index,
+            "columns": columns, "sample": _sample_block(head.head(n_rows))}
+
+
+def compute_profile(df: pd.DataFrame, n_rows: int = SAMPLE_ROWS) -> dict:
+    """Schema + column stats of *df* using whole-frame vectorised reductions."""
+    if isinstance(df, LazyFrame):
+        return _compute_chunked_profile(df, n_rows)
+    numeric = df.select_dtypes(include=["number", "datetime", "datetimetz"])
+    mins = numeric.min() if not numeric.empty else pd.Series(dtype=object)
+    maxs = numeric.max() if not numeric.empty else pd.Series(dtype=object)
+    nulls = df.isna().mean() * 100 if len(df) else pd.Series(0.0, index=df.columns)
+    nunique = df.nunique(dropna=True)
+
+    columns = [_column_entry(name, dtype, mins.get(name), maxs.get(name),
+                             nunique[name], nulls[name])
+               for name, dtype in df.dtypes.items()]
+
+    return {
+        "version": PROFILE_VERSION,
+        "rows": int(len(df)),
+        "index": _index_profile(df.index),
+        "columns": columns,
+        "sample": _sample_block(df.head(n_rows)),
+    }
+
+
+def load_profile(df: pd.DataFrame, source: Optional[str] = None,
+                 loader_version: str = "") -> dict:
+    """Return the profile of *df*, cached next to *source* when given."""
+    if source is None or not os.path.exists(source):
+        return compute_profile(df)
+
+    # dtypes are part of the key: --compact loads the same file narrower
+    kind = "chunked" if isinstance(df, LazyFrame) else f"frame:{schema_fingerprint(df)}"
+    version = f"profile{PROFILE_VERSION}|{loader_version}|{kind}"
+    target = cache_path_for(source, version, suffix=".profile.json")
+    try:
+        with open(target, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    profile = compute_profile(df)
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = target + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(profile, f, default=str)
+        os.replace(tmp, target)
+        prune_stale(source, version, target, ".profile.json")
+    except OSError:
+        pass                                      # read-only dir: just don't cache
+    return profile
+
+
+def render_profile(profile: dict) -> str:
+    """Compact text context: one line per column, then a few sample rows."""
+    idx = profile["index"]
+    index_line = f"index: {idx['name'] or '(unnamed)'} {idx['kind']} [{idx['dtype']}]"
+    if idx["start"] is not None:
+        index_line += f" {idx['start']} → {idx['end']}"
+    if idx["freq"]:
+        index_line += f", freq={idx['freq']}"
+
+    lines = [f"### Dataset schema ({profile['rows']:,} rows)", index_line,
+             "column | dtype | min | max | nunique | null%"]
+    for c in profile["columns"]:
+        lines.append(" | ".join([c["name"], c["dtype"],
+                                 c["min"] or "-", c["max"] or "-",
+                                 ("≥" if c.get("nunique_capped") else "") + str(c["nunique"]),
+                                 f"{c['null_pct']:g}"]))
+
+    names = [c["name"] for c in profile["columns"]]
+    sample = profile["sample"]
+    lines += ["", "### Sample rows",
+              " | ".join(["(index)"] + names)]
+    for label, row in zip(sample["index"], sample["rows"]):
+        lines.append(" | ".join([label] + [v if len(v) <= 40 else v[:39] + "…" for v in row]))
+    return "\n".join(lines) + "\n"
@@ -1,3 +1,74 @@
+"""
+utils/prompt.py
+
+Prompt assembly for the generator.
+
+* Templates are read from disk once per process (``load_prompt`` is cached).
+* ``render_generation_prompt`` fills the meta-agent template.  The order is
+  instructions → dataset context → examples → user query, so everything
+  before the query is a stable prefix shared by every question about the
+  same dataset (what provider-side prompt caching keys on).
+* ``build_repair_prompt`` appends a bounded block for the latest failed
+  attempt only: the code and a truncated error, never the full history.
+"""
+
+import re
+from functools import lru_cache
+
+META_AGENT_TEMPLATE = "prompts/meta_agent.txt"
+LAZY_FRAME_NOTE = "prompts/lazy_frame.txt"      # appended to the context in chunked mode
+
+MAX_REPAIR_CODE_CHARS = 1500
+MAX_REPAIR_ERROR_CHARS = 600
+
+# prompts/*.txt are stored as `name = '''...'''`; only the body is sent
+_WRAPPED_RE = re.compile(r"^\s*\w+\s*=\s*'''(.*)'''\s*$", re.S)
+
+
+@lru_cache(maxsize=None)
 def load_prompt(path):
     with open(path, 'r', encoding='utf-8') as f:
-        return f.read()
\ No newline at end of file
+        text = f.read()
+    wrapped = _WRAPPED_RE.match(text)
+    return wrapped.group(1).strip() + "\n" if wrapped else text
+
+
+def render_generation_prompt(ctx: str, query: str,
+                             template_path: str = META_AGENT_TEMPLATE) -> str:
+    """Fill the meta-agent template with dataset context and the question."""
+    return (load_prompt(template_path)
+            .replace("{{DATASET_INFO}}", ctx)
+            .replace("{{USER_QUERY}}", query))
+
+
+def _truncate(text: str, limit: int) -> str:
+    """Head and tail of *text*, at most *limit* chars including the marker."""
+    text = text.strip()
+    if len(text) <= limit:
+        return text
+    marker = f"\n… [{len(text)} chars, middle truncated] …\n"
+    keep = max(0, limit - len(marker))
+    head = (keep + 1) // 2
+    return text[:head] + marker + (text[-(keep - head):] if keep > head else "")
+
+
+def build_repair_prompt(base_prompt: str,
+                        bad_code: str,
+                        error_type: str,
+                        error_msg: str) -> str:
+    """*base_prompt* + one bounded block describing the latest failure.
+
+    Always built from the original *base_prompt*, so repair prompts don't
+    grow with the number of attempts.
+    """
+    block = (
+        "\n\n---\n"
+        f"Previous attempt failed on **{error_type}**:\n"
+        f"{_truncate(bad_code, MAX_REPAIR_CODE_CHARS)}\n\n"
+        "Error message / critic feedback:\n"
+        f"{_truncate(error_msg, MAX_REPAIR_ERROR_CHARS)}\n\n"
+        "Please rewrite the code so it works, "
+        "assign the final answer to _ , "
+        "and return only the Python code."
+    )
+    return base_prompt + block
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+SAMPLE_ROWS = 5000        # target size of the probe frame
+MAX_STRATA = 50           # columns with more distinct values aren't stratified
+
+def stratified_sample(df: pd.DataFrame,
+                      n_rows: int = SAMPLE_ROWS,
+                      max_strata: int = MAX_STRATA) -> pd.DataFrame:
+    """
+    Return a small, representative slice of *df* for cheap probe runs.
+
+    The sample keeps the original dtypes, index type and row order:
+    1. Every k-th row across the whole frame, so a sorted DatetimeIndex still
+       spans the full date range (every month / day has rows for .loc slices).
+    2. The first and last few rows.
+    3. The first row of every value of each low-cardinality column
+       (object / string / category / bool), so filters like df[df['Sex'] == 'male']
+       are never empty just because of sampling.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Full frame.
+    n_rows : int
+        Approximate number of stride rows to keep.
+    max_strata : int
+        Only columns with at most this many distinct values are stratified.
+
+    Returns
+    -------
+    pd.DataFrame
+        *df* itself if it is already small, else a row subset (``iloc``).
+    """
+    if len(df) <= n_rows:
+        return df
+
+    step = max(1, len(df) // n_rows)
+    positions = [np.arange(0, len(df), step),
+                 np.arange(min(5, len(df))),
+                 np.arange(max(0, len(df) - 5), len(df))]
+
+    for col in df.select_dtypes(include=["object", "string", "category", "bool"]).columns:
+        codes, uniques = pd.factorize(df[col])
+        if len(uniques) <= max_strata:
+            positions.append(np.unique(codes, return_index=True)[1])
+
+    return df.iloc[np.unique(np.concatenate(positions))]
@@ -0,0 +1,123 @@
+"""
+utils/summarize.py
+
+Bounded, cheap text summaries of sandbox results for the cross-checker.
+
+The critic judges code much better when it sees what the code produced, but
+results can be multi-million-row frames.  ``summarize_result`` never builds a
+full repr: it only touches shape/dtype metadata and a few head/tail rows, and
+the output is hard-capped at ``max_chars``.
+"""
+
+from __future__ import annotations
+
+import reprlib
+import sys
+from typing import List
+
+MAX_CHARS = 800     # hard cap on the whole summary
+EDGE_ROWS = 3       # rows shown from each end of a Series / DataFrame
+MAX_COLS = 12       # columns listed / shown for a DataFrame
+
+_repr = reprlib.Repr()
+_repr.maxstring = 120
+_repr.maxother = 120
+_repr.maxlist = _repr.maxtuple = _repr.maxset = _repr.maxdict = 10
+
+
+def _cap(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[: max_chars - 1] + "…"
+
+
+def _edges_text(obj, n: int) -> str:
+    """head(n) + tail(n) of a Series/DataFrame as text, never the middle."""
+    if len(obj) <= 2 * n:
+        return obj.to_string(max_cols=MAX_COLS, max_colwidth=30) \
+            if hasattr(obj, "columns") else obj.to_string()
+    head, tail = obj.head(n), obj.tail(n)
+    if hasattr(obj, "columns"):
+        return (head.to_string(max_cols=MAX_COLS, max_colwidth=30) + "\n...\n"
+                + tail.to_string(max_cols=MAX_COLS, max_colwidth=30, header=False))
+    return head.to_string() + "\n...\n" + tail.to_string()
+
+
+def _index_text(index) -> str:
+    kind = type(index).__name__
+    if len(index) == 0:
+        return f"{kind} (empty)"
+    return f"{kind} [{index[0]} … {index[-1]}]"
+
+
+def _axes_text(ax) -> str:
+    parts = [f"title={ax.get_title()!r}",
+             f"xlabel={ax.get_xlabel()!r}",
+             f"ylabel={ax.get_ylabel()!r}",
+             f"lines={len(ax.lines)}",
+             f"bars/patches={len(ax.patches)}"]
+    legend = ax.get_legend()
+    if legend is not None:
+        labels = [t.get_text() for t in legend.get_texts()][:8]
+        parts.append(f"legend={labels}")
+    return "Axes(" + ", ".join(parts) + ")"
+
+
+def _figure_text(fig) -> str:
+    axes = fig.get_axes()
+    title = fig._suptitle.get_text() if getattr(fig, "_suptitle", None) else ""
+    lines: List[str] = [f"Figure with {len(axes)} axes"
+                        + (f", suptitle={title!r}" if title else "")]
+    lines += ["  " + _axes_text(ax) for ax in axes[:4]]
+    return "\n".join(lines)
+
+
+def summarize_figure(fig=None) -> str:
+    """Summary of *fig* (default: pyplot's current figure, if one is open)."""
+    if fig is None:
+        plt = sys.modules.get("matplotlib.pyplot")
+        if plt is None or not plt.get_fignums():
+            return ""
+        fig = plt.gcf()
+    return _figure_text(fig)
+
+
+def summarize_result(result, max_chars: int = MAX_CHARS) -> str:
+    """Return a short, size-capped description of a sandbox result.
+
+    Handles scalars, pandas Series / DataFrame / Index, numpy arrays,
+    matplotlib Axes / Figure (titles, axis labels, artist counts) and falls
+    back to a depth- and length-limited repr for everything else.  A
+    ``None`` result with an open pyplot figure is summarised as that figure.
+    """
+    pd = sys.modules.get("pandas")
+    np = sys.modules.get("numpy")
+    mpl_axes = sys.modules.get("matplotlib.axes")
+    mpl_figure = sys.modules.get("matplotlib.figure")
+
+    if result is None:
+        text = summarize_figure() or "None (nothing assigned to _ and no trailing expression)"
+    elif pd is not None and isinstance(result, pd.DataFrame):
+        more = f" (+{result.shape[1] - MAX_COLS} more)" if result.shape[1] > MAX_COLS else ""
+        dtypes = ", ".join(f"{c}:{t}" for c, t in list(result.dtypes.items())[:MAX_COLS])
+        text = (f"DataFrame shape={result.shape}\n"
+                f"index: {_index_text(result.index)}\n"
+                f"columns: {dtypes}{more}\n"
+                f"{_edges_text(result, EDGE_ROWS)}")
+    elif pd is not None and isinstance(result, pd.Series):
+        text = (f"Series name={result.name!r} dtype={result.dtype} len={len(result)}\n"
+                f"index: {_index_text(result.index)}\n"
+                f"{_edges_text(result, EDGE_ROWS)}")
+    elif pd is not None and isinstance(result, pd.Index):
+        text = f"{_index_text(result)} len={len(result)} dtype={result.dtype}"
+    elif np is not None and isinstance(result, np.ndarray):
+        flat = result.ravel()
+        text = (f"ndarray shape={result.shape} dtype={result.dtype} "
+                f"first={_repr.repr(flat[:EDGE_ROWS * 2].tolist())}")
+    elif mpl_axes is not None and isinstance(result, mpl_axes.Axes):
+        text = _axes_text(result)
+    elif mpl_figure is not None and isinstance(result, mpl_figure.Figure):
+        text = _figure_text(result)
+    elif hasattr(result, "__len__") and not isinstance(result, (str, bytes)):
+        text = f"{type(result).__name__} len={len(result)}: {_repr.repr(result)}"
+    else:
+        text = f"{type(result).__name__}: {_repr.repr(result)}"
+    return _cap(text, max_chars)
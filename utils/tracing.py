@@ -0,0 +1,228 @@
+"""
+utils/tracing.py
+
+Lightweight per-stage tracing for the generate → guard → sandbox → critic
+pipeline.
+
+* ``span(stage, **attrs)``  – context manager that times one stage.  Code
+  inside the span can attach attributes (token counts, cache hit, ok) with
+  ``annotate(**attrs)``.
+* ``event(name, **attrs)``  – zero-length span, e.g. a retry and its cause.
+* ``trace(trace_id)``       – groups every span recorded while it is active
+  (contextvars, so it follows asyncio tasks and ``asyncio.to_thread``).
+
+Finished spans are appended to the active trace and, when a sink is set
+(``set_span_sink(path)`` or ``SAFEFRAME_TRACE=<path>``), written to a
+JSONL file as one object per span:
+
+    {"trace": ..., "stage": "llm.generate", "start": <epoch s>,
+     "seconds": 1.234, "prompt_tokens": 812, "response_tokens": 40, ...}
+
+``summarize(spans)`` turns any list of spans into a p50/p99 report;
+``python -m utils.tracing spans.jsonl`` prints one for a recorded run.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = \
+    contextvars.ContextVar("safeframe_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[dict]] = \
+    contextvars.ContextVar("safeframe_span", default=None)
+
+
+# -----------------------------------------------------------------------------
+# Sink
+# -----------------------------------------------------------------------------
+
+class _JsonlSink:
+    def __init__(self, path: str) -> None:
+        self._f = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record: dict) -> None:
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._f.write(line + "\n")
+            self._f.flush()
+
+    def close(self) -> None:
+        self._f.close()
+
+
+_sink: Optional[_JsonlSink] = None
+if os.getenv("SAFEFRAME_TRACE"):
+    _sink = _JsonlSink(os.environ["SAFEFRAME_TRACE"])
+
+
+def set_span_sink(path: Optional[str]) -> None:
+    """Write every finished span to *path* (JSONL); None turns export off."""
+    global _sink
+    if _sink is not None:
+        _sink.close()
+    _sink = _JsonlSink(path) if path else None
+
+
+# -----------------------------------------------------------------------------
+# Traces and spans
+# -----------------------------------------------------------------------------
+
+class Trace:
+    """All spans recorded for one query."""
+
+    def __init__(self, trace_id) -> None:
+        self.trace_id = trace_id
+        self.spans: List[dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, record: dict) -> None:
+        with self._lock:
+            self.spans.append(record)
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Seconds spent per stage in this trace (rounded, for result rows)."""
+        totals: Dict[str, float] = {}
+        for rec in self.spans:
+            totals[rec["stage"]] = totals.get(rec["stage"], 0.0) + rec["seconds"]
+        return {k: round(v, 4) for k, v in totals.items()}
+
+
+def _finish(record: dict) -> None:
+    tr = _current_trace.get()
+    if tr is not None:
+        record["trace"] = tr.trace_id
+        tr.add(record)
+    if _sink is not None:
+        _sink.write(record)
+
+
+@contextmanager
+def trace(trace_id):
+    """Collect the spans of everything run inside the block into a Trace."""
+    tr = Trace(trace_id)
+    token = _current_trace.set(tr)
+    try:
+        yield tr
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(stage: str, **attrs):
+    """Time one pipeline stage; exceptions are recorded and re-raised."""
+    record = {"stage": stage, "start": time.time(), **attrs}
+    token = _current_span.set(record)
+    t0 = time.perf_counter()
+    try:
+        yield record
+    except BaseException as exc:
+        record["error"] = type(exc).__name__
+        raise
+    finally:
+        record["seconds"] = round(time.perf_counter() - t0, 6)
+        _current_span.reset(token)
+        _finish(record)
+
+
+def annotate(**attrs) -> None:
+    """Attach attributes to the innermost active span (no-op outside one)."""
+    record = _current_span.get()
+    if record is not None:
+        record.update(attrs)
+
+
+def event(name: str, **attrs) -> None:
+    """Record a zero-length span, e.g. event('retry', cause='guard')."""
+    _finish({"stage": name, "start": time.time(), "seconds": 0.0, **attrs})
+
+
+def record_tokens(prompt: str, message=None, response: str = "") -> None:
+    """Annotate the current span with prompt/response token counts.
+
+    Uses the provider's ``usage_metadata`` when the message carries it,
+    otherwise a chars/4 estimate flagged with ``tokens_estimated``.
+    """
+    usage = getattr(message, "usage_metadata", None) if message is not None else None
+    if usage:
+        annotate(prompt_tokens=usage.get("input_tokens"),
+                 response_tokens=usage.get("output_tokens"))
+    else:
+        annotate(prompt_tokens=len(prompt) // 4,
+                 response_tokens=len(response) // 4,
+                 tokens_estimated=True)
+
+
+# -----------------------------------------------------------------------------
+# Reporting
+# -----------------------------------------------------------------------------
+
+def _percentile(sorted_vals: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_vals:
+        return 0.0
+    rank = max(1, math.ceil(pct * len(sorted_vals) / 100.0))
+    return sorted_vals[min(rank, len(sorted_vals)) - 1]
+
+
+def summarize(spans: Iterable[dict]) -> dict:
+    """Per-stage latency stats, retry causes and token totals for *spans*."""
+    by_stage: Dict[str, List[float]] = {}
+    retries: Dict[str, int] = {}
+    tokens = {"prompt": 0, "response": 0}
+    cache = {"hit": 0, "miss": 0}
+
+    for rec in spans:
+        if rec["stage"] == "retry":
+            cause = rec.get("cause", "unknown")
+            retries[cause] = retries.get(cause, 0) + 1
+            continue
+        by_stage.setdefault(rec["stage"], []).append(rec["seconds"])
+        tokens["prompt"] += rec.get("prompt_tokens") or 0
+        tokens["response"] += rec.get("response_tokens") or 0
+        if "cache" in rec:
+            cache[rec["cache"]] = cache.get(rec["cache"], 0) + 1
+
+    stages = {}
+    for stage, vals in sorted(by_stage.items()):
+        vals.sort()
+        stages[stage] = {
+            "count": len(vals),
+            "total": round(sum(vals), 4),
+            "mean": round(sum(vals) / len(vals), 4),
+            "p50": round(_percentile(vals, 50), 4),
+            "p99": round(_percentile(vals, 99), 4),
+            "max": round(vals[-1], 4),
+        }
+    return {"stages": stages, "retries": retries, "tokens": tokens, "llm_cache": cache}
+
+
+def format_report(summary: dict) -> str:
+    """Plain-text table of a summarize() result."""
+    lines = [f"{'stage':<16}{'count':>7}{'total s':>10}{'p50 s':>9}{'p99 s':>9}{'max s':>9}"]
+    for stage, st in summary["stages"].items():
+        lines.append(f"{stage:<16}{st['count']:>7}{st['total']:>10.3f}"
+                     f"{st['p50']:>9.3f}{st['p99']:>9.3f}{st['max']:>9.3f}")
+    lines.append(f"retries: {summary['retries'] or '{}'}")
+    lines.append(f"tokens : {summary['tokens']}")
+    lines.append(f"cache  : {summary['llm_cache']}")
+    return "\n".join(lines)
+
+
+def load_spans(path: str) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m utils.tracing <spans.jsonl>")
+    print(format_report(summarize(load_spans(sys.argv[1]))))